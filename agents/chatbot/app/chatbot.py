@@ -6,27 +6,24 @@ genai.configure(api_key=GEMINI_API_KEY)
 model = genai.GenerativeModel("gemini-2.0-flash")
 
 session_memory = {}  # Dict[str, List[Dict[str, str]]]
+RETRIEVAL_K = 8
 
 def ask_gemini(prompt: str) -> str:
     response = model.generate_content(prompt)
     return response.text
 
-def ask_chatbot(query: str, session_id: str = "default"):
-    retriever = get_vector_store().as_retriever(search_type="similarity", k=8)
-    context_docs = retriever.invoke(query)
+def retrieve_context(query: str, vectordb=None, k: int = RETRIEVAL_K):
+    retriever = (vectordb or get_vector_store()).as_retriever(search_type="similarity", search_kwargs={"k": k})
+    return retriever.invoke(query)
 
+def build_prompt(query: str, context_docs, history: str) -> str:
     jobposts = [doc.page_content for doc in context_docs if doc.metadata.get("type") == "jobpost"]
     candidates = [doc.page_content for doc in context_docs if doc.metadata.get("type") == "candidate"]
 
     job_context = "\n\n".join(jobposts)
     candidate_context = "\n\n".join(candidates)
 
-    if session_id not in session_memory:
-        session_memory[session_id] = [] 
-
-    history = "\n\n".join([f"{msg['role'].capitalize()}: {msg['content']}" for msg in session_memory[session_id]])
-
-    final_prompt = f"""
+    return f"""
 You are an intelligent HR assistant AI helping a recruiter.
 Answer user questions based only on the data below.
 DO NOT mention internal MongoDB IDs. Focus on real job titles, descriptions, or candidate names.
@@ -45,7 +42,17 @@ User: {query}
 
 Assistant:
 """
-    answer = ask_gemini(final_prompt)
+
+def ask_chatbot(query: str, session_id: str = "default", vectordb=None, llm=ask_gemini):
+    context_docs = retrieve_context(query, vectordb)
+
+    if session_id not in session_memory:
+        session_memory[session_id] = []
+
+    history = "\n\n".join([f"{msg['role'].capitalize()}: {msg['content']}" for msg in session_memory[session_id]])
+
+    final_prompt = build_prompt(query, context_docs, history)
+    answer = llm(final_prompt)
 
     # Update session memory
     session_memory[session_id].append({"role": "user", "content": query})
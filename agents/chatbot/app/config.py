@@ -5,4 +5,21 @@ load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 MONGO_URI = os.getenv("MONGO_URI")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "GENAI")
 VECTOR_DIR = "./chroma_db"
+VECTOR_COLLECTION = "langchain"  # LangChain's default name, which existing indexes were built with
+
+# Shared MongoClient pool / timeout tuning (see app/db.py)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "1"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primaryPreferred")
+
+# Documents fetched per Mongo cursor batch and embedded per vector store write
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "256"))
+
+# Approximate token ceiling for each embedded candidate chunk (see app/documents.py)
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "300"))
@@ -1,12 +1,48 @@
-from pymongo import MongoClient
-from app.config import MONGO_URI
+from itertools import islice
+from pymongo import ReadPreference
+from app.config import INDEX_BATCH_SIZE
+from app.db import get_db
+
+# Bulk index reads can be served by secondaries
+db = get_db(read_preference=ReadPreference.SECONDARY_PREFERRED)
+
+# Only the fields the indexer actually reads; everything else stays on the server.
+CANDIDATE_PROJECTION = {
+    "firstName": 1, "lastName": 1, "email": 1, "status": 1, "experience": 1,
+    "jobPost": 1, "resume_details": 1, "aiEvaluation": 1,
+}
+JOBPOST_PROJECTION = {
+    "title": 1, "location": 1, "jobType": 1, "noOfOpenings": 1, "deadline": 1, "description": 1,
+}
+
+
+def iter_candidates(batch_size: int = INDEX_BATCH_SIZE, query: dict = None):
+    """Streams application documents; at most one cursor batch is held in memory."""
+    with db["applications"].find(query or {}, CANDIDATE_PROJECTION, batch_size=batch_size) as cursor:
+        yield from cursor
+
+def iter_job_posts(batch_size: int = INDEX_BATCH_SIZE, query: dict = None):
+    with db["jobposts"].find(query or {}, JOBPOST_PROJECTION, batch_size=batch_size) as cursor:
+        yield from cursor
+
+def count_candidates() -> int:
+    return db["applications"].estimated_document_count()
+
+def count_job_posts() -> int:
+    return db["jobposts"].estimated_document_count()
+
+def chunked(iterable, size: int):
+    """Yields lists of up to `size` items from any iterable."""
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
 
-client = MongoClient(MONGO_URI)
-db = client["GENAI"]
 
 def load_candidates():
-    return list(db["applications"].find({}))
+    return list(iter_candidates())
 
 def load_job_posts():
-    return list(db["jobposts"].find({}))
-
+    return list(iter_job_posts())
@@ -0,0 +1,59 @@
+import threading
+from pymongo import MongoClient
+from app.config import (
+    MONGO_URI,
+    MONGO_DB_NAME,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_MAX_IDLE_TIME_MS,
+    MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_READ_PREFERENCE,
+)
+
+# One MongoClient (one pool + one set of monitor threads) for the whole process.
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> MongoClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    MONGO_URI,
+                    appname="hr-chatbot",
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=MONGO_MIN_POOL_SIZE,
+                    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+                    readPreference=MONGO_READ_PREFERENCE,
+                    retryWrites=True,
+                    retryReads=True,
+                )
+    return _client
+
+
+def get_db(read_preference=None):
+    """Returns the app database; pass a read_preference to override the client default."""
+    return get_client().get_database(MONGO_DB_NAME, read_preference=read_preference)
+
+
+def check_connection():
+    """Pings the cluster; raises RuntimeError within the server selection timeout if unreachable."""
+    try:
+        get_client().admin.command("ping")
+    except Exception as e:
+        raise RuntimeError(f"MongoDB is not reachable: {e}") from e
+
+
+def close_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -0,0 +1,190 @@
+import re
+from langchain.schema import Document
+from app.config import CHUNK_TOKEN_BUDGET
+
+# Candidate documents are split into small typed chunks instead of one blob with the
+# full resume text and a stringified aiEvaluation dict. Used by both the bulk indexer
+# (vector_store.py) and the change-stream path (watch_changes.py).
+CANDIDATE_CHUNK_KINDS = ("profile", "skills", "evaluation")
+
+_SECTION_HEADING = re.compile(r"^[A-Z][A-Z /&-]{2,40}$")
+_SKILLS_HEADING = re.compile(r"^(TECHNICAL\s+)?SKILLS?\b", re.IGNORECASE)
+_SUMMARY_HEADING = re.compile(r"^(SUMMARY|PROFILE|OBJECTIVE|PROFESSIONAL SUMMARY)\b", re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for Gemini/embedding budgets
+    return (len(text) + 3) // 4
+
+def truncate_to_budget(text: str, budget: int = CHUNK_TOKEN_BUDGET) -> str:
+    max_chars = budget * 4 - 3  # room for the ellipsis
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,;.") + "..."
+
+def _normalize(line: str) -> str:
+    return re.sub(r"\s+", " ", line).strip().lower()
+
+def dedup_lines(lines, seen=None):
+    """Drops empty and repeated lines (case/whitespace-insensitive), preserving order."""
+    seen = set() if seen is None else seen
+    out = []
+    for line in lines:
+        key = _normalize(line)
+        if key and key not in seen:
+            seen.add(key)
+            out.append(line.strip())
+    return out
+
+def dedup_items(items):
+    return dedup_lines(str(i) for i in items if i)
+
+def _resume_section(lines, heading_re):
+    """Returns the lines under the first heading matching heading_re, up to the next heading."""
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if heading_re.match(stripped):
+            # Content may sit on the heading line itself ("Skills: Python, SQL")
+            rest = stripped.split(":", 1)[1].strip() if ":" in stripped else ""
+            section = [rest] if rest else []
+            for nxt in lines[i + 1:]:
+                if _SECTION_HEADING.match(nxt.strip()):
+                    break
+                section.append(nxt)
+            return section
+    return []
+
+
+def _profile_text(c, job_info, resume_lines, seen):
+    name = f"{c.get('firstName', '')} {c.get('lastName', '')}".strip()
+    job_title = job_info["title"] if job_info else "Unknown Role"
+    job_location = job_info["location"] if job_info else "Unknown Location"
+    text = (
+        f"Candidate: {name} applied for the role of {job_title} in {job_location}. "
+        f"Email: {c.get('email')}, Status: {c.get('status')}, Experience: {c.get('experience', 'NA')} years."
+    )
+    summary = dedup_lines(_resume_section(resume_lines, _SUMMARY_HEADING), seen)
+    if summary:
+        text += " Summary: " + " ".join(summary)
+    return text
+
+def _skills_text(name, resume_lines, seen):
+    skills = dedup_lines(_resume_section(resume_lines, _SKILLS_HEADING), seen)
+    if not skills:
+        # No recognisable skills section; fall back to the start of the resume
+        skills = dedup_lines(resume_lines, seen)
+    if not skills:
+        return None
+    return f"Candidate: {name}. Skills: " + "; ".join(skills)
+
+def _evaluation_text(name, evaluation, seen):
+    if not isinstance(evaluation, dict) or not evaluation:
+        return None
+    analysis = evaluation.get("aiAnalysis") or {}
+    parts = []
+    if evaluation.get("matchPercentage") is not None:
+        parts.append(f"Match: {evaluation['matchPercentage']}%")
+    if analysis.get("technical_match") is not None:
+        parts.append(f"Technical match: {analysis['technical_match']}%")
+    if analysis.get("seniority") not in (None, "", "N/A"):
+        parts.append(f"Seniority: {analysis['seniority']}")
+    if analysis.get("soft_skills") not in (None, "", "N/A"):
+        parts.append(f"Soft skills: {analysis['soft_skills']}")
+    missing = dedup_items(analysis.get("missing_skills") or [])
+    if missing:
+        parts.append("Missing: " + ", ".join(missing))
+    overall = dedup_lines([str(analysis.get("overall_analysis") or "")], seen)  # Often restates the resume summary
+    if overall:
+        parts.append(f"Overall: {overall[0]}")
+    if not parts:
+        return None
+    return f"Candidate: {name}. AI Evaluation: " + ". ".join(parts)
+
+
+def build_candidate_documents(c, job_info):
+    """Splits one application into profile/skills/evaluation Documents, each within CHUNK_TOKEN_BUDGET."""
+    name = f"{c.get('firstName', '')} {c.get('lastName', '')}".strip()
+    resume = c.get("resume_details") or ""
+    resume_lines = resume.splitlines() if isinstance(resume, str) else []
+    seen = set()  # shared across chunks so text is embedded once per candidate
+
+    texts = {
+        "profile": _profile_text(c, job_info, resume_lines, seen),
+        "skills": _skills_text(name, resume_lines, seen),
+        "evaluation": _evaluation_text(name, c.get("aiEvaluation"), seen),
+    }
+    base_meta = {"type": "candidate", "id": str(c["_id"]), "jobPostId": str(c.get("jobPost"))}
+    return [
+        Document(page_content=truncate_to_budget(text), metadata={**base_meta, "chunk": kind})
+        for kind, text in texts.items() if text
+    ]
+
+def build_jobpost_documents(j):
+    text = (
+        f"JobPost: {j['title']} at {j['location']} ({j['jobType']}). "
+        f"Openings: {j['noOfOpenings']}, Deadline: {j['deadline']}. "
+        f"Description: {j.get('description', 'N/A')}"
+    )
+    return [Document(
+        page_content=text,
+        metadata={"type": "jobpost", "id": str(j["_id"]), "description": j.get('description', '')}
+    )]
+
+def document_id(doc):
+    # Stable ids make re-indexing an upsert instead of appending duplicates
+    chunk = doc.metadata.get("chunk")
+    base = f"{doc.metadata['type']}:{doc.metadata['id']}"
+    return f"{base}:{chunk}" if chunk else base
+
+def candidate_document_ids(candidate_id):
+    # Includes the pre-chunking single-document id so rewrites also drop that legacy copy
+    base = f"candidate:{candidate_id}"
+    return [base] + [f"{base}:{kind}" for kind in CANDIDATE_CHUNK_KINDS]
+
+
+# --- Example Usage / Testing ---
+if __name__ == "__main__":
+    print("\n" + "="*10 + " Running Candidate Document Tests " + "="*10)
+
+    print("\n1. Testing Budget Truncation and Line De-duplication...")
+    long_text = " ".join(f"word{i}" for i in range(2000))
+    assert estimate_tokens(truncate_to_budget(long_text)) <= CHUNK_TOKEN_BUDGET, "Test Failed: Truncated text over budget."
+    assert truncate_to_budget(long_text).endswith("..."), "Test Failed: Truncation not marked."
+    assert truncate_to_budget("short text") == "short text", "Test Failed: Text within budget changed."
+    seen = set()
+    assert dedup_lines(["Python", "  python ", "", "SQL"], seen) == ["Python", "SQL"], "Test Failed: Case/space duplicates kept."
+    assert dedup_lines(["SQL", "Docker"], seen) == ["Docker"], "Test Failed: Shared seen set ignored."
+    print("Truncation and de-duplication verified.")
+
+    print("\n2. Testing Typed Candidate Chunks...")
+    summary_line = "Backend engineer building Python data services"
+    resume = "\n".join(["SUMMARY", summary_line, "SKILLS", summary_line.upper(), "Python, SQL", "python, sql"]
+                       + [f"Tool{i} and framework{i} experience in production" for i in range(200)])
+    candidate = {"_id": "c1", "firstName": "Ada", "lastName": "Lovelace", "email": "ada@example.com", "status": "applied",
+                 "jobPost": "j1", "resume_details": resume,
+                 "aiEvaluation": {"matchPercentage": 82, "aiAnalysis": {"technical_match": 75, "seniority": "Senior",
+                                  "missing_skills": ["Go", "go", "Kubernetes"], "overall_analysis": summary_line}}}
+    docs = build_candidate_documents(candidate, {"title": "Backend Developer", "location": "Remote"})
+    chunks = {d.metadata["chunk"]: d.page_content for d in docs}
+    assert list(chunks) == list(CANDIDATE_CHUNK_KINDS), f"Test Failed: Chunk kinds {list(chunks)}"
+    for kind, text in chunks.items():
+        assert estimate_tokens(text) <= CHUNK_TOKEN_BUDGET, f"Test Failed: {kind} chunk is {estimate_tokens(text)} tokens."
+    assert sum(text.lower().count(summary_line.lower()) for text in chunks.values()) == 1, \
+        "Test Failed: Summary line repeated across profile/skills/evaluation."
+    assert chunks["skills"].lower().count("python, sql") == 1, "Test Failed: Duplicate skills line kept."
+    assert "Missing: Go, Kubernetes" in chunks["evaluation"], "Test Failed: Missing skills not de-duplicated."
+    sparse = build_candidate_documents({"_id": "c2", "firstName": "Bo", "jobPost": "j1"}, None)
+    assert [d.metadata["chunk"] for d in sparse] == ["profile"], "Test Failed: Empty chunks should be skipped."
+    print("Typed candidate chunks verified.")
+
+    print("\n3. Testing Document Ids...")
+    ids = [document_id(d) for d in docs] # The ids index_documents / watch_changes write
+    assert ids == ["candidate:c1:profile", "candidate:c1:skills", "candidate:c1:evaluation"], f"Test Failed: Ids {ids}"
+    assert set(candidate_document_ids("c1")) == set(ids) | {"candidate:c1"}, \
+        "Test Failed: candidate_document_ids must cover every chunk id plus the legacy single-document id."
+    assert set(document_id(d) for d in sparse) <= set(candidate_document_ids("c2")), "Test Failed: Sparse candidate ids."
+    assert document_id(build_jobpost_documents({"_id": "j1", "title": "Dev", "location": "X", "jobType": "FT",
+                                                "noOfOpenings": 1, "deadline": "d"})[0]) == "jobpost:j1", "Test Failed: Job post id."
+    print("Document ids verified.")
+    print("\n" + "="*10 + " Candidate Document Tests Complete " + "="*10)
@@ -0,0 +1,80 @@
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from app.data_loader import count_candidates, count_job_posts
+from app.vector_store import create_vector_store, get_chroma_collection
+
+# Index build runs in a background thread; queries keep using the persisted
+# Chroma collection (which the build upserts into) until it finishes.
+_state_lock = threading.Lock()
+_state = {
+    "status": "idle",  # idle | building | ready | failed
+    "indexed": 0,
+    "total": 0,
+    "persisted_documents": 0,
+    "started_at": None,
+    "finished_at": None,
+    "error": None,
+}
+_thread = None
+
+
+def _update(**fields):
+    with _state_lock:
+        _state.update(fields)
+
+def _on_batch(n: int):
+    with _state_lock:
+        _state["indexed"] += n
+
+def _persisted_document_count() -> int:
+    try:
+        return get_chroma_collection().count()
+    except Exception as e:
+        print(f"Could not read persisted vector index: {e}")
+        return 0
+
+def _build():
+    try:
+        _update(total=count_job_posts() + count_candidates())
+        create_vector_store(on_batch=_on_batch)
+        _update(status="ready", finished_at=time.time())
+        print(f"Vector index build finished: {get_index_progress()['indexed']} documents.")
+    except Exception as e:
+        print(f"Vector index build failed: {e}")
+        traceback.print_exc()
+        _update(status="failed", error=str(e), finished_at=time.time())
+
+
+def start_background_index():
+    """Starts an index build unless one is already running. Returns the worker thread."""
+    global _thread
+    persisted = _persisted_document_count()  # Chroma read stays outside the lock
+    # Check, reset and start in one critical section so concurrent callers can't start two builds
+    with _state_lock:
+        if _thread is not None and _thread.is_alive():
+            return _thread
+        _state.update(status="building", indexed=0, total=0, started_at=time.time(),
+                      finished_at=None, error=None, persisted_documents=persisted)
+        _thread = threading.Thread(target=_build, name="vector-index-build", daemon=True)
+        _thread.start()
+    return _thread
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat() if ts else None
+
+def get_index_progress() -> dict:
+    with _state_lock:
+        state = dict(_state)
+    started, finished = state["started_at"], state["finished_at"]
+    elapsed = ((finished or time.time()) - started) if started else 0.0
+    state["started_at"], state["finished_at"] = _iso(started), _iso(finished)
+    state["elapsed_seconds"] = round(elapsed, 1)
+    state["embed_rate"] = round(state["indexed"] / elapsed, 2) if elapsed > 0 else 0.0  # docs/sec
+    state["percent"] = min(100.0, round(100.0 * state["indexed"] / state["total"], 1)) if state["total"] else 0.0
+    state["fresh_index"] = state["status"] == "ready"
+    # Serveable once a fresh build is done, or straight away if an older index was persisted
+    state["ready"] = state["fresh_index"] or state["persisted_documents"] > 0
+    return state
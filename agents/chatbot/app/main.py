@@ -1,8 +1,9 @@
 from fastapi import FastAPI
 from app.api import router
-from app.vector_store import create_vector_store
+from app.indexer import start_background_index
 from fastapi.middleware.cors import CORSMiddleware
 from app.watch_changes import start_change_watchers
+from app.db import check_connection, close_client
 from app.api import router as api_router
 
 app = FastAPI(title="HR ChatBot with Gemini")
@@ -20,9 +21,15 @@ app.include_router(api_router)
 
 @app.on_event("startup")
 def startup():
-    print("Indexing data into vector DB...")
-    create_vector_store()
+    print("Checking MongoDB connection...")
+    check_connection()  # Fail fast instead of hanging on the first query
+    print("Indexing data into vector DB in the background (see /readyz)...")
+    start_background_index()
     print("Starting MongoDB change stream watchers...")
     start_change_watchers()
 
+@app.on_event("shutdown")
+def shutdown():
+    close_client()
+
 app.include_router(router)
\ No newline at end of file
@@ -1,56 +1,72 @@
-from app.data_loader import load_candidates, load_job_posts
+import chromadb
+from app.data_loader import iter_candidates, iter_job_posts, chunked
 from langchain.vectorstores import Chroma
-from langchain.schema import Document
+from app.documents import build_candidate_documents, build_jobpost_documents, document_id, candidate_document_ids
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from app.config import GEMINI_API_KEY, VECTOR_DIR
+from app.config import GEMINI_API_KEY, VECTOR_DIR, VECTOR_COLLECTION, INDEX_BATCH_SIZE
 
 embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=GEMINI_API_KEY)
 
-def format_documents():
-    candidates = load_candidates()
-    jobposts = load_job_posts()
-
-    # Create jobpost lookup by ID for easy reference
-    jobpost_map = {str(j["_id"]): j for j in jobposts}
-    docs = []
-
-    for c in candidates:
-        job_id = str(c["jobPost"])
-        job_info = jobpost_map.get(job_id)
-        job_title = job_info["title"] if job_info else "Unknown Role"
-        job_location = job_info["location"] if job_info else "Unknown Location"
-
-        text = (
-            f"Candidate: {c['firstName']} {c['lastName']} applied for the role of {job_title} in {job_location}. "
-            f"Email: {c['email']}, Status: {c['status']}, Experience: {c.get('experience', 'NA')} years. "
-            f"Resume Summary: {c.get('resume_details', 'N/A')}. "
-            f"AI Evaluation: {c.get('aiEvaluation', {})}"
-        )
-
-        docs.append(Document(
-            page_content=text,
-            metadata={"type": "candidate", "id": str(c["_id"]), "jobPostId": job_id}
-        ))
-
-    for j in jobposts:
-        text = (
-            f"JobPost: {j['title']} at {j['location']} ({j['jobType']}). "
-            f"Openings: {j['noOfOpenings']}, Deadline: {j['deadline']}. "
-            f"Description: {j.get('description', 'N/A')}"
-        )
-        docs.append(Document(
-            page_content=text,
-            metadata={"type": "jobpost", "id": str(j["_id"]), "description": j.get('description', '')}
-        ))
-
-    return docs
-
-
-def create_vector_store():
-    docs = format_documents()
-    vectordb = Chroma.from_documents(documents=docs, embedding=embedding, persist_directory=VECTOR_DIR)
+def format_documents(batch_size=INDEX_BATCH_SIZE):
+    """Yields lists of at most batch_size Documents, streaming job posts then candidates."""
+    # Candidates only need title/location of their job post, so keep just that in memory
+    jobpost_map = {}
+    for jobposts in chunked(iter_job_posts(batch_size), batch_size):
+        for j in jobposts:
+            jobpost_map[str(j["_id"])] = {"title": j["title"], "location": j["location"]}
+        yield [doc for j in jobposts for doc in build_jobpost_documents(j)]
+
+    for candidates in chunked(iter_candidates(batch_size), batch_size):
+        yield [doc for c in candidates for doc in build_candidate_documents(c, jobpost_map.get(str(c["jobPost"])))]
+
+
+def _stored_ids(vectordb, page_size=INDEX_BATCH_SIZE * 4):
+    """Ids already in the collection, read page by page without embeddings or documents."""
+    ids, offset = set(), 0
+    while True:
+        page = vectordb.get(include=[], limit=page_size, offset=offset)["ids"]
+        if not page:
+            return ids
+        ids.update(page)
+        offset += len(page)
+
+def index_documents(vectordb, batches, on_batch=None):
+    """Writes each Document batch to vectordb; on_batch(n) gets the number of source records written.
+    Stable ids upsert; ids stored before the build that it did not produce (random-UUID documents
+    from older builds, deleted records) are removed once every batch is written."""
+    previous_ids = _stored_ids(vectordb)
+    written_ids = set()
+    for docs in batches:
+        ids = [document_id(d) for d in docs]
+        # Same as the change watchers: drop a candidate's old chunks (legacy id, chunks it no longer has) first
+        candidate_ids = {d.metadata["id"] for d in docs if d.metadata["type"] == "candidate"}
+        if candidate_ids:
+            vectordb.delete(ids=[i for c in sorted(candidate_ids) for i in candidate_document_ids(c)])
+        vectordb.add_documents(docs, ids=ids)
+        written_ids.update(ids)
+        if on_batch:
+            on_batch(len({(d.metadata["type"], d.metadata["id"]) for d in docs}))
+    # Only ids that predate the build: anything the change watchers added meanwhile is kept
+    stale = list(previous_ids - written_ids)
+    for ids in chunked(stale, INDEX_BATCH_SIZE):
+        vectordb.delete(ids=ids)
+    if stale:
+        print(f"Removed {len(stale)} stale documents from the vector index.")
+    return vectordb
+
+def create_vector_store(batch_size=INDEX_BATCH_SIZE, on_batch=None):
+    """Embeds every document from Mongo into the persisted store."""
+    vectordb = index_documents(get_vector_store(), format_documents(batch_size), on_batch)
     vectordb.persist()
     return vectordb
 
+def _chroma_client():
+    return chromadb.PersistentClient(path=VECTOR_DIR)
+
 def get_vector_store():
-    return Chroma(persist_directory=VECTOR_DIR, embedding_function=embedding)
+    return Chroma(client=_chroma_client(), collection_name=VECTOR_COLLECTION,
+                  persist_directory=VECTOR_DIR, embedding_function=embedding)
+
+def get_chroma_collection():
+    """The chromadb collection behind get_vector_store(), for reads the LangChain wrapper doesn't offer (count)."""
+    return _chroma_client().get_or_create_collection(VECTOR_COLLECTION)
@@ -1,51 +1,37 @@
 import threading
-from pymongo import MongoClient
 from bson import ObjectId
-from app.config import MONGO_URI, VECTOR_DIR, GEMINI_API_KEY
-from langchain.vectorstores import Chroma
-from langchain.schema import Document
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from app.db import get_db
+from app.data_loader import CANDIDATE_PROJECTION, JOBPOST_PROJECTION
+from app.documents import build_candidate_documents, build_jobpost_documents, document_id, candidate_document_ids
+from app.vector_store import get_vector_store
 
-embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=GEMINI_API_KEY)
-client = MongoClient(MONGO_URI)
-db = client["GENAI"]
+db = get_db()
 
 def embed_and_add(doc_type: str, data: dict):
-    vectordb = Chroma(persist_directory=VECTOR_DIR, embedding_function=embedding)
+    vectordb = get_vector_store()
 
     if doc_type == "candidate":
         job_id = str(data["jobPost"])
-        job_info = db["jobposts"].find_one({"_id": ObjectId(job_id)})
-        job_title = job_info["title"] if job_info else "Unknown Role"
-        job_location = job_info["location"] if job_info else "Unknown Location"
-
-        text = (
-            f"Candidate: {data['firstName']} {data['lastName']} applied for the role of {job_title} in {job_location}. "
-            f"Email: {data['email']}, Status: {data['status']}, Experience: {data.get('experience', 'NA')} years. "
-            f"Resume Summary: {data.get('resume_details', 'N/A')}. "
-            f"AI Evaluation: {data.get('aiEvaluation', {})}"
-        )
-        doc = Document(page_content=text, metadata={"type": "candidate", "id": str(data["_id"])})
+        job_info = db["jobposts"].find_one({"_id": ObjectId(job_id)}, {"title": 1, "location": 1})
+        docs = build_candidate_documents(data, job_info)
+        # Drop chunks the new version may no longer produce (e.g. evaluation removed)
+        vectordb.delete(ids=candidate_document_ids(str(data["_id"])))
 
     elif doc_type == "jobpost":
-        text = (
-            f"JobPost: {data['title']} at {data['location']} ({data['jobType']}). "
-            f"Openings: {data['noOfOpenings']}, Deadline: {data['deadline']}. "
-            f"Description: {data.get('description', 'N/A')}"
-        )
-        doc = Document(page_content=text, metadata={"type": "jobpost", "id": str(data["_id"])})
-
-    vectordb.add_documents([doc])
+        docs = build_jobpost_documents(data)
+
+    vectordb.add_documents(docs, ids=[document_id(d) for d in docs])
     vectordb.persist()
 
 
 def watch_collection(collection_name: str, doc_type: str):
     collection = db[collection_name]
+    projection = CANDIDATE_PROJECTION if doc_type == "candidate" else JOBPOST_PROJECTION
     with collection.watch() as stream:
         for change in stream:
             if change["operationType"] in ["insert", "update", "replace"]:
                 doc_id = change["documentKey"]["_id"]
-                full_doc = collection.find_one({"_id": ObjectId(doc_id)})
+                full_doc = collection.find_one({"_id": ObjectId(doc_id)}, projection)
                 if full_doc:
                     embed_and_add(doc_type, full_doc)
 
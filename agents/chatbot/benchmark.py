@@ -0,0 +1,299 @@
+"""Offline retrieval / latency benchmark for the HR chatbot.
+
+Builds a throwaway Chroma index from a synthetic corpus with a local hashing
+embedder, replays a fixed set of HR questions through the same retrieval and
+prompt code as ask_chatbot (with a stub LLM), and prints JSON metrics:
+recall@k, p50/p95 retrieval latency, prompt token counts and index build time.
+
+    python benchmark.py                                  # built-in synthetic corpus
+    python benchmark.py --cv-dir ../../genai_test2/fake_cvs_pdf_std_fonts \
+                        --jd-dir ../../genai_test2/fake_jedis_txt   # generate_data.py output
+    python benchmark.py --output bench.json
+
+No network access is needed: nothing here calls Gemini or MongoDB.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+# The app modules build Gemini clients at import time; construction is offline but needs a key.
+os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+
+from langchain.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+from app.chatbot import ask_chatbot, build_prompt, retrieve_context, session_memory, RETRIEVAL_K
+from app.config import INDEX_BATCH_SIZE
+from app.data_loader import chunked
+from app.documents import build_candidate_documents, build_jobpost_documents, estimate_tokens
+from app.vector_store import index_documents
+
+SKILLS = ["Python", "PyTorch", "TensorFlow", "SQL", "AWS", "Docker", "Kubernetes", "Spark",
+          "NLP", "Computer Vision", "MLOps", "LangChain", "Tableau", "Scala", "Go", "Airflow"]
+ROLES = ["Machine Learning Engineer", "Data Scientist", "NLP Engineer", "MLOps Engineer",
+         "Data Analyst", "Computer Vision Engineer"]
+FIRST_NAMES = ["Priya", "Rohan", "Ananya", "Vikram", "Meera", "Arjun", "Li", "Kenji", "Maria",
+               "Ahmed", "Sophie", "John", "Emily", "Chen", "Olga", "Yuki", "Fatima", "Suresh"]
+LAST_NAMES = ["Sharma", "Kumar", "Reddy", "Singh", "Iyer", "Gupta", "Wei", "Tanaka", "Garcia",
+              "Hassan", "Muller", "Smith", "White", "Yu", "Petrova", "Sato", "Begum", "Menon"]
+LOCATIONS = ["Bangalore, India", "Pune, India", "Berlin, Germany", "London, UK", "Remote (India)"]
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic bag-of-words feature hashing; a stand-in for the Gemini embedder."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _embed(self, text):
+        vec = [0.0] * self.dim
+        for token in re.findall(r"\w+", text.lower()):
+            vec[zlib.crc32(token.encode()) % self.dim] += 1.0
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class StubLLM:
+    """Records prompt sizes and returns a canned answer instead of calling Gemini."""
+
+    def __init__(self):
+        self.prompt_tokens = []
+
+    def __call__(self, prompt):
+        self.prompt_tokens.append(estimate_tokens(prompt))
+        return "Stub answer."
+
+
+# --- Corpus ---
+
+def synthetic_corpus(num_jobs, num_candidates, seed):
+    rng = random.Random(seed)
+    jobposts = []
+    for i in range(num_jobs):
+        role = ROLES[i % len(ROLES)]
+        skills = rng.sample(SKILLS, 5)
+        jobposts.append({
+            "_id": f"job{i:04d}", "title": role, "location": rng.choice(LOCATIONS), "jobType": "full-time",
+            "noOfOpenings": rng.randint(1, 5), "deadline": "2026-12-31",
+            "description": f"We are hiring a {role}. Required skills: {', '.join(skills)}.",
+        })
+    candidates = []
+    for i in range(num_candidates):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        skills = rng.sample(SKILLS, rng.randint(3, 6))
+        years = rng.randint(0, 15)
+        job = rng.choice(jobposts)
+        resume = "\n".join([
+            f"{first} {last}", f"{first.lower()}.{last.lower()}{i}@example.com",
+            "SUMMARY", f"{job['title']} with {years} years of experience in {skills[0]} and {skills[1]}.",
+            "WORK EXPERIENCE", f"Engineer | Company {rng.randint(1, 50)}",
+            f"- Built pipelines using {skills[0]}.", f"- Built pipelines using {skills[0]}.",
+            "TECHNICAL SKILLS", ", ".join(skills),
+            "EDUCATION", "B.Tech, Computer Science",
+        ])
+        candidates.append({
+            "_id": f"cand{i:05d}", "firstName": f"{first}{i}", "lastName": last,
+            "email": f"{first.lower()}.{last.lower()}{i}@example.com", "status": "applied",
+            "experience": years, "jobPost": job["_id"], "resume_details": resume,
+            "aiEvaluation": {"matchPercentage": rng.randint(20, 95), "aiAnalysis": {
+                "technical_match": rng.randint(20, 95), "seniority": "mid", "soft_skills": "good",
+                "missing_skills": rng.sample(SKILLS, 2), "overall_analysis": "Solid candidate."}},
+        })
+    return jobposts, candidates
+
+def generated_corpus(cv_dir, jd_dir):
+    """Reads generate_data.py output: PDF CVs and Markdown-ish .txt JDs."""
+    import pdfplumber
+
+    jobposts = []
+    for i, name in enumerate(sorted(os.listdir(jd_dir))):
+        if not name.endswith(".txt"):
+            continue
+        with open(os.path.join(jd_dir, name), encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+        title = re.search(r"\*\*Job Title:\*\*\s*(.+)", text)
+        location = re.search(r"\*\*Location:\*\*\s*(.+)", text)
+        jobposts.append({
+            "_id": f"job{i:04d}", "title": title.group(1).strip() if title else name,
+            "location": location.group(1).strip() if location else "Unknown", "jobType": "full-time",
+            "noOfOpenings": 1, "deadline": "2026-12-31", "description": text,
+        })
+    candidates = []
+    for i, name in enumerate(sorted(os.listdir(cv_dir))):
+        if not name.endswith(".pdf"):
+            continue
+        with pdfplumber.open(os.path.join(cv_dir, name)) as pdf:
+            text = "\n".join(page.extract_text() or "" for page in pdf.pages)
+        full_name = (text.strip().splitlines() or ["Unknown Candidate"])[0].split()
+        email = re.search(r"[\w.+-]+@[\w-]+\.[\w.]+", text)
+        candidates.append({
+            "_id": f"cand{i:05d}", "firstName": full_name[0], "lastName": " ".join(full_name[1:]),
+            "email": email.group(0) if email else f"cand{i}@example.com", "status": "applied",
+            "experience": "NA", "jobPost": jobposts[i % len(jobposts)]["_id"] if jobposts else None,
+            "resume_details": text,
+        })
+    return jobposts, candidates
+
+
+# --- Questions & ground truth ---
+
+def _mentions(text, term):
+    return re.search(rf"(?<!\w){re.escape(term.lower())}(?!\w)", (text or "").lower()) is not None
+
+def build_questions(jobposts, candidates, num_questions, seed):
+    """Fixed (seeded) question set; each entry lists the candidate ids a good retrieval should surface."""
+    rng = random.Random(seed)
+    questions = []
+    for c in rng.sample(candidates, min(len(candidates), num_questions // 2)):
+        questions.append({"kind": "candidate", "question": f"Tell me about {c['firstName']} {c['lastName']}.",
+                          "relevant": [str(c["_id"])]})
+    skills = [s for s in SKILLS if any(_mentions(c.get("resume_details"), s) for c in candidates)]
+    for skill in rng.sample(skills, min(len(skills), num_questions // 4)):
+        relevant = [str(c["_id"]) for c in candidates if _mentions(c.get("resume_details"), skill)]
+        questions.append({"kind": "skill", "question": f"Which candidates have {skill} experience?",
+                          "relevant": relevant})
+    for j in rng.sample(jobposts, min(len(jobposts), num_questions - len(questions))):
+        relevant = [str(c["_id"]) for c in candidates if c.get("jobPost") == j["_id"]]
+        if relevant:
+            questions.append({"kind": "role", "question": f"Who applied for the {j['title']} role in {j['location']}?",
+                              "relevant": relevant})
+    return questions
+
+
+# --- Metrics ---
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[idx]
+
+def recall_at_k(docs, relevant, k):
+    retrieved = []
+    for d in docs:
+        cid = d.metadata.get("id")
+        if d.metadata.get("type") == "candidate" and cid not in retrieved:
+            retrieved.append(cid)
+    hits = len(set(retrieved[:k]) & set(relevant))
+    return hits / min(k, len(relevant)) if relevant else 0.0
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(jobposts, candidates, questions, k=RETRIEVAL_K, batch_size=INDEX_BATCH_SIZE):
+    persist_dir = tempfile.mkdtemp(prefix="chatbot-bench-")
+    try:
+        embedder = HashingEmbeddings()
+        vectordb = Chroma(collection_name="benchmark", embedding_function=embedder, persist_directory=persist_dir)
+        jobpost_map = {j["_id"]: j for j in jobposts}
+
+        def batches():
+            for chunk in chunked(jobposts, batch_size):
+                yield [d for j in chunk for d in build_jobpost_documents(j)]
+            for chunk in chunked(candidates, batch_size):
+                yield [d for c in chunk for d in build_candidate_documents(c, jobpost_map.get(c.get("jobPost")))]
+
+        embedded_docs, embedded_tokens = 0, 0
+        def counted():
+            nonlocal embedded_docs, embedded_tokens
+            for docs in batches():
+                embedded_docs += len(docs)
+                embedded_tokens += sum(estimate_tokens(d.page_content) for d in docs)
+                yield docs
+
+        t0 = time.perf_counter()
+        index_documents(vectordb, counted())
+        build_seconds = time.perf_counter() - t0
+
+        llm = StubLLM()
+        latencies_ms, end_to_end_ms, recalls, per_kind = [], [], [], {}
+        for n, q in enumerate(questions):
+            t0 = time.perf_counter()
+            docs = retrieve_context(q["question"], vectordb, k)
+            latencies_ms.append((time.perf_counter() - t0) * 1000)
+            llm(build_prompt(q["question"], docs, ""))
+            r = recall_at_k(docs, q["relevant"], k)
+            recalls.append(r)
+            per_kind.setdefault(q["kind"], []).append(r)
+
+            t0 = time.perf_counter()
+            # Fresh session per question: accumulated history would lengthen every later prompt
+            session_id = f"benchmark-{n}"
+            ask_chatbot(q["question"], session_id=session_id, vectordb=vectordb, llm=lambda prompt: "Stub answer.")
+            end_to_end_ms.append((time.perf_counter() - t0) * 1000)
+            session_memory.pop(session_id, None)
+
+        return {
+            "commit": _git_commit(),
+            "corpus": {"jobposts": len(jobposts), "candidates": len(candidates),
+                       "embedded_documents": embedded_docs, "embedded_tokens": embedded_tokens,
+                       "embedded_tokens_per_candidate": round(embedded_tokens / max(1, len(candidates)), 1)},
+            "index_build_seconds": round(build_seconds, 3),
+            "questions": len(questions),
+            "k": k,
+            "recall_at_k": round(statistics.mean(recalls), 4) if recalls else 0.0,
+            "recall_at_k_by_kind": {kind: round(statistics.mean(v), 4) for kind, v in per_kind.items()},
+            "retrieval_latency_ms": {"p50": round(percentile(latencies_ms, 50), 3),
+                                     "p95": round(percentile(latencies_ms, 95), 3)},
+            "ask_chatbot_latency_ms": {"p50": round(percentile(end_to_end_ms, 50), 3),
+                                       "p95": round(percentile(end_to_end_ms, 95), 3)},
+            "prompt_tokens": {"mean": round(statistics.mean(llm.prompt_tokens), 1) if llm.prompt_tokens else 0,
+                              "p95": percentile(llm.prompt_tokens, 95),
+                              "max": max(llm.prompt_tokens, default=0)},
+        }
+    finally:
+        shutil.rmtree(persist_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline retrieval/latency benchmark for the HR chatbot.")
+    parser.add_argument("--jobs", type=int, default=20, help="Synthetic job posts (ignored with --cv-dir).")
+    parser.add_argument("--candidates", type=int, default=500, help="Synthetic candidates (ignored with --cv-dir).")
+    parser.add_argument("--cv-dir", help="Directory of PDF CVs from genai_test2/generate_data.py.")
+    parser.add_argument("--jd-dir", help="Directory of .txt JDs from genai_test2/generate_data.py.")
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--k", type=int, default=RETRIEVAL_K)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write JSON here instead of stdout.")
+    args = parser.parse_args(argv)
+
+    if args.cv_dir:
+        if not args.jd_dir:
+            parser.error("--cv-dir requires --jd-dir")
+        jobposts, candidates = generated_corpus(args.cv_dir, args.jd_dir)
+    else:
+        jobposts, candidates = synthetic_corpus(args.jobs, args.candidates, args.seed)
+    questions = build_questions(jobposts, candidates, args.questions, args.seed)
+
+    result = run_benchmark(jobposts, candidates, questions, k=args.k)
+    payload = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+        print(f"Benchmark results written to {args.output}", file=sys.stderr)
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
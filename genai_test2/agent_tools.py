@@ -7,13 +7,13 @@ import os
 from file_utils import extract_text_from_file
 # Assume llm_utils contains structure_resume_text, structure_job_description, rate_resume_against_jd, summarize_text_contextually
 from llm_utils import structure_resume_text, structure_job_description, rate_resume_against_jd, summarize_text_contextually
-# Assume database_utils contains init_db, get_structured_resume, get_structured_jd, get_top_applicants_for_job, get_resume_path
-from database_utils import init_db, get_structured_resume, get_structured_jd, get_top_applicants_for_job, get_resume_path, add_applicant, add_application_rating
+# Every data call goes through the storage repository (SQLite or Postgres, picked from PORTAL_DATABASE_URL)
+from db_backends import get_repository
 
 # Initialize DB schema when tools are loaded (ensures DB exists)
-# Note: Consider if init_db should be called elsewhere in a real app setup
+# Note: Consider if init_schema should be called elsewhere in a real app setup
 print("Initializing database from agent_tools.py...")
-init_db()
+get_repository().init_schema()
 print("Database initialization check complete.")
 
 
@@ -115,7 +115,7 @@ class ApplicantRankerTool(BaseTool):
              print("Warning: Invalid 'n' provided, defaulting to 5.")
              n = 5
              
-        ranked_list = get_top_applicants_for_job(job_id, n)
+        ranked_list = get_repository().get_ranked_applicants(job_id, n)
         print(f"Ranking complete. Found {len(ranked_list)} applicants.")
         # Return the list of tuples: (applicant_id, name, rating)
         # Convert tuples to dicts for potentially easier handling by LLM? Optional.
@@ -134,8 +134,8 @@ class ApplicantSummarizerTool(BaseTool):
 
         # 1. Get structured resume and JD from DB
         print("Retrieving structured resume and JD from database...")
-        structured_resume = get_structured_resume(applicant_id)
-        structured_jd = get_structured_jd(job_id)
+        structured_resume = get_repository().get_structured_resume(applicant_id)
+        structured_jd = get_repository().get_structured_jd(job_id)
 
         if not structured_resume:
             return f"Error: Could not retrieve structured resume data for Applicant ID: {applicant_id}."
@@ -148,7 +148,7 @@ class ApplicantSummarizerTool(BaseTool):
 
         # Option 2: Retrieve original text and summarize that (might be better)
         print("Retrieving original resume file path...")
-        resume_file_path = get_resume_path(applicant_id)
+        resume_file_path = get_repository().get_resume_path(applicant_id)
         if not resume_file_path or not os.path.exists(resume_file_path):
              return f"Error: Could not find resume file path or file does not exist for Applicant ID: {applicant_id}."
         
@@ -186,7 +186,7 @@ applicant_summarizer_tool = ApplicantSummarizerTool()
 #        print(f"--- SaveRatingTool: Running for A:{applicant_id}, J:{job_id} ---")
 #        try:
 #            rating_dict = json.loads(rating_result_json)
-#            success = add_application_rating(applicant_id, job_id, rating_dict)
+#            success = get_repository().update_application_rating(applicant_id, job_id, rating_dict)
 #            if success:
 #                return f"Rating for Applicant {applicant_id} / Job {job_id} saved successfully."
 #            else:
@@ -23,6 +23,7 @@ import atexit # To shutdown scheduler gracefully
 from main_crew import (
     run_suitability_check_direct,
     run_summarization_direct,
+    run_summarization_parallel, # Concurrent summaries with a latency budget (chat ranking)
     run_ranking_direct
 )
 from llm_utils import (
@@ -30,19 +31,18 @@ from llm_utils import (
     summarize_text_contextually,
     understand_hr_chat_intent,
     to_5_star,
-    generate_ranking_highlights
+    generate_ranking_highlights,
+    warm_chains # Build the shared LangChain chains once at start-up
 )
+from intent_classifier import classify_hr_chat_intent, record_intent_example # Local NLU fast path before Gemini
 # Ensure database_utils functions are correctly imported
-from database_utils import (
-    get_all_jobs, get_job, get_structured_jd, add_job,
-    add_applicant, add_application, get_applicants_for_job,
-    update_application_rating, get_resume_path, get_ranked_applicants,
-    update_application_status, get_applications_by_status, update_job_status,
-    get_jobs_with_preference, # Import the new function
-    init_db, # Ensure init_db is imported
-    get_structured_resume # Ensure this is imported if needed by main_crew etc.
-)
+from database_utils import APPLICANT_PAGE_FILTERS, APPLICANT_PAGE_SORTS # Keyset-paginated listing options (every backend)
+from db_backends import get_repository # Storage backend (PORTAL_DATABASE_URL: SQLite or Postgres) for every data call
 from file_utils import UPLOAD_FOLDER, extract_text_from_file
+from rating_executor import ( # Shared concurrent rating pool + background rating tasks
+    rate_applicants, submit_rating_task, rating_task_progress, shutdown_rating_executor,
+    rate_application_once, finish_application_rating # One rating per application at a time
+)
 
 # --- App Setup ---
 app = Flask(__name__)
@@ -86,38 +86,35 @@ def to_5_star_filter(score):
     return to_5_star(score)
 
 # --- Qualitative Status Assessment Function ---
-def assess_job_status_quality(job_id):
-    """Provides a qualitative assessment of a job listing's progress based on DB data."""
+def assess_job_status_quality(job_id, stats=None):
+    """Provides a qualitative assessment of a job listing's progress based on DB data.
+    Pass `stats` (from get_job_stats/get_all_job_stats) to avoid another query."""
     try:
-        # Use include_rejected=True to get all applications for statistics
-        apps = get_applicants_for_job(job_id, include_rejected=True)
-        if not apps:
+        if stats is None: stats = get_repository().get_job_stats(job_id)
+        total = stats['total']
+        if not total:
             return "No applications yet."
 
-        total = len(apps)
-        # Correctly check for non-None rating
-        rated = [a for a in apps if a.get('rating') is not None]
-        # Correctly check for status strings
-        shortlisted = [a for a in apps if a.get('status') == 'shortlisted']
-        rejected = [a for a in apps if a.get('status') == 'rejected']
-        pending = total - len(shortlisted) - len(rejected)
+        rated_count = stats['rated_count']
+        shortlisted_count = stats['status_counts'].get('shortlisted', 0)
+        rejected_count = stats['status_counts'].get('rejected', 0)
+        pending = total - shortlisted_count - rejected_count
 
-        # Correctly calculate average rating, avoiding division by zero
-        avg_rating = (sum(a['rating'] for a in rated if a.get('rating') is not None) / len(rated)) if rated else 0
+        # Average rating, 0 when nothing is rated yet
+        avg_rating = stats['avg_rating'] or 0
 
         # --- Assessment Logic ---
-        if total == 0: return "No applications received yet."
-        if len(shortlisted) > 0:
-             if avg_rating >= 70: return f"Excellent progress! ({len(shortlisted)} shortlisted, avg. rating {avg_rating:.0f}/100)."
-             else: return f"Good start! ({len(shortlisted)} shortlisted, avg. rating {avg_rating:.0f}/100). Keep reviewing."
-        if len(rated) < total / 2 and total > 5: return f"Moderate activity ({total} apps), many pending review ({pending})."
-        if len(rated) == total and avg_rating >= 60: return f"Review complete. Avg. rating is solid ({avg_rating:.0f}/100), but no one shortlisted yet."
-        if len(rated) > 0 and avg_rating < 45:
-            if len(rejected) > total * 0.6: return f"Challenging: high rejection rate ({len(rejected)}/{total}) and low avg. rating ({avg_rating:.0f}/100)."
+        if shortlisted_count > 0:
+             if avg_rating >= 70: return f"Excellent progress! ({shortlisted_count} shortlisted, avg. rating {avg_rating:.0f}/100)."
+             else: return f"Good start! ({shortlisted_count} shortlisted, avg. rating {avg_rating:.0f}/100). Keep reviewing."
+        if rated_count < total / 2 and total > 5: return f"Moderate activity ({total} apps), many pending review ({pending})."
+        if rated_count == total and avg_rating >= 60: return f"Review complete. Avg. rating is solid ({avg_rating:.0f}/100), but no one shortlisted yet."
+        if rated_count > 0 and avg_rating < 45:
+            if rejected_count > total * 0.6: return f"Challenging: high rejection rate ({rejected_count}/{total}) and low avg. rating ({avg_rating:.0f}/100)."
             else: return f"Low suitability: avg. rating is poor ({avg_rating:.0f}/100). Consider revising JD or sourcing."
-        if len(rated) == 0 and total > 0: return f"Receiving applications ({total}), but none rated yet."
+        if rated_count == 0: return f"Receiving applications ({total}), but none rated yet."
         # Default fallback
-        return f"Steady progress: {total} apps, {len(rated)} rated (avg: {avg_rating:.0f}/100), {pending} pending."
+        return f"Steady progress: {total} apps, {rated_count} rated (avg: {avg_rating:.0f}/100), {pending} pending."
 
     except Exception as e:
         print(f"Error assessing job status quality for {job_id}: {e}")
@@ -132,12 +129,12 @@ def analyze_job_applicants(job_id):
     # Wrap in app context as scheduler runs outside request context
     with app.app_context():
         print(f"[Scheduler] Analyzing unrated applicants for job: {job_id}")
-        job = get_job(job_id)
+        job = get_repository().get_job(job_id)
         if not job or job.get('job_status') != 'open':
             print(f"[Scheduler] Skipping analysis for {job_id} (not found or not open).")
             return
 
-        all_applicants = get_applicants_for_job(job_id, include_rejected=True)
+        all_applicants = get_repository().get_applicants_for_job(job_id, include_rejected=True)
         unrated_applicants = [app for app in all_applicants if app.get('rating') is None]
 
         if not unrated_applicants:
@@ -145,29 +142,8 @@ def analyze_job_applicants(job_id):
             return
 
         print(f"[Scheduler] Found {len(unrated_applicants)} unrated for {job_id}. Starting rating...")
-        rated_count = 0; error_count = 0; skipped_count = 0
-        for applicant in unrated_applicants:
-            applicant_id = applicant.get('applicant_id')
-            if not applicant_id: skipped_count += 1; print(f"[Scheduler] Skipping applicant with missing ID in job {job_id}."); continue
-
-            resume_filename = get_resume_path(applicant_id)
-            if not resume_filename: skipped_count += 1; print(f"[Scheduler] Skipping {applicant_id} (job {job_id}): No resume path."); continue
-
-            resume_full_path = os.path.join(UPLOAD_FOLDER, secure_filename(resume_filename))
-            if not os.path.exists(resume_full_path): skipped_count += 1; print(f"[Scheduler] Skipping {applicant_id} (job {job_id}): Resume file missing ({resume_filename})."); continue
-
-            print(f"[Scheduler] Rating {applicant_id} for job {job_id}...")
-            try:
-                 rating_result = run_suitability_check_direct(resume_file_path=resume_full_path, job_id=job_id)
-                 if isinstance(rating_result, dict) and 'error' not in rating_result and all(k in rating_result for k in ['rating', 'summary', 'fits', 'lacks']):
-                     if update_application_rating(applicant_id, job_id, rating_result):
-                          rated_count += 1
-                     else: error_count += 1; print(f"[Scheduler] ERROR updating DB for {applicant_id} (job {job_id})")
-                 else:
-                     error_count += 1
-                     error_detail = "Incomplete AI response" if isinstance(rating_result, dict) and 'error' not in rating_result else rating_result.get('details', rating_result.get('error', 'Unknown AI error'))
-                     print(f"[Scheduler] ERROR AI rating {applicant_id} (job {job_id}): {error_detail}")
-            except Exception as e: error_count += 1; print(f"[Scheduler] ERROR exception rating {applicant_id} for {job_id}: {e}"); traceback.print_exc()
+        counts = rate_applicants(job_id, unrated_applicants, log_prefix="[Scheduler] ")
+        rated_count = counts['rated_count']; error_count = counts['error_count']; skipped_count = counts['skipped_count']
 
         print(f"[Scheduler] Finished rating for {job_id}. Rated: {rated_count}, Errors: {error_count}, Skipped: {skipped_count}")
 
@@ -177,7 +153,7 @@ def check_jobs_for_batch_analysis():
      # Wrap in app context
      with app.app_context():
         print("[Scheduler] Running check for batch analysis jobs...")
-        jobs_for_batch_check = get_jobs_with_preference('batch')
+        jobs_for_batch_check = get_repository().get_jobs_with_preference('batch')
         if not jobs_for_batch_check:
             # print("[Scheduler] No jobs configured for batch analysis.") # Less verbose
             return
@@ -190,11 +166,11 @@ def check_jobs_for_batch_analysis():
             batch_size = job.get('analysis_batch_size', 5)
             batch_size = max(1, batch_size) # Ensure positive batch size
 
-            all_applicants = get_applicants_for_job(job_id, include_rejected=True)
-            unrated_applicants = [app for app in all_applicants if app.get('rating') is None]
+            job_stats = get_repository().get_job_stats(job_id) # Counts only; no need to load every applicant row
+            unrated_count = job_stats['total'] - job_stats['rated_count']
 
-            if len(unrated_applicants) >= batch_size:
-                print(f"[Scheduler] Job {job_id} meets batch threshold ({len(unrated_applicants)} unrated >= {batch_size}). Triggering analysis.")
+            if unrated_count >= batch_size:
+                print(f"[Scheduler] Job {job_id} meets batch threshold ({unrated_count} unrated >= {batch_size}). Triggering analysis.")
                 # Trigger analysis immediately
                 analyze_job_applicants(job_id)
 
@@ -260,7 +236,7 @@ def load_scheduled_jobs_from_db():
     with app.app_context(): # Need context for DB access
         print("[Scheduler] Loading scheduled analysis jobs from database...")
         try:
-             scheduled_jobs_db = get_jobs_with_preference('scheduled')
+             scheduled_jobs_db = get_repository().get_jobs_with_preference('scheduled')
              count = 0
              for job in scheduled_jobs_db:
                  if job.get('job_status') == 'open': # Only schedule open jobs
@@ -300,9 +276,13 @@ def hr_chat_api():
 
     print(f"Chat API received message: '{user_message}', Page Context: {page_context_job_id}, Session Context: {session_job_id}")
 
-    # 1. Understand Intent and Entities using LLM
+    # 1. Understand Intent and Entities: local rules/keyword model first, LLM only when it is unsure
     current_context_for_nlu = page_context_job_id or session_job_id
-    nlu_result = understand_hr_chat_intent(user_message, current_context_for_nlu)
+    nlu_result = classify_hr_chat_intent(user_message)
+    if nlu_result is None:
+        nlu_result = understand_hr_chat_intent(user_message, current_context_for_nlu)
+        if 'error' not in nlu_result:
+            record_intent_example(user_message, nlu_result) # LLM label becomes training data for the local model
     print(f"NLU Result: {nlu_result}")
 
     if 'error' in nlu_result:
@@ -338,7 +318,7 @@ def hr_chat_api():
     # --- Simple Fuzzy Job ID Matching (Keep as is) ---
     if not effective_job_id and not extracted_job_id and not extracted_email and not extracted_name and len(user_message.split()) <= 3:
         potential_id_part = user_message.upper()
-        all_jobs_list = get_all_jobs() # Renamed local variable
+        all_jobs_list = get_repository().get_all_jobs() # Renamed local variable
         possible_matches = [j['job_id'] for j in all_jobs_list if potential_id_part in j['job_id']]
         if len(possible_matches) == 1:
              effective_job_id = possible_matches[0]
@@ -372,7 +352,7 @@ You can also just type a potential Job ID fragment.
             """
         elif intent == 'set_context': # (Logic adjusted slightly during ID determination)
             if extracted_job_id:
-                job_check = get_job(extracted_job_id)
+                job_check = get_repository().get_job(extracted_job_id)
                 if job_check:
                     session['hr_chat_job_context'] = extracted_job_id # Ensure session is set
                     response_text = f"Okay, focusing on Job ID: **{extracted_job_id}**. Ask for 'overview', 'top candidates', etc."
@@ -382,38 +362,37 @@ You can also just type a potential Job ID fragment.
         elif intent == 'get_overview':
             # --- Multi-Job Overview ---
             if effective_job_id == 'ALL_JOBS':
-                open_jobs = get_all_jobs(status_filter='open') # Focus on open jobs for general status
+                open_jobs = get_repository().get_all_jobs(status_filter='open') # Focus on open jobs for general status
                 if not open_jobs: response_text = "There are currently no open job listings."
                 else:
                     overview_lines = ["**Current Open Job Listing Status:**"]
+                    all_stats = get_repository().get_all_job_stats(status_filter='open') # One GROUP BY query for every listing
                     for job_data in open_jobs: # Use different variable name
                         job_id_loop = job_data['job_id'] # Use different variable name
                         title = job_data.get('title', job_id_loop)
-                        apps = get_applicants_for_job(job_id_loop, include_rejected=True) # Need all for stats
-                        quality_assessment = assess_job_status_quality(job_id_loop) # Use new helper
-                        overview_lines.append(f"- **{title} ({job_id_loop}):** {len(apps)} Applicants. *Assessment:* {quality_assessment}")
+                        job_stats = all_stats.get(job_id_loop) or get_repository().get_job_stats(job_id_loop)
+                        quality_assessment = assess_job_status_quality(job_id_loop, job_stats) # Use new helper
+                        overview_lines.append(f"- **{title} ({job_id_loop}):** {job_stats['total']} Applicants. *Assessment:* {quality_assessment}")
                     response_text = "\n".join(overview_lines)
             # --- Single Job Overview ---
             elif not effective_job_id:
                 response_text = "Which Job ID do you need an overview for? Specify the ID or ask about the 'current job'."
             else:
-                job_data = get_job(effective_job_id) # Use different variable name
+                job_data = get_repository().get_job(effective_job_id) # Use different variable name
                 if not job_data: response_text = f"Sorry, I couldn't find Job ID '{effective_job_id}'."
                 else:
-                    quality_assessment = assess_job_status_quality(effective_job_id) # Use helper
-                    apps = get_applicants_for_job(effective_job_id, include_rejected=True)
-                    total = len(apps)
-                    rated = [a for a in apps if a.get('rating') is not None]
-                    avg_r_str = f"{sum(a['rating'] for a in rated if a.get('rating') is not None) / len(rated):.0f}/100" if rated else "N/A"
-                    counts = {}
-                    for app in apps: counts[app.get('status', 'pending')] = counts.get(app.get('status', 'pending'), 0) + 1
+                    job_stats = get_repository().get_job_stats(effective_job_id)
+                    quality_assessment = assess_job_status_quality(effective_job_id, job_stats) # Use helper
+                    total = job_stats['total']
+                    avg_r_str = f"{job_stats['avg_rating']:.0f}/100" if job_stats['avg_rating'] is not None else "N/A"
+                    counts = job_stats['status_counts']
                     status_counts_str = ", ".join([f"{k.capitalize()}: {v}" for k, v in counts.items()]) if counts else "None"
                     response_text = (
                         f"**Overview for {job_data.get('title', effective_job_id)} ({effective_job_id})**\n"
                         f"- **Assessment:** {quality_assessment}\n" # Added assessment
                         f"- **Job Status:** {job_data.get('job_status', 'Unknown').capitalize()}\n"
                         f"- **Total Apps:** {total}\n"
-                        f"- **Rated Apps:** {len(rated)} (Avg Rating: {avg_r_str})\n"
+                        f"- **Rated Apps:** {job_stats['rated_count']} (Avg Rating: {avg_r_str})\n"
                         f"- **Status Counts:** {status_counts_str}"
                     )
 
@@ -421,7 +400,7 @@ You can also just type a potential Job ID fragment.
             if not effective_job_id or effective_job_id == 'ALL_JOBS':
                  response_text = "Which Job ID do you want the ranking for? Specify the ID or ask about the 'current job'."
             else:
-                job_data = get_job(effective_job_id) # Use different variable name
+                job_data = get_repository().get_job(effective_job_id) # Use different variable name
                 if not job_data: response_text = f"Sorry, I couldn't find Job ID '{effective_job_id}'."
                 else:
                     print(f"Fetching top candidates for job: {effective_job_id}")
@@ -433,13 +412,14 @@ You can also just type a potential Job ID fragment.
                         else:
                             candidates_for_highlight = []
                             valid_ranked_tuples = [r for r in ranked_list if isinstance(r, (tuple, list)) and len(r) >= 3]
+                            # Summaries run concurrently within a latency budget; slow ones fall back to stored rating summaries
+                            summaries = run_summarization_parallel([r[0] for r in valid_ranked_tuples], effective_job_id)
                             for app_tuple in valid_ranked_tuples:
                                 applicant_id, name, rating = app_tuple[0], app_tuple[1], app_tuple[2]
-                                summary_data = run_summarization_direct(applicant_id, effective_job_id)
-                                candidates_for_highlight.append({"applicant_id": applicant_id, "name": name, "rating": rating, "summary": summary_data.get('summary', 'Summary unavailable.')})
+                                candidates_for_highlight.append({"applicant_id": applicant_id, "name": name, "rating": rating, "summary": summaries.get(applicant_id) or 'Summary unavailable.'})
                             highlights = {}
                             if candidates_for_highlight:
-                                structured_jd_data = get_structured_jd(effective_job_id) or {} # Renamed
+                                structured_jd_data = get_repository().get_structured_jd(effective_job_id) or {} # Renamed
                                 highlights = generate_ranking_highlights(candidates_for_highlight, structured_jd_data)
                             response_lines = [f"**Top {len(valid_ranked_tuples)} Rated Applicant(s) for {job_data.get('title', effective_job_id)} ({effective_job_id}):**"]
                             for i, candidate_info in enumerate(candidates_for_highlight):
@@ -455,10 +435,10 @@ You can also just type a potential Job ID fragment.
             elif not effective_job_id or effective_job_id == 'ALL_JOBS': response_text = f"Which Job ID should I check for applicant '{applicant_identifier}'?"
             else:
                 print(f"Getting details for applicant identifier: '{applicant_identifier}' in job '{effective_job_id}'")
-                apps = get_applicants_for_job(effective_job_id, include_rejected=True); applicant_data = None; matches = []
-                if extracted_email: applicant_data = next((a for a in apps if a.get('applicant_id') == extracted_email), None)
+                applicant_data = None; matches = []
+                if extracted_email: applicant_data = get_repository().get_application(extracted_email, effective_job_id)
                 elif extracted_name:
-                     matches = [a for a in apps if extracted_name.lower() in a.get('name', '').lower()]
+                     matches = get_repository().find_applicants_by_name(effective_job_id, extracted_name)
                      if len(matches) == 1: applicant_data = matches[0]
                      elif len(matches) > 1:
                          match_list = [f"- {a.get('name')} ({a.get('applicant_id')})" for a in matches]
@@ -500,21 +480,21 @@ You can also just type a potential Job ID fragment.
 # === Applicant Routes ===
 @app.route('/jobs', methods=['GET'])
 def list_jobs():
-    jobs = get_all_jobs(status_filter='open')
+    jobs = get_repository().get_all_jobs(status_filter='open')
     return render_template('jobs_list.html', jobs=jobs)
 
 @app.route('/job/<job_id>', methods=['GET'])
 def job_detail(job_id):
-    job_data = get_job(job_id) # Renamed variable
+    job_data = get_repository().get_job(job_id) # Renamed variable
     if not job_data: flash(f"Job ID '{job_id}' not found.", "error"); return redirect(url_for('list_jobs'))
     if job_data.get('job_status') != 'open': flash(f"Job '{job_data.get('title', job_id)}' is no longer accepting applications.", "warning"); return redirect(url_for('list_jobs'))
-    structured_jd_data = get_structured_jd(job_id) # Renamed variable
+    structured_jd_data = get_repository().get_structured_jd(job_id) # Renamed variable
     return render_template('job_detail.html', job=job_data, structured_jd=structured_jd_data, rating_result=None, error=None)
 
 @app.route('/check_suitability/<job_id>', methods=['POST'])
 def check_suitability(job_id):
     print(f"Received suitability check request for Job ID: {job_id}")
-    job_data = get_job(job_id); structured_jd_data = get_structured_jd(job_id) # Renamed variables
+    job_data = get_repository().get_job(job_id); structured_jd_data = get_repository().get_structured_jd(job_id) # Renamed variables
     if not job_data: flash(f"Job ID '{job_id}' not found.", "error"); return redirect(url_for('list_jobs'))
     if job_data.get('job_status') != 'open': flash(f"Job '{job_data.get('title', job_id)}' is closed.", "warning"); return redirect(url_for('list_jobs'))
     if 'resume' not in request.files: flash("Missing 'resume' file for check.", "error"); return render_template('job_detail.html', job=job_data, structured_jd=structured_jd_data, error="No file provided.")
@@ -555,7 +535,7 @@ def check_suitability(job_id):
 @app.route('/apply/<job_id>', methods=['POST'])
 def apply_for_job(job_id):
     print(f"Received application submission for Job ID: {job_id}")
-    job_data = get_job(job_id) # Renamed variable
+    job_data = get_repository().get_job(job_id) # Renamed variable
     if not job_data: flash(f"Cannot apply: Job ID '{job_id}' not found.", "error"); return redirect(url_for('list_jobs'))
     if job_data.get('job_status') != 'open': flash(f"Sorry, job '{job_data.get('title', job_id)}' is no longer accepting applications.", "warning"); return redirect(url_for('job_detail', job_id=job_id))
 
@@ -580,7 +560,7 @@ def apply_for_job(job_id):
     except Exception as e: print(f"Error saving application file: {e}"); flash(f"Could not save application resume.", "error"); return redirect(url_for('job_detail', job_id=job_id))
 
     applicant_id = applicant_email # Use email as ID
-    profile_saved = add_applicant(applicant_id, applicant_name, filename_for_db)
+    profile_saved = get_repository().add_applicant(applicant_id, applicant_name, filename_for_db)
     if not profile_saved:
          flash("Database error saving profile (maybe email already exists with different resume?).", "error")
          if save_path and os.path.exists(save_path):
@@ -591,7 +571,7 @@ def apply_for_job(job_id):
                  print(f"Error cleaning file after DB profile error: {del_e}")
          return redirect(url_for('job_detail', job_id=job_id))
 
-    application_recorded = add_application(applicant_id, job_id)
+    application_recorded = get_repository().add_application(applicant_id, job_id)
     if application_recorded is True:
          flash(f"Application for '{job_data.get('title', job_id)}' submitted!", "success")
     elif application_recorded is False:
@@ -629,7 +609,7 @@ def hr_dashboard(): return render_template('hr_dashboard.html')
 @app.route('/hr/jobs', methods=['GET'])
 # @login_required
 def hr_list_jobs():
-    jobs = get_all_jobs()
+    jobs = get_repository().get_all_jobs()
     return render_template('hr_jobs_list.html', jobs=jobs)
 
 @app.route('/hr/job/create', methods=['GET'])
@@ -728,7 +708,7 @@ def hr_create_job():
     if not title: title = f"Job {job_id}" # Use Job ID if title still missing
 
     # --- Save to Database (pass preferences) ---
-    if add_job(job_id=job_id, title=title, description_text=job_description_source,
+    if get_repository().add_job(job_id=job_id, title=title, description_text=job_description_source,
                structured_jd_dict=structured_jd, analysis_preference=analysis_pref,
                analysis_schedule=analysis_schedule_time, analysis_batch_size=analysis_batch_size):
         flash(f"Job '{job_id}' created/updated successfully!{' (Warning: AI structuring failed)' if error_in_struct else ''}", "success")
@@ -746,22 +726,32 @@ def hr_create_job():
 @app.route('/hr/job/<job_id>/applicants', methods=['GET'])
 # @login_required
 def hr_view_applicants(job_id):
-    job_data = get_job(job_id)
+    job_data = get_repository().get_job(job_id)
     if not job_data: flash(f"Job ID '{job_id}' not found.", "error"); return redirect(url_for('hr_list_jobs'))
 
     show_rejected = request.args.get('show_rejected', 'false').lower() == 'true'
-    applicants = get_applicants_for_job(job_id, include_rejected=show_rejected)
-    if applicants is None: applicants = []
-
-    # Calculate progress stats more comprehensively
-    all_apps = get_applicants_for_job(job_id, include_rejected=True) # Need all for stats
-    all_apps_count = len(all_apps)
-    all_rated_count = len([a for a in all_apps if a.get('rating') is not None])
-    shortlisted_count = len([a for a in all_apps if a.get('status') == 'shortlisted'])
+    # Paging/filter params (keyset cursor: page cost is independent of applicant count)
+    page_cursor = request.args.get('cursor') or None
+    filter_by = request.args.get('filter', 'all')
+    if filter_by not in APPLICANT_PAGE_FILTERS: filter_by = 'all'
+    sort = request.args.get('sort', 'date')
+    if sort not in APPLICANT_PAGE_SORTS: sort = 'date'
+    try: per_page = int(request.args.get('per_page', 50))
+    except ValueError: per_page = 50
+    applicants_page = get_repository().get_applicants_page(job_id, limit=per_page, cursor=page_cursor, filter_by=filter_by,
+                                          sort=sort, include_rejected=show_rejected)
+    applicants = applicants_page['applicants']
+
+    # Calculate progress stats in SQL (covers all applications, including rejected)
+    job_stats = get_repository().get_job_stats(job_id)
+    all_apps_count = job_stats['total']
+    all_rated_count = job_stats['rated_count']
+    status_counts = job_stats['status_counts']
+    shortlisted_count = status_counts.get('shortlisted', 0)
     # Add counts for other statuses if needed for progress bar/display
-    selected_count = len([a for a in all_apps if a.get('status') == 'selected'])
-    hired_count = len([a for a in all_apps if a.get('status') == 'hired'])
-    pending_count = len([a for a in all_apps if a.get('status') == 'pending']) # Explicitly count pending
+    selected_count = status_counts.get('selected', 0)
+    hired_count = status_counts.get('hired', 0)
+    pending_count = status_counts.get('pending', 0) # Explicitly count pending
 
     progress = {
         "total": all_apps_count,
@@ -807,6 +797,10 @@ def hr_view_applicants(job_id):
                            # job_closing_date=job_data.get('closing_date', 'N/A'),
                            applicants=applicants_for_template, # Use enhanced list
                            show_rejected=show_rejected,
+                           filter_by=filter_by, sort=sort, per_page=per_page,
+                           page_filters=APPLICANT_PAGE_FILTERS,
+                           is_first_page=page_cursor is None,
+                           next_cursor=applicants_page['next_cursor'],
                            job_status=job_data.get('job_status'),
                            progress=progress) # Pass progress stats
 
@@ -821,30 +815,16 @@ def hr_get_applicant_details_for_modal(applicant_id, job_id):
     if not applicant_id or not job_id: return jsonify({"error": "Missing identifiers."}), 400
 
     # 1. Get basic application data (status, rating etc.)
-    all_apps = get_applicants_for_job(job_id, include_rejected=True)
-    app_data = next((dict(a) for a in all_apps if a.get('applicant_id') == applicant_id), None)
+    app_data = get_repository().get_application(applicant_id, job_id)
 
     if not app_data: return jsonify({"error": "Application not found."}), 404
 
-    # 2. Get structured resume (if available) for more details like experience/skills
-    #   (You might need more specific DB queries if performance becomes an issue)
-    structured_resume = get_structured_resume(applicant_id)
-    experience_years = None
-    skills_list = []
-    education_list = []
-    if structured_resume and isinstance(structured_resume, dict):
-        # Example: Try to extract years of experience - this needs robust parsing logic
-        exp_list = structured_resume.get('experience', [])
-        if exp_list: # Very basic sum - needs proper duration parsing!
-            total_exp = 0
-            for exp in exp_list:
-                 # Placeholder: This requires parsing "duration" strings like "2 years", "6 months"
-                 # For now, just count number of roles or assume 1 year per role listed
-                 total_exp += 1 # Simple count for demo
-            experience_years = total_exp # Assign calculated years
-
-        skills_list = structured_resume.get('skills', [])
-        education_list = structured_resume.get('education', [])
+    # 2. Get hot structured-resume fields (experience/skills/education/phone) from generated columns
+    profile = get_repository().get_applicant_profile(applicant_id) or {}
+    # Number of roles listed stands in for years until durations are parsed properly
+    experience_years = profile.get('experience_count') or None
+    skills_list = profile.get('skills', [])
+    education_list = profile.get('education', [])
 
 
     # 3. Get AI Summary
@@ -869,7 +849,7 @@ def hr_get_applicant_details_for_modal(applicant_id, job_id):
         "skills": skills_list, # Add extracted skills
         "education": education_list, # Add extracted education
         # Add other fields as needed (e.g., phone from structured_resume if available)
-        "phone": structured_resume.get('contact_info', {}).get('phone') if structured_resume else None,
+        "phone": profile.get('resume_phone'),
     }
 
     return jsonify(details)
@@ -880,15 +860,14 @@ def hr_rate_applicant(applicant_id, job_id):
     try: applicant_id = unquote(applicant_id)
     except Exception as e: print(f"Error decoding applicant_id '{applicant_id}': {e}"); flash("Invalid applicant identifier.", "error"); return redirect(url_for('hr_view_applicants', job_id=job_id))
 
-    job_data = get_job(job_id); # Renamed
+    job_data = get_repository().get_job(job_id); # Renamed
     if not job_data: flash(f"Job '{job_id}' not found.", "error"); return redirect(url_for('hr_list_jobs'))
     if job_data.get('job_status') != 'open': flash(f"Job '{job_data.get('title', job_id)}' is not open.", "warning"); return redirect(url_for('hr_view_applicants', job_id=job_id))
 
-    apps_check = get_applicants_for_job(job_id, include_rejected=True)
-    applicant_exists = next((app for app in apps_check if app.get('applicant_id') == applicant_id), None)
+    applicant_exists = get_repository().get_application(applicant_id, job_id)
     if not applicant_exists: flash(f"Applicant {applicant_id} not found for job {job_id}.", "error"); return redirect(url_for('hr_view_applicants', job_id=job_id))
 
-    resume_filename = get_resume_path(applicant_id)
+    resume_filename = applicant_exists.get('resume_file_path') # Already joined in by get_application
     if not resume_filename: flash(f"No resume path for {applicant_id}.", "error"); return redirect(url_for('hr_view_applicants', job_id=job_id))
 
     resume_full_path = os.path.join(UPLOAD_FOLDER, secure_filename(resume_filename))
@@ -898,11 +877,21 @@ def hr_rate_applicant(applicant_id, job_id):
     try:
         flash(f"Initiating AI rating for {applicant_id}...", "info")
         print(f"Running suitability check (HR Trigger): J:{job_id}, R:{resume_full_path}")
-        rating_result = run_suitability_check_direct(resume_file_path=resume_full_path, job_id=job_id)
+        # Single flight: if a bulk run or another click is already rating this application, share its result
+        rating_result, must_save = rate_application_once(
+            applicant_id, job_id,
+            lambda: run_suitability_check_direct(resume_file_path=resume_full_path, job_id=job_id, applicant_id=applicant_id),
+            log_prefix="[HR Rate] ")
         # print(f"Rating check result: {rating_result}") # Less verbose
         if isinstance(rating_result, dict) and 'error' not in rating_result and all(k in rating_result for k in ['rating', 'summary', 'fits', 'lacks']):
-            if update_application_rating(applicant_id, job_id, rating_result): flash(f"Successfully rated {applicant_id}.", "success")
-            else: flash(f"Failed to update database for {applicant_id}.", "error")
+            if not must_save: flash(f"{applicant_id} was already being rated; using that result.", "success")
+            else:
+                saved = get_repository().update_application_rating(applicant_id, job_id, rating_result) # Also ends the DB claim
+                finish_application_rating(applicant_id, job_id, saved)
+                if saved: flash(f"Successfully rated {applicant_id}.", "success")
+                else: flash(f"Failed to update database for {applicant_id}.", "error")
+        elif isinstance(rating_result, dict) and rating_result.get('in_progress'): # Another worker holds the claim (bounded wait)
+            flash(f"{applicant_id} is being rated by another worker; refresh shortly to see the result.", "info")
         elif isinstance(rating_result, dict) and 'error' in rating_result: flash(f"AI Error for {applicant_id}: {rating_result.get('details', rating_result['error'])}", "error")
         else: flash(f"Unexpected AI result for {applicant_id}.", "error"); print(f"Unexpected AI result: {rating_result}")
     except Exception as e: print(f"Error during HR rating workflow {applicant_id}: {e}"); flash(f"Internal error during rating: {e}", "error"); traceback.print_exc()
@@ -913,55 +902,36 @@ def hr_rate_applicant(applicant_id, job_id):
 @app.route('/hr/rate_all_unrated/<job_id>', methods=['POST'])
 # @login_required
 def hr_rate_all_unrated(job_id):
-    """Rates all applicants for a job whose rating is currently NULL."""
-    job_data = get_job(job_id) # Renamed
+    """Queues a background task rating every applicant of the job whose rating is NULL.
+    Returns 202 with the task id; poll /hr/tasks/<task_id> for progress."""
+    job_data = get_repository().get_job(job_id) # Renamed
     if not job_data:
         return jsonify({"success": False, "message": f"Job ID '{job_id}' not found."}), 404
     if job_data.get('job_status') != 'open':
         return jsonify({"success": False, "message": f"Job '{job_data.get('title', job_id)}' is not open."}), 400
 
     print(f"Processing request to rate all unrated for {job_id}.")
-    all_applicants = get_applicants_for_job(job_id, include_rejected=True)
+    all_applicants = get_repository().get_applicants_for_job(job_id, include_rejected=True)
     unrated_applicants = [app for app in all_applicants if app.get('rating') is None]
 
     if not unrated_applicants:
         return jsonify({"success": True, "message": "No applicants need rating.", "rated_count": 0, "error_count": 0, "skipped_count": 0})
 
-    print(f"Found {len(unrated_applicants)} unrated applicants for job {job_id}. Starting rating process...")
-    rated_count = 0; error_count = 0; skipped_count = 0
-    for applicant in unrated_applicants:
-        applicant_id = applicant.get('applicant_id')
-        if not applicant_id: skipped_count += 1; print(f"Warning: Skipping applicant with missing ID in job {job_id}."); continue
-
-        # print(f"Rating applicant {applicant_id}...") # Less verbose
-        resume_filename = get_resume_path(applicant_id)
-        if not resume_filename: skipped_count += 1; print(f"Skipping {applicant_id} (job {job_id}): No resume path."); continue
-
-        resume_full_path = os.path.join(UPLOAD_FOLDER, secure_filename(resume_filename))
-        if not os.path.exists(resume_full_path): skipped_count += 1; print(f"Skipping {applicant_id} (job {job_id}): Resume file missing ({resume_filename})."); continue
-
-        try:
-             rating_result = run_suitability_check_direct(resume_file_path=resume_full_path, job_id=job_id)
-             if isinstance(rating_result, dict) and 'error' not in rating_result and all(k in rating_result for k in ['rating', 'summary', 'fits', 'lacks']):
-                 if update_application_rating(applicant_id, job_id, rating_result):
-                      rated_count += 1;
-                 else: error_count += 1; print(f"ERROR updating DB for {applicant_id} (job {job_id})")
-             else:
-                 error_count += 1
-                 error_detail = "Incomplete AI response" if isinstance(rating_result, dict) and 'error' not in rating_result else rating_result.get('details', rating_result.get('error', 'Unknown AI error'))
-                 print(f"ERROR AI rating {applicant_id} (job {job_id}): {error_detail}")
-        except Exception as e: error_count += 1; print(f"ERROR exception rating {applicant_id} for {job_id}: {e}"); traceback.print_exc()
-
-    result_message = f"Rating process finished for {job_id}. Rated: {rated_count}, Errors: {error_count}, Skipped: {skipped_count}."
-    print(result_message)
-    # Flash is not useful for AJAX request, return in JSON
+    # Rate the strongest skill matches first (SQL pre-ranking, no LLM)
+    skill_order = {r['applicant_id']: i for i, r in enumerate(get_repository().match_applicants_by_skills(job_id))}
+    unrated_applicants.sort(key=lambda a: skill_order.get(a.get('applicant_id'), len(skill_order)))
+    print(f"Found {len(unrated_applicants)} unrated applicants for job {job_id}. Queuing background rating...")
+    task_id, created = submit_rating_task(job_id, unrated_applicants, 'rate_all', log_prefix="[Rate All] ")
+    if not task_id:
+        return jsonify({"success": False, "message": "Could not start the rating task (database error)."}), 500
+    result_message = (f"Rating started in the background for {len(unrated_applicants)} applicant(s)." if created
+                      else "A rating run for this job is already in progress.")
     return jsonify({
         "success": True,
         "message": result_message,
-        "rated_count": rated_count,
-        "error_count": error_count,
-        "skipped_count": skipped_count
-    })
+        "task_id": task_id,
+        "status_url": url_for('hr_rating_task_status', task_id=task_id)
+    }), 202
 
 
 @app.route('/hr/summary/<path:applicant_id>/<job_id>', methods=['GET']) # Use path for ID
@@ -973,11 +943,10 @@ def hr_get_summary(applicant_id, job_id):
     if not applicant_id or not job_id: return jsonify({"error": "Applicant ID and Job ID are required."}), 400
 
     # Check application exists
-    apps_check = get_applicants_for_job(job_id, include_rejected=True)
-    if not any(app.get('applicant_id') == applicant_id for app in apps_check): return jsonify({"error": f"Applicant {applicant_id} not found for job {job_id}."}), 404
+    if not get_repository().get_application(applicant_id, job_id): return jsonify({"error": f"Applicant {applicant_id} not found for job {job_id}."}), 404
 
     # Check job exists
-    job_data = get_job(job_id); # Renamed
+    job_data = get_repository().get_job(job_id); # Renamed
     if not job_data: return jsonify({"error": f"Job ID '{job_id}' not found."}), 404
 
     summary_result = {}
@@ -1000,7 +969,7 @@ def hr_get_summary(applicant_id, job_id):
 @app.route('/hr/job/<job_id>/ranked', methods=['GET'])
 # @login_required
 def hr_view_ranked_applicants(job_id):
-    job_data = get_job(job_id) # Renamed
+    job_data = get_repository().get_job(job_id) # Renamed
     if not job_data: flash(f"Job ID '{job_id}' not found.", "error"); return redirect(url_for('hr_list_jobs'))
     try: top_n = int(request.args.get('n', 10)); top_n = max(1, top_n)
     except ValueError: top_n = 10
@@ -1014,57 +983,53 @@ def hr_view_ranked_applicants(job_id):
         else: error_msg = "Invalid 'ranked_applicants' format."
     else: error_msg = "Unexpected result format from ranking."
     if error_msg: flash(f"Could not retrieve ranked: {error_msg}", "warning")
-    return render_template('hr_job_ranked_applicants.html', job_id=job_id, job_title=job_data.get('title', job_id), applicants=applicants, top_n=top_n, is_filtered_view=False)
+    is_filtered_view = request.args.get('filtered') == '1' # Landing page of a finished Filter & Rank task
+    return render_template('hr_job_ranked_applicants.html', job_id=job_id, job_title=job_data.get('title', job_id), applicants=applicants, top_n=top_n, is_filtered_view=is_filtered_view)
+
+
+@app.route('/hr/tasks/<task_id>', methods=['GET'])
+# @login_required
+def hr_rating_task_status(task_id):
+    """Progress of a background rating task: status, rated/error/skipped counts, throughput and ETA.
+    Finished Filter & Rank tasks include result_url (the top-M ranked view)."""
+    task = get_repository().get_rating_task(task_id)
+    if not task: return jsonify({"success": False, "error": f"Rating task '{task_id}' not found."}), 404
+    progress = rating_task_progress(task)
+    progress.pop('params', None)
+    progress['success'] = True
+    progress['result_url'] = None
+    if task['status'] == 'done' and task['kind'] == 'filter_relevant':
+        progress['result_url'] = url_for('hr_view_ranked_applicants', job_id=task['job_id'], n=task['params'].get('top_m', 5), filtered=1)
+    return jsonify(progress)
 
 
 @app.route('/hr/job/<job_id>/filter_relevant', methods=['POST'])
 # @login_required
 def hr_filter_relevant_applicants(job_id):
-    job_data = get_job(job_id) # Renamed
+    job_data = get_repository().get_job(job_id) # Renamed
     if not job_data: flash(f"Job ID '{job_id}' not found.", "error"); return redirect(url_for('hr_list_jobs'))
     if job_data.get('job_status') != 'open': flash(f"Job '{job_data.get('title', job_id)}' is not open.", "warning"); return redirect(url_for('hr_view_applicants', job_id=job_id))
     try: m = int(request.form.get('top_m', 5)); m = max(1, m)
     except ValueError: m = 5; flash("Invalid number for 'Top M', defaulting to 5.", "warning")
     print(f"Filter & Rank request: Job {job_id}, Top M = {m}")
-    flash(f"Processing request to find top {m} applicants for {job_id}. Rating unrated applicants first...", "info")
 
     # Get only non-rejected applicants to consider for rating/ranking
-    applicants_to_consider = get_applicants_for_job(job_id, include_rejected=False)
+    applicants_to_consider = get_repository().get_applicants_for_job(job_id, include_rejected=False)
     if not applicants_to_consider: flash(f"No non-rejected applicants found for job {job_id}.", "warning"); return redirect(url_for('hr_view_applicants', job_id=job_id))
-
-    rated_count = 0; error_count = 0; skipped_count = 0; already_rated_count = 0
-    # --- Rating Loop (only rate those in the non-rejected list that are unrated) ---
-    for applicant in applicants_to_consider:
-        if applicant.get('rating') is None:
-            applicant_id = applicant.get('applicant_id')
-            if not applicant_id: skipped_count += 1; print(f"Skipping rating for applicant with missing ID in job {job_id}."); continue
-
-            resume_filename = get_resume_path(applicant_id)
-            if not resume_filename: skipped_count+=1; print(f"Skipping rating for {applicant_id} (job {job_id}): No resume path."); continue
-
-            resume_full_path = os.path.join(UPLOAD_FOLDER, secure_filename(resume_filename))
-            if not os.path.exists(resume_full_path): skipped_count+=1; print(f"Skipping rating for {applicant_id} (job {job_id}): Resume file missing."); continue
-
-            print(f"Rating applicant {applicant_id} for job {job_id} (Filter & Rank)...")
-            try:
-                 rating_result = run_suitability_check_direct(resume_file_path=resume_full_path, job_id=job_id)
-                 if isinstance(rating_result, dict) and 'error' not in rating_result and all(k in rating_result for k in ['rating', 'summary', 'fits', 'lacks']):
-                     if update_application_rating(applicant_id, job_id, rating_result): rated_count += 1
-                     else: error_count += 1; print(f"ERROR updating DB for {applicant_id} (job {job_id})")
-                 else:
-                      error_count += 1
-                      error_detail = "Incomplete AI response" if isinstance(rating_result, dict) and 'error' not in rating_result else rating_result.get('details', rating_result.get('error', 'Unknown AI error'))
-                      print(f"ERROR AI rating {applicant_id} (job {job_id}): {error_detail}")
-            except Exception as e: error_count += 1; print(f"ERROR exception rating {applicant_id} for {job_id}: {e}"); traceback.print_exc()
+    # Rate the strongest skill matches first (SQL pre-ranking, no LLM)
+    skill_order = {r['applicant_id']: i for i, r in enumerate(get_repository().match_applicants_by_skills(job_id, include_rejected=False))}
+    applicants_to_consider.sort(key=lambda a: skill_order.get(a.get('applicant_id'), len(skill_order)))
+
+    # --- Rating (only the non-rejected applicants that are unrated) runs in the background ---
+    unrated_applicants = [a for a in applicants_to_consider if a.get('rating') is None]
+    if unrated_applicants:
+        print(f"Filter&Rank: {len(applicants_to_consider) - len(unrated_applicants)} already rated, queuing {len(unrated_applicants)} for rating.")
+        task_id, created = submit_rating_task(job_id, unrated_applicants, 'filter_relevant', params={"top_m": m}, log_prefix="[Filter&Rank] ")
+        if not task_id: flash("Could not start rating (database error). Showing currently rated applicants.", "danger")
         else:
-            already_rated_count += 1 # Count those already rated in the considered list
-
-    print(f"Filter&Rank Rating stats: Rated now={rated_count}, Already rated={already_rated_count}, Errors={error_count}, Skipped={skipped_count}")
-    flash_msgs = []
-    if rated_count > 0: flash_msgs.append(f"AI analysis completed for {rated_count} applicant(s).")
-    if error_count > 0: flash(f"Encountered errors during rating for {error_count} applicant(s).", "danger")
-    if skipped_count > 0: flash(f"Skipped rating for {skipped_count} applicant(s) due to missing info.", "warning")
-    if flash_msgs: flash(" ".join(flash_msgs), "info")
+            if created: flash(f"Rating {len(unrated_applicants)} unrated applicant(s) in the background. The top {m} will open when it finishes.", "info")
+            else: flash("A Filter & Rank run for this job is already in progress.", "info")
+            return redirect(url_for('hr_view_applicants', job_id=job_id, rating_task=task_id))
 
     # --- Ranking after rating ---
     print(f"Fetching top {m} ranked non-rejected applicants...")
@@ -1090,14 +1055,13 @@ def update_status(applicant_id, job_id):
     allowed_statuses = ['pending', 'shortlisted', 'rejected', 'selected', 'hired']
     if not new_status or new_status not in allowed_statuses: return jsonify({"success": False, "error": f"Invalid status '{new_status}'."}), 400
 
-    if update_application_status(applicant_id, job_id, new_status):
+    if get_repository().update_application_status(applicant_id, job_id, new_status):
         # print(f"Status updated successfully for {applicant_id} to {new_status}") # Less verbose
         return jsonify({"success": True, "new_status": new_status})
     else:
         print(f"Failed to update status for {applicant_id}")
         # Check if application actually exists before claiming DB error
-        apps_check = get_applicants_for_job(job_id, include_rejected=True)
-        applicant_exists = any(app.get('applicant_id') == applicant_id for app in apps_check)
+        applicant_exists = get_repository().get_application(applicant_id, job_id) is not None
         error_msg = "Applicant/application not found." if not applicant_exists else "Failed to update status (DB error)."
         status_code = 404 if not applicant_exists else 500
         return jsonify({"success": False, "error": error_msg}), status_code
@@ -1106,11 +1070,11 @@ def update_status(applicant_id, job_id):
 # @login_required
 def finalize_job(job_id):
     print(f"Request to finalize job: {job_id}")
-    job_data = get_job(job_id) # Renamed
+    job_data = get_repository().get_job(job_id) # Renamed
     if not job_data: flash(f"Job ID '{job_id}' not found.", "error"); return redirect(url_for('hr_list_jobs'))
     if job_data.get('job_status') != 'open': flash(f"Job '{job_data.get('title', job_id)}' is already {job_data.get('job_status', 'not open')}.", "warning"); return redirect(url_for('hr_view_applicants', job_id=job_id))
 
-    shortlisted_applicants = get_applications_by_status(job_id, 'shortlisted')
+    shortlisted_applicants = get_repository().get_applications_by_status(job_id, 'shortlisted')
     if not shortlisted_applicants: flash("No applicants shortlisted. Please shortlist candidates first.", "warning"); return redirect(url_for('hr_view_applicants', job_id=job_id))
 
     print(f"Found {len(shortlisted_applicants)} shortlisted applicants.")
@@ -1120,7 +1084,7 @@ def finalize_job(job_id):
         applicant_id = applicant.get('applicant_id'); applicant_name = applicant.get('name') or 'Candidate'
         if not applicant_id: failed_status_updates += 1; print("Warning: Skipping shortlisted applicant with missing ID."); continue
 
-        if update_application_status(applicant_id, job_id, 'selected'):
+        if get_repository().update_application_status(applicant_id, job_id, 'selected'):
             if mail: # Check if mail is configured
                 try:
                     company_name = os.environ.get("COMPANY_NAME", "Our Company")
@@ -1150,7 +1114,7 @@ The Hiring Team
             else: print(f"Skipping email to {applicant_id} (Mail not configured).")
         else: print(f"ERROR: Failed to update status to 'selected' for {applicant_id}"); failed_status_updates += 1
 
-    if not update_job_status(job_id, 'closed'): flash(f"Failed to update job status for {job_id} to 'closed'.", "error")
+    if not get_repository().update_job_status(job_id, 'closed'): flash(f"Failed to update job status for {job_id} to 'closed'.", "error")
     else:
         print(f"Job {job_id} status updated to 'closed'.")
         # Remove any scheduled jobs for this job_id as it's closed
@@ -1170,7 +1134,7 @@ The Hiring Team
 def reopen_job(job_id):
     """Sets a job's status back to 'open'."""
     print(f"Request received to re-open job: {job_id}")
-    job_data = get_job(job_id) # Fetch current job details
+    job_data = get_repository().get_job(job_id) # Fetch current job details
     if not job_data:
         flash(f"Job ID '{job_id}' not found.", "error")
         return redirect(url_for('hr_list_jobs'))
@@ -1179,7 +1143,7 @@ def reopen_job(job_id):
     if job_data.get('job_status') == 'open':
         flash(f"Job '{job_data.get('title', job_id)}' is already open.", "info")
     elif job_data.get('job_status') in ['closed', 'filled']:
-        if update_job_status(job_id, 'open'):
+        if get_repository().update_job_status(job_id, 'open'):
             flash(f"Job '{job_data.get('title', job_id)}' has been re-opened.", "success")
              # Re-evaluate scheduler for this job using stored preferences
             update_scheduler_for_job(
@@ -1198,8 +1162,9 @@ def reopen_job(job_id):
 
 # --- Run the Flask App ---
 if __name__ == '__main__':
-    # Initialize DB first
-    init_db()
+    # Initialize DB first (creates/migrates the schema of whichever backend PORTAL_DATABASE_URL selects)
+    get_repository().init_schema()
+    print(f"LLM chains ready: {warm_chains()}")
 
     # Configure and start Scheduler *after* app initialization but *before* run
     try:
@@ -1223,6 +1188,7 @@ if __name__ == '__main__':
 
         # Register shutdown hook
         atexit.register(lambda: scheduler.shutdown())
+        atexit.register(shutdown_rating_executor) # Let in-flight ratings finish and save
         print("[Scheduler] Registered shutdown hook.")
 
     except Exception as scheduler_e:
@@ -2,102 +2,304 @@
 import sqlite3
 import json
 import os
+import base64
+import re
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 import traceback # For more detailed error printing
 
 # Define the database file name
 DB_FILE = 'job_portal.db'
 
+# --- Connection Pool Settings ---
+DB_POOL_SIZE = 8                 # Idle connections kept per database file
+DB_STATEMENT_CACHE = 256         # Compiled statements cached per connection (reused across calls)
+DB_CACHE_SIZE_KB = 16000         # Page cache per connection (PRAGMA cache_size, negative = KiB)
+DB_MMAP_SIZE = 128 * 1024 * 1024 # Memory-mapped I/O window in bytes
+
+_pools = {} # abspath(DB_FILE) -> LifoQueue of idle, already-configured connections
+_pools_lock = threading.Lock()
+
+def _configure_connection(conn):
+    """Applies per-connection settings. Runs once per connection, not per query."""
+    # Return rows as dictionary-like objects for easier access
+    conn.row_factory = sqlite3.Row
+    # Explicitly enable Write-Ahead Logging (WAL) for better concurrency
+    conn.execute("PRAGMA journal_mode=WAL;")
+    # Set busy_timeout to handle potential locking issues better with WAL
+    conn.execute("PRAGMA busy_timeout = 5000;") # 5000 ms = 5 seconds
+    # NORMAL is durable across app crashes in WAL mode and skips an fsync per commit
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB};")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE};")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    return conn
+
 def get_db_connection():
-    """Establishes a connection to the SQLite database."""
+    """Establishes a new, unpooled connection to the SQLite database. Caller must close it.
+    Prefer db_connection(), which reuses pooled connections."""
     conn = None
     try:
-        # Increased timeout slightly, kept check_same_thread=False for Flask
-        conn = sqlite3.connect(DB_FILE, timeout=15, check_same_thread=False)
-        # Return rows as dictionary-like objects for easier access
-        conn.row_factory = sqlite3.Row
-        # Explicitly enable Write-Ahead Logging (WAL) for better concurrency
-        conn.execute("PRAGMA journal_mode=WAL;")
-        # Set busy_timeout to handle potential locking issues better with WAL
-        conn.execute("PRAGMA busy_timeout = 5000;") # 5000 ms = 5 seconds
+        # Increased timeout slightly, kept check_same_thread=False for Flask (pooled connections move between threads)
+        conn = sqlite3.connect(DB_FILE, timeout=15, check_same_thread=False,
+                               cached_statements=DB_STATEMENT_CACHE)
+        _configure_connection(conn)
         # print("DB Connection established with WAL mode and busy_timeout.") # Less verbose
     except sqlite3.Error as e:
         print(f"DATABASE CONNECTION ERROR: {e}")
         traceback.print_exc() # Print full traceback for connection errors
+        if conn:
+            conn.close()
     return conn
 
-def init_db():
-    """Initializes the database and creates tables if they don't exist."""
-    print(f"Checking/Initializing database at: {os.path.abspath(DB_FILE)}")
-    conn = None # Initialize conn outside try
+def _get_pool():
+    key = os.path.abspath(DB_FILE) # Keyed by file so switching DB_FILE (tests) gets fresh connections
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+        return _pools[key]
+
+@contextmanager
+def db_connection():
+    """Borrows a configured connection from the pool and returns it afterwards.
+    Use 'with conn:' inside the block for transactions. Raises sqlite3.Error if no connection can be made."""
+    pool = _get_pool()
     try:
+        conn = pool.get_nowait()
+    except queue.Empty:
         conn = get_db_connection()
-        if conn is None: raise sqlite3.Error("Failed to get DB connection for init.") # Check if connection failed
-        cursor = conn.cursor()
-
-        # --- Modify Job Postings Table ---
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS jobs (
-            job_id TEXT PRIMARY KEY,
-            title TEXT NOT NULL,
-            description_text TEXT,
-            structured_jd TEXT,   -- Store structured JD as JSON string
-            date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
-            job_status TEXT DEFAULT 'open' NOT NULL, -- Existing status
-            analysis_preference TEXT DEFAULT 'manual' NOT NULL, -- NEW: 'manual', 'scheduled', 'batch'
-            analysis_schedule TEXT,                         -- NEW: e.g., '23:00' for scheduled
-            analysis_batch_size INTEGER                     -- NEW: e.g., 5 for batch
-        )''')
-        # Add new columns if table already exists (idempotent add)
-        try: cursor.execute("ALTER TABLE jobs ADD COLUMN analysis_preference TEXT DEFAULT 'manual' NOT NULL;")
-        except sqlite3.OperationalError: pass # Ignore error if column already exists
-        try: cursor.execute("ALTER TABLE jobs ADD COLUMN analysis_schedule TEXT;")
-        except sqlite3.OperationalError: pass
-        try: cursor.execute("ALTER TABLE jobs ADD COLUMN analysis_batch_size INTEGER;")
-        except sqlite3.OperationalError: pass
-        print("Table 'jobs' checked/created/updated.")
-        # --- End Modification ---
-
-        # Applicants Table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS applicants (
-            applicant_id TEXT PRIMARY KEY, -- Using email from form
-            name TEXT,
-            resume_file_path TEXT UNIQUE NOT NULL, -- Store filename only, ensure uniqueness
-            structured_resume TEXT,  -- Store structured resume as JSON string (can be generated later)
-            date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
-        )''')
-        print("Table 'applicants' checked/created.")
-
-        # Applications Table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS applications (
-            application_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            applicant_id TEXT NOT NULL, -- References applicants.applicant_id (email)
-            job_id TEXT NOT NULL,       -- References jobs.job_id
-            application_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
-            rating INTEGER,             -- AI Rating (0-100, initially NULL)
-            rating_details TEXT,        -- JSON details of rating (initially NULL)
-            status TEXT DEFAULT 'pending' NOT NULL, -- Added status column (pending, shortlisted, rejected, selected, hired)
-            FOREIGN KEY (applicant_id) REFERENCES applicants (applicant_id) ON DELETE CASCADE,
-            FOREIGN KEY (job_id) REFERENCES jobs (job_id) ON DELETE CASCADE,
-            UNIQUE (applicant_id, job_id) -- An applicant applies only once per job
-        )''')
-        # Add indices for faster lookups
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_app_job_id ON applications (job_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_app_applicant_id ON applications (applicant_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_app_status ON applications (status)") # Index on status
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_app_job_status ON applications (job_id, status)") # Composite index
-        print("Table 'applications' checked/created.")
+    if conn is None:
+        raise sqlite3.Error("Failed to get DB connection.")
+    try:
+        yield conn
+    finally:
+        try:
+            if conn.in_transaction:
+                conn.rollback() # Never hand out a connection with a half-finished transaction
+            pool.put_nowait(conn)
+        except (sqlite3.Error, queue.Full):
+            conn.close() # Broken or pool already full
+
+def close_all_connections():
+    """Closes every idle pooled connection (e.g. at shutdown or before deleting a DB file)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    _schema_ready.clear() # A deleted/replaced DB file must be re-checked by the next init_db()
+    for pool in pools:
+        while True:
+            try: pool.get_nowait().close()
+            except queue.Empty: break
+            except sqlite3.Error: pass
+
+# === Schema Migrations ===
+# Each migration runs once per database, in order, and is recorded in schema_version.
+# Migrations must be idempotent (IF NOT EXISTS / column checks) so databases created by the
+# old unversioned init_db can be brought under version control by replaying them.
+# To change the schema, append a new (version, description, function) entry; never edit shipped ones.
+
+def _migration_001_base_tables(conn):
+    cursor = conn.cursor()
+    # --- Modify Job Postings Table ---
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        description_text TEXT,
+        structured_jd TEXT,   -- Store structured JD as JSON string
+        date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+        job_status TEXT DEFAULT 'open' NOT NULL, -- Existing status
+        analysis_preference TEXT DEFAULT 'manual' NOT NULL, -- NEW: 'manual', 'scheduled', 'batch'
+        analysis_schedule TEXT,                         -- NEW: e.g., '23:00' for scheduled
+        analysis_batch_size INTEGER                     -- NEW: e.g., 5 for batch
+    )''')
+    # Add new columns if table already exists (idempotent add)
+    try: cursor.execute("ALTER TABLE jobs ADD COLUMN analysis_preference TEXT DEFAULT 'manual' NOT NULL;")
+    except sqlite3.OperationalError: pass # Ignore error if column already exists
+    try: cursor.execute("ALTER TABLE jobs ADD COLUMN analysis_schedule TEXT;")
+    except sqlite3.OperationalError: pass
+    try: cursor.execute("ALTER TABLE jobs ADD COLUMN analysis_batch_size INTEGER;")
+    except sqlite3.OperationalError: pass
+
+    # Applicants Table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS applicants (
+        applicant_id TEXT PRIMARY KEY, -- Using email from form
+        name TEXT,
+        resume_file_path TEXT UNIQUE NOT NULL, -- Store filename only, ensure uniqueness
+        structured_resume TEXT,  -- Store structured resume as JSON string (can be generated later)
+        date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+    )''')
+
+    # Applications Table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS applications (
+        application_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        applicant_id TEXT NOT NULL, -- References applicants.applicant_id (email)
+        job_id TEXT NOT NULL,       -- References jobs.job_id
+        application_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+        rating INTEGER,             -- AI Rating (0-100, initially NULL)
+        rating_details TEXT,        -- JSON details of rating (initially NULL)
+        status TEXT DEFAULT 'pending' NOT NULL, -- Added status column (pending, shortlisted, rejected, selected, hired)
+        FOREIGN KEY (applicant_id) REFERENCES applicants (applicant_id) ON DELETE CASCADE,
+        FOREIGN KEY (job_id) REFERENCES jobs (job_id) ON DELETE CASCADE,
+        UNIQUE (applicant_id, job_id) -- An applicant applies only once per job
+    )''')
+    # Add indices for faster lookups
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_app_job_id ON applications (job_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_app_applicant_id ON applications (applicant_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_app_status ON applications (status)") # Index on status
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_app_job_status ON applications (job_id, status)") # Composite index
+
+def _migration_002_pagination_indexes(conn):
+    # Keyset pagination indexes (get_applicants_page): newest-first and best-rated-first
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_app_job_date ON applications (job_id, application_date, application_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_app_job_rating ON applications (job_id, COALESCE(rating, -1), application_date, application_id)")
+
+def _migration_003_name_index(conn):
+    # Case-insensitive name index: serves prefix LIKE searches (find_applicants_by_name)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_applicants_name_nocase ON applicants (name COLLATE NOCASE)")
+
+def _migration_004_generated_columns(conn):
+    # Generated columns for hot JSON fields (resume name/phone/skills, rating summary)
+    _add_generated_columns(conn.cursor())
+
+def _migration_005_skill_tables(conn):
+    # Normalized skill tables (canonical names) for SQL-side skill matching
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS applicant_skills (
+        applicant_id TEXT NOT NULL REFERENCES applicants (applicant_id) ON DELETE CASCADE,
+        skill TEXT NOT NULL, -- canonicalize_skill() output
+        PRIMARY KEY (applicant_id, skill)
+    ) WITHOUT ROWID''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS job_skills (
+        job_id TEXT NOT NULL REFERENCES jobs (job_id) ON DELETE CASCADE,
+        skill TEXT NOT NULL,
+        kind TEXT NOT NULL, -- 'required' or 'preferred'
+        PRIMARY KEY (job_id, skill)
+    ) WITHOUT ROWID''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_applicant_skills_skill ON applicant_skills (skill)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_job_skills_skill ON job_skills (skill)")
+    _backfill_skill_tables(conn)
+
+def _migration_006_search_index(conn):
+    # Full-text search tables + sync triggers
+    _create_search_index(conn.cursor())
+
+def _migration_007_resume_hash(conn):
+    # Hash of the resume file structured_resume was built from (cache key for the rating path)
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(applicants)").fetchall()}
+    if 'resume_hash' not in existing: conn.execute("ALTER TABLE applicants ADD COLUMN resume_hash TEXT")
+
+def _migration_008_rating_tasks(conn):
+    # Background rating runs (rating_executor.submit_rating_task); visible to every app process
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS rating_tasks (
+        task_id TEXT PRIMARY KEY,
+        job_id TEXT NOT NULL,
+        kind TEXT NOT NULL,                     -- 'rate_all', 'filter_relevant'
+        status TEXT DEFAULT 'queued' NOT NULL,  -- queued, running, done, failed
+        params TEXT,                            -- JSON (e.g. top_m for filter_relevant)
+        total INTEGER DEFAULT 0 NOT NULL,
+        rated INTEGER DEFAULT 0 NOT NULL,
+        errors INTEGER DEFAULT 0 NOT NULL,
+        skipped INTEGER DEFAULT 0 NOT NULL,
+        message TEXT,
+        created_at REAL NOT NULL,               -- Unix seconds (time.time()) for throughput/ETA maths
+        updated_at REAL NOT NULL,               -- Last progress write; long-silent active tasks are abandoned
+        started_at REAL,
+        finished_at REAL
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rating_tasks_job ON rating_tasks (job_id, kind, status)")
+
+def _migration_009_rating_claims(conn):
+    # Which rating run currently owns an application (claim_application_rating); cleared when the rating is saved
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(applications)").fetchall()}
+    if 'rating_claimed_by' not in existing: conn.execute("ALTER TABLE applications ADD COLUMN rating_claimed_by TEXT")
+    if 'rating_claimed_at' not in existing: conn.execute("ALTER TABLE applications ADD COLUMN rating_claimed_at REAL") # Unix seconds
+
+def _migration_010_summary_cache(conn):
+    # Contextual resume summaries (run_summarization_direct). One row per application; a row is only
+    # served while both hashes still match, so a changed resume file or JD is recomputed and replaced.
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS summary_cache (
+        applicant_id TEXT NOT NULL REFERENCES applicants (applicant_id) ON DELETE CASCADE,
+        job_id TEXT NOT NULL REFERENCES jobs (job_id) ON DELETE CASCADE,
+        resume_hash TEXT NOT NULL, -- file_sha256 of the resume file
+        jd_hash TEXT NOT NULL,     -- SHA-256 of the JD context sent to the LLM
+        summary TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+        PRIMARY KEY (applicant_id, job_id)
+    ) WITHOUT ROWID''')
+
+MIGRATIONS = [
+    (1, "base tables: jobs, applicants, applications", _migration_001_base_tables),
+    (2, "keyset pagination indexes", _migration_002_pagination_indexes),
+    (3, "applicant name index", _migration_003_name_index),
+    (4, "generated hot-field columns", _migration_004_generated_columns),
+    (5, "normalized skill tables", _migration_005_skill_tables),
+    (6, "FTS5 search tables and triggers", _migration_006_search_index),
+    (7, "applicant resume hash", _migration_007_resume_hash),
+    (8, "background rating tasks", _migration_008_rating_tasks),
+    (9, "application rating claims", _migration_009_rating_claims),
+    (10, "contextual summary cache", _migration_010_summary_cache),
+]
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
 
-        conn.commit() # Commit schema changes explicitly
-        print("Database schema initialized/verified successfully.")
+_schema_ready = set() # abspath(DB_FILE)s already verified at LATEST_SCHEMA_VERSION in this process
+
+def get_schema_version(conn):
+    """Highest applied migration version (0 for a new or pre-versioning database)."""
+    has_table = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'").fetchone()
+    if not has_table: return 0
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def migrate(conn):
+    """Applies pending migrations under an exclusive lock. Returns the list of versions applied."""
+    applied = []
+    conn.execute("BEGIN EXCLUSIVE") # Other processes wait (busy_timeout) instead of migrating concurrently
+    try:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+            )''')
+        current = get_schema_version(conn) # Re-read under the lock: another process may have just migrated
+        for version, description, apply in MIGRATIONS:
+            if version <= current: continue
+            print(f"Applying schema migration {version}: {description}...")
+            apply(conn)
+            conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)", (version, description))
+            applied.append(version)
+        conn.commit()
+    except BaseException:
+        conn.rollback() # All-or-nothing: a failed migration leaves the schema at its previous version
+        raise
+    return applied
+
+def init_db():
+    """Brings the database schema up to date. Cheap when already current: a single version check,
+    and nothing at all on repeat calls in the same process (main_crew, agent_tools and app all call it)."""
+    db_key = os.path.abspath(DB_FILE)
+    if db_key in _schema_ready: return
+    try:
+        with db_connection() as conn:
+            version = get_schema_version(conn)
+            if version >= LATEST_SCHEMA_VERSION:
+                print(f"Database schema at {db_key} is up to date (version {version}).")
+            else:
+                print(f"Checking/Initializing database at: {db_key} (schema version {version} -> {LATEST_SCHEMA_VERSION})")
+                applied = migrate(conn)
+                print(f"Database schema initialized/verified successfully. Applied migrations: {applied or 'none'}.")
+            _schema_ready.add(db_key)
     except (sqlite3.Error, AssertionError) as e:
         print(f"Database Error during initialization: {e}")
         traceback.print_exc() # Print stack trace for init errors
-    finally:
-        if conn:
-            conn.close()
 
 # === Job Functions ===
 
@@ -107,98 +309,87 @@ def add_job(job_id, title, description_text, structured_jd_dict,
     if not job_id or not title:
         print("Error: Job ID and Title required.")
         return False
-    conn = None
     success = False
     try:
-        conn = get_db_connection(); assert conn # Ensure connection is valid
-        structured_jd_json = json.dumps(structured_jd_dict) if structured_jd_dict else None
+        with db_connection() as conn:
+            structured_jd_json = json.dumps(structured_jd_dict) if structured_jd_dict else None
 
-        # Clean up preference data based on type
-        if analysis_preference != 'scheduled': analysis_schedule = None
-        if analysis_preference != 'batch': analysis_batch_size = None
-        if analysis_preference == 'batch' and not isinstance(analysis_batch_size, int): analysis_batch_size = 5 # Default
+            # Clean up preference data based on type
+            if analysis_preference != 'scheduled': analysis_schedule = None
+            if analysis_preference != 'batch': analysis_batch_size = None
+            if analysis_preference == 'batch' and not isinstance(analysis_batch_size, int): analysis_batch_size = 5 # Default
 
-        with conn: # Use context manager for transaction
-            conn.execute("""
-                INSERT INTO jobs (
-                    job_id, title, description_text, structured_jd, job_status,
-                    analysis_preference, analysis_schedule, analysis_batch_size
-                )
-                VALUES (?, ?, ?, ?, 'open', ?, ?, ?)
-                ON CONFLICT(job_id) DO UPDATE SET
-                    title = excluded.title,
-                    description_text = excluded.description_text,
-                    structured_jd = excluded.structured_jd,
-                    job_status = 'open', -- Reset status to 'open' on update too
-                    analysis_preference = excluded.analysis_preference,
-                    analysis_schedule = excluded.analysis_schedule,
-                    analysis_batch_size = excluded.analysis_batch_size,
-                    date_added = CURRENT_TIMESTAMP
-                """, (job_id, title, description_text, structured_jd_json,
-                      analysis_preference, analysis_schedule, analysis_batch_size))
-        success = True; print(f"Job '{job_id}' transaction committed (Prefs: {analysis_preference}).")
+            with conn: # Use context manager for transaction
+                conn.execute("""
+                    INSERT INTO jobs (
+                        job_id, title, description_text, structured_jd, job_status,
+                        analysis_preference, analysis_schedule, analysis_batch_size
+                    )
+                    VALUES (?, ?, ?, ?, 'open', ?, ?, ?)
+                    ON CONFLICT(job_id) DO UPDATE SET
+                        title = excluded.title,
+                        description_text = excluded.description_text,
+                        structured_jd = excluded.structured_jd,
+                        job_status = 'open', -- Reset status to 'open' on update too
+                        analysis_preference = excluded.analysis_preference,
+                        analysis_schedule = excluded.analysis_schedule,
+                        analysis_batch_size = excluded.analysis_batch_size,
+                        date_added = CURRENT_TIMESTAMP
+                    """, (job_id, title, description_text, structured_jd_json,
+                          analysis_preference, analysis_schedule, analysis_batch_size))
+                _replace_job_skills(conn, job_id, structured_jd_dict) # Same transaction as the job row
+            success = True; print(f"Job '{job_id}' transaction committed (Prefs: {analysis_preference}).")
     except (sqlite3.Error, AssertionError) as e: # Catch assertion errors too
         print(f"DB Error adding/updating job {job_id}: {e}"); traceback.print_exc()
-    finally:
-        if conn: conn.close()
     return success
 
 def get_job(job_id):
     """Retrieves details for a single job, including its status and preferences."""
-    conn = None
     job_data = None
     try:
-        conn = get_db_connection(); assert conn
-        # Select all relevant columns
-        job = conn.execute("""
-            SELECT job_id, title, description_text, date_added, job_status,
-                   analysis_preference, analysis_schedule, analysis_batch_size, structured_jd
-            FROM jobs WHERE job_id = ?
-            """, (job_id,)).fetchone() # Added structured_jd here for hr_view_applicants context
-        job_data = dict(job) if job else None
+        with db_connection() as conn:
+            # Select all relevant columns
+            job = conn.execute("""
+                SELECT job_id, title, description_text, date_added, job_status,
+                       analysis_preference, analysis_schedule, analysis_batch_size, structured_jd
+                FROM jobs WHERE job_id = ?
+                """, (job_id,)).fetchone() # Added structured_jd here for hr_view_applicants context
+            job_data = dict(job) if job else None
     except (sqlite3.Error, AssertionError) as e:
         print(f"DB Error retrieving job {job_id}: {e}"); traceback.print_exc()
-    finally:
-        if conn: conn.close()
     return job_data
 
 def get_all_jobs(status_filter=None):
     """Retrieves all jobs, optionally filtering by status ('open', 'closed', etc.)."""
-    conn = None
     jobs_list = []
     try:
-        conn = get_db_connection(); assert conn
-        # Include new preference columns
-        sql = """SELECT job_id, title, description_text, job_status,
-                        analysis_preference, analysis_schedule, analysis_batch_size
-                 FROM jobs"""
-        params = []
-        if status_filter:
-            sql += " WHERE job_status = ?"
-            params.append(status_filter)
-        sql += " ORDER BY date_added DESC"
+        with db_connection() as conn:
+            # Include new preference columns
+            sql = """SELECT job_id, title, description_text, job_status,
+                            analysis_preference, analysis_schedule, analysis_batch_size
+                     FROM jobs"""
+            params = []
+            if status_filter:
+                sql += " WHERE job_status = ?"
+                params.append(status_filter)
+            sql += " ORDER BY date_added DESC"
 
-        jobs = conn.execute(sql, tuple(params)).fetchall()
-        jobs_list = [dict(job) for job in jobs]
+            jobs = conn.execute(sql, tuple(params)).fetchall()
+            jobs_list = [dict(job) for job in jobs]
     except (sqlite3.Error, AssertionError) as e:
         print(f"DB Error retrieving jobs (filter: {status_filter}): {e}"); traceback.print_exc()
-    finally:
-        if conn: conn.close()
     return jobs_list
 
 def get_structured_jd(job_id):
     """Retrieves the structured JD JSON."""
-    conn = None
     jd_data = None
     try:
-        conn = get_db_connection(); assert conn
-        result = conn.execute("SELECT structured_jd FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
-        if result and result['structured_jd']:
-            jd_data = json.loads(result['structured_jd'])
+        with db_connection() as conn:
+            result = conn.execute("SELECT structured_jd FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if result and result['structured_jd']:
+                jd_data = json.loads(result['structured_jd'])
     except json.JSONDecodeError as e: print(f"Error decoding JSON JD for {job_id}: {e}"); traceback.print_exc()
     except (sqlite3.Error, AssertionError) as e: print(f"DB Error retrieving structured JD for {job_id}: {e}"); traceback.print_exc()
-    finally:
-        if conn: conn.close()
     return jd_data
 
 def update_job_status(job_id, new_status):
@@ -207,44 +398,38 @@ def update_job_status(job_id, new_status):
     if new_status not in allowed_statuses:
         print(f"Error: Invalid job status '{new_status}' provided.")
         return False
-    conn = None
     success = False
     try:
-        conn = get_db_connection(); assert conn
-        cursor = None
-        with conn:
-            cursor = conn.execute("UPDATE jobs SET job_status = ? WHERE job_id = ?", (new_status, job_id))
-        if cursor and cursor.rowcount > 0:
-            success = True
-            print(f"Job status UPDATE committed for J:{job_id} to '{new_status}'.")
-        else:
-            # Check if the job exists but already has the target status
-            existing_job = get_job(job_id) # Need to call get_job correctly
-            if existing_job and existing_job['job_status'] == new_status:
-                print(f"WARN: Job {job_id} already has status '{new_status}'. No change made.")
-                success = True # Consider it success if status is already correct
+        with db_connection() as conn:
+            cursor = None
+            with conn:
+                cursor = conn.execute("UPDATE jobs SET job_status = ? WHERE job_id = ?", (new_status, job_id))
+            if cursor and cursor.rowcount > 0:
+                success = True
+                print(f"Job status UPDATE committed for J:{job_id} to '{new_status}'.")
             else:
-                print(f"WARN: Job not found or status unchanged for J:{job_id}.") # Job might not exist
+                # Check if the job exists but already has the target status
+                existing_job = get_job(job_id) # Need to call get_job correctly
+                if existing_job and existing_job['job_status'] == new_status:
+                    print(f"WARN: Job {job_id} already has status '{new_status}'. No change made.")
+                    success = True # Consider it success if status is already correct
+                else:
+                    print(f"WARN: Job not found or status unchanged for J:{job_id}.") # Job might not exist
     except (sqlite3.Error, AssertionError) as e:
         print(f"DB Error updating job status for J:{job_id}: {e}"); traceback.print_exc()
-    finally:
-        if conn: conn.close()
     return success
 
 def get_jobs_with_preference(preference_type):
     """Retrieves all jobs matching a specific analysis_preference."""
-    conn = None
     jobs_list = []
     try:
-        conn = get_db_connection(); assert conn
-        sql = """SELECT job_id, title, analysis_preference, analysis_schedule, analysis_batch_size, job_status
-                 FROM jobs WHERE analysis_preference = ?"""
-        jobs = conn.execute(sql, (preference_type,)).fetchall()
-        jobs_list = [dict(job) for job in jobs]
+        with db_connection() as conn:
+            sql = """SELECT job_id, title, analysis_preference, analysis_schedule, analysis_batch_size, job_status
+                     FROM jobs WHERE analysis_preference = ?"""
+            jobs = conn.execute(sql, (preference_type,)).fetchall()
+            jobs_list = [dict(job) for job in jobs]
     except (sqlite3.Error, AssertionError) as e:
         print(f"DB Error retrieving jobs by preference '{preference_type}': {e}"); traceback.print_exc()
-    finally:
-        if conn: conn.close()
     return jobs_list
 
 # === Applicant Functions ===
@@ -254,20 +439,19 @@ def add_applicant(applicant_id, name, resume_filename):
     if not applicant_id or not resume_filename:
         print("Error: Applicant ID (Email) and Resume Filename required.")
         return False
-    conn = None
     success = False
     try:
-        conn = get_db_connection(); assert conn
-        with conn:
-            conn.execute("""
-                INSERT INTO applicants (applicant_id, name, resume_file_path, structured_resume)
-                VALUES (?, ?, ?, NULL)
-                ON CONFLICT(applicant_id) DO UPDATE SET
-                    name = excluded.name,
-                    resume_file_path = excluded.resume_file_path, -- Update resume path on conflict too
-                    date_added = CURRENT_TIMESTAMP
-                """, (applicant_id, name, resume_filename))
-        success = True; # print(f"Applicant '{applicant_id}' transaction committed. Resume file: {resume_filename}") # Less verbose
+        with db_connection() as conn:
+            with conn:
+                conn.execute("""
+                    INSERT INTO applicants (applicant_id, name, resume_file_path, structured_resume)
+                    VALUES (?, ?, ?, NULL)
+                    ON CONFLICT(applicant_id) DO UPDATE SET
+                        name = excluded.name,
+                        resume_file_path = excluded.resume_file_path, -- Update resume path on conflict too
+                        date_added = CURRENT_TIMESTAMP
+                    """, (applicant_id, name, resume_filename))
+            success = True; # print(f"Applicant '{applicant_id}' transaction committed. Resume file: {resume_filename}") # Less verbose
     except sqlite3.IntegrityError as e:
          # Check if it's a unique constraint violation on resume_file_path
          if 'UNIQUE constraint failed: applicants.resume_file_path' in str(e):
@@ -285,89 +469,142 @@ def add_applicant(applicant_id, name, resume_filename):
     except (sqlite3.Error, AssertionError) as e:
         print(f"DB Error adding/updating applicant {applicant_id}: {e}"); traceback.print_exc()
         success = False
-    finally:
-        if conn: conn.close()
     return success
 
 
 def get_structured_resume(applicant_id):
     """Retrieves the structured resume JSON."""
-    conn = None
     resume_data = None
     print(f"--- [DB Util] Attempting to get structured_resume for: {applicant_id} ---") # LOG
     try:
-        conn = get_db_connection(); assert conn
-        result = conn.execute("SELECT structured_resume FROM applicants WHERE applicant_id = ?", (applicant_id,)).fetchone()
-        if result and result['structured_resume']:
-            db_json_string = result['structured_resume'] # LOG
-            print(f"--- [DB Util] Found raw JSON string in DB for {applicant_id}: {db_json_string[:200]}...") # LOG (truncated)
-            try:
-                resume_data = json.loads(db_json_string)
-                print(f"--- [DB Util] Successfully parsed JSON from DB for {applicant_id} ---") # LOG
-            except json.JSONDecodeError as json_e:
-                 print(f"Error: [DB Util] Failed decoding JSON resume from DB for {applicant_id}: {json_e}") # LOG ERROR
-                 resume_data = {"error": "Invalid JSON stored in database."} # Return error dict
-        elif result:
-             print(f"--- [DB Util] Found applicant {applicant_id} but structured_resume column is NULL ---") # LOG NULL case
-        else:
-             print(f"--- [DB Util] Applicant {applicant_id} not found in applicants table ---") # LOG Not Found case
+        with db_connection() as conn:
+            result = conn.execute("SELECT structured_resume FROM applicants WHERE applicant_id = ?", (applicant_id,)).fetchone()
+            if result and result['structured_resume']:
+                db_json_string = result['structured_resume'] # LOG
+                print(f"--- [DB Util] Found raw JSON string in DB for {applicant_id}: {db_json_string[:200]}...") # LOG (truncated)
+                try:
+                    resume_data = json.loads(db_json_string)
+                    print(f"--- [DB Util] Successfully parsed JSON from DB for {applicant_id} ---") # LOG
+                except json.JSONDecodeError as json_e:
+                     print(f"Error: [DB Util] Failed decoding JSON resume from DB for {applicant_id}: {json_e}") # LOG ERROR
+                     resume_data = {"error": "Invalid JSON stored in database."} # Return error dict
+            elif result:
+                 print(f"--- [DB Util] Found applicant {applicant_id} but structured_resume column is NULL ---") # LOG NULL case
+            else:
+                 print(f"--- [DB Util] Applicant {applicant_id} not found in applicants table ---") # LOG Not Found case
 
     except (sqlite3.Error, AssertionError) as e:
         print(f"Error: [DB Util] DB Error retrieving structured resume for {applicant_id}: {e}"); traceback.print_exc() # LOG ERROR
         resume_data = {"error": "Database error retrieving structured resume."} # Return error dict
-    finally:
-        if conn: conn.close()
     # Return None only if record not found or column is NULL, otherwise return dict (or error dict)
     return resume_data if resume_data is not None else None
 
 
-def update_structured_resume(applicant_id, structured_data_dict):
-    """Updates the structured_resume column for a given applicant."""
+def update_structured_resume(applicant_id, structured_data_dict, resume_hash=None):
+    """Updates the structured_resume column for a given applicant. resume_hash is the file_sha256 of the
+    resume it was built from (enables get_cached_structured_resume); None marks it as not tied to a file."""
     if not applicant_id or not isinstance(structured_data_dict, dict):
         print("Error: [DB Util] Applicant ID and structured data dictionary required for update.")
         return False
-    conn = None
     success = False
     print(f"--- [DB Util] Attempting to update structured_resume for: {applicant_id} ---") # LOG
     try:
-        conn = get_db_connection(); assert conn
-        # Log the data being saved (partially, be careful with PII)
-        log_data = {k: v for k, v in structured_data_dict.items() if k in ['name', 'skills', 'validation_warnings', 'error']} # Log subset + errors
-        print(f"--- [DB Util] Data to save (subset): {log_data}") # LOG
-        structured_resume_json = json.dumps(structured_data_dict)
-        cursor = None
-        with conn:
-            cursor = conn.execute(
-                "UPDATE applicants SET structured_resume = ? WHERE applicant_id = ?",
-                (structured_resume_json, applicant_id)
-            )
-        if cursor and cursor.rowcount > 0:
-            success = True
-            print(f"--- [DB Util] Successfully updated structured_resume for applicant {applicant_id}. ---") # LOG SUCCESS
-        else:
-            print(f"Warning: [DB Util] Applicant {applicant_id} not found or structured_resume not updated (rowcount 0).") # LOG WARN
+        with db_connection() as conn:
+            # Log the data being saved (partially, be careful with PII)
+            log_data = {k: v for k, v in structured_data_dict.items() if k in ['name', 'skills', 'validation_warnings', 'error']} # Log subset + errors
+            print(f"--- [DB Util] Data to save (subset): {log_data}") # LOG
+            structured_resume_json = json.dumps(structured_data_dict)
+            cursor = None
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE applicants SET structured_resume = ?, resume_hash = ? WHERE applicant_id = ?",
+                    (structured_resume_json, resume_hash, applicant_id)
+                )
+                if cursor.rowcount > 0: _replace_applicant_skills(conn, applicant_id, structured_data_dict)
+            if cursor and cursor.rowcount > 0:
+                success = True
+                print(f"--- [DB Util] Successfully updated structured_resume for applicant {applicant_id}. ---") # LOG SUCCESS
+            else:
+                print(f"Warning: [DB Util] Applicant {applicant_id} not found or structured_resume not updated (rowcount 0).") # LOG WARN
     except json.JSONDecodeError as json_e:
         print(f"Error: [DB Util] Error encoding structured resume to JSON for {applicant_id}: {json_e}") # LOG ERROR
     except (sqlite3.Error, AssertionError) as e:
         print(f"Error: [DB Util] DB Error updating structured resume for {applicant_id}: {e}"); traceback.print_exc() # LOG ERROR
-    finally:
-        if conn: conn.close()
     return success
 
 def get_resume_path(applicant_id):
     """Retrieves the resume filename."""
-    conn = None
     file_path = None
     try:
-        conn = get_db_connection(); assert conn
-        result = conn.execute("SELECT resume_file_path FROM applicants WHERE applicant_id = ?", (applicant_id,)).fetchone()
-        file_path = result['resume_file_path'] if result else None
+        with db_connection() as conn:
+            result = conn.execute("SELECT resume_file_path FROM applicants WHERE applicant_id = ?", (applicant_id,)).fetchone()
+            file_path = result['resume_file_path'] if result else None
     except (sqlite3.Error, AssertionError) as e:
         print(f"DB Error retrieving resume path for {applicant_id}: {e}"); traceback.print_exc()
-    finally:
-        if conn: conn.close()
     return file_path
 
+def get_applicant_id_by_resume(resume_filename):
+    """Reverse lookup of an applicant by stored resume filename (UNIQUE, so indexed). None if not found."""
+    if not resume_filename: return None
+    applicant_id = None
+    try:
+        with db_connection() as conn:
+            result = conn.execute("SELECT applicant_id FROM applicants WHERE resume_file_path = ?", (resume_filename,)).fetchone()
+            applicant_id = result['applicant_id'] if result else None
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error looking up applicant for resume {resume_filename}: {e}"); traceback.print_exc()
+    return applicant_id
+
+def get_cached_structured_resume(applicant_id, resume_hash):
+    """Returns the stored structured resume only if it was built from a file with this hash
+    (see update_structured_resume); None on a miss, a changed file, or a stored error result."""
+    if not applicant_id or not resume_hash: return None
+    resume_data = None
+    try:
+        with db_connection() as conn:
+            result = conn.execute(
+                "SELECT structured_resume FROM applicants WHERE applicant_id = ? AND resume_hash = ?",
+                (applicant_id, resume_hash)).fetchone()
+            if result and result['structured_resume']:
+                resume_data = json.loads(result['structured_resume'])
+                if not isinstance(resume_data, dict) or 'error' in resume_data: resume_data = None
+    except json.JSONDecodeError as e: print(f"Warning: [DB Util] Cached structured resume for {applicant_id} is not valid JSON: {e}")
+    except (sqlite3.Error, AssertionError) as e: print(f"DB Error retrieving cached structured resume for {applicant_id}: {e}"); traceback.print_exc()
+    return resume_data
+
+def get_cached_summary(applicant_id, job_id, resume_hash, jd_hash):
+    """Returns the cached contextual summary for this application if it was generated from the same
+    resume file and JD (both hashes match); None on a miss or error."""
+    if not applicant_id or not job_id or not resume_hash or not jd_hash: return None
+    try:
+        with db_connection() as conn:
+            row = conn.execute('''
+                SELECT summary FROM summary_cache
+                WHERE applicant_id = ? AND job_id = ? AND resume_hash = ? AND jd_hash = ?
+            ''', (applicant_id, job_id, resume_hash, jd_hash)).fetchone()
+            return row['summary'] if row else None
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error retrieving cached summary for A:{applicant_id}, J:{job_id}: {e}"); traceback.print_exc()
+    return None
+
+def store_cached_summary(applicant_id, job_id, resume_hash, jd_hash, summary):
+    """Saves a generated summary, replacing any older one for the application. Returns True on success."""
+    if not applicant_id or not job_id or not resume_hash or not jd_hash or not isinstance(summary, str): return False
+    try:
+        with db_connection() as conn:
+            with conn:
+                conn.execute('''
+                    INSERT INTO summary_cache (applicant_id, job_id, resume_hash, jd_hash, summary)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (applicant_id, job_id) DO UPDATE SET
+                        resume_hash = excluded.resume_hash, jd_hash = excluded.jd_hash,
+                        summary = excluded.summary, created_at = CURRENT_TIMESTAMP
+                ''', (applicant_id, job_id, resume_hash, jd_hash, summary))
+        return True
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error caching summary for A:{applicant_id}, J:{job_id}: {e}"); traceback.print_exc()
+    return False
+
 # === Application Functions ===
 
 def add_application(applicant_id, job_id):
@@ -375,29 +612,26 @@ def add_application(applicant_id, job_id):
     if not applicant_id or not job_id:
         print("Error: Applicant ID and Job ID required.")
         return None # Indicate error
-    conn = None
     inserted_new = False
     error_occurred = False
     try:
-        conn = get_db_connection(); assert conn
-        cursor = None # Initialize cursor
-        with conn: # Use context manager for transaction
-            cursor = conn.execute("""
-                INSERT INTO applications (applicant_id, job_id, rating, rating_details, status)
-                VALUES (?, ?, NULL, NULL, 'pending') -- Ensure default status
-                ON CONFLICT(applicant_id, job_id) DO NOTHING
-                """, (applicant_id, job_id))
-        if cursor and cursor.rowcount > 0:
-             inserted_new = True
-             # print(f"Application transaction committed for A:{applicant_id}, J:{job_id}. New record inserted (status: pending).") # Less verbose
-        else:
-             # This means the (applicant_id, job_id) pair already exists
-             pass
+        with db_connection() as conn:
+            cursor = None # Initialize cursor
+            with conn: # Use context manager for transaction
+                cursor = conn.execute("""
+                    INSERT INTO applications (applicant_id, job_id, rating, rating_details, status)
+                    VALUES (?, ?, NULL, NULL, 'pending') -- Ensure default status
+                    ON CONFLICT(applicant_id, job_id) DO NOTHING
+                    """, (applicant_id, job_id))
+            if cursor and cursor.rowcount > 0:
+                 inserted_new = True
+                 # print(f"Application transaction committed for A:{applicant_id}, J:{job_id}. New record inserted (status: pending).") # Less verbose
+            else:
+                 # This means the (applicant_id, job_id) pair already exists
+                 pass
     except (sqlite3.Error, AssertionError) as e:
         print(f"Database Error adding application for A:{applicant_id}, J:{job_id}: {e}"); traceback.print_exc()
         error_occurred = True
-    finally:
-        if conn: conn.close()
 
     # Return status: True = newly added, False = already exists, None = error
     if error_occurred:
@@ -407,43 +641,162 @@ def add_application(applicant_id, job_id):
     else:
         return False
 
+def rating_update_params(applicant_id, job_id, rating_result_dict):
+    """Builds the (rating, rating_details, applicant_id, job_id) parameters for a rating UPDATE."""
+    rating_score = rating_result_dict.get('rating')
+    if rating_score is not None:
+        try: rating_score = int(rating_score)
+        except (ValueError, TypeError): rating_score = None # Set to NULL if conversion fails
+    else: rating_score = None # Explicitly NULL if key missing
+    return (rating_score, json.dumps(rating_result_dict), applicant_id, job_id)
+
+_UPDATE_RATING_SQL = """
+    UPDATE applications
+    SET rating = ?,
+        rating_details = ?,
+        rating_claimed_by = NULL, -- Saving the rating ends the claim (claim_application_rating)
+        rating_claimed_at = NULL
+    WHERE applicant_id = ? AND job_id = ?
+    """
+
 def update_application_rating(applicant_id, job_id, rating_result_dict):
     """Updates an existing application record with AI rating details."""
     if not applicant_id or not job_id or not isinstance(rating_result_dict, dict):
          print("Error: Applicant ID, Job ID, and Rating dict required for update.")
          return False
-    conn = None
     success = False
     try:
-        conn = get_db_connection(); assert conn
-        rating_score = rating_result_dict.get('rating')
-        if rating_score is not None:
-            try: rating_score = int(rating_score)
-            except (ValueError, TypeError): rating_score = None # Set to NULL if conversion fails
-        else: rating_score = None # Explicitly NULL if key missing
-
-        rating_details_json = json.dumps(rating_result_dict)
-        cursor = None
-        with conn:
-            # Update timestamp when rating is added/updated
-            cursor = conn.execute("""
-                UPDATE applications
-                SET rating = ?,
-                    rating_details = ?
-                WHERE applicant_id = ? AND job_id = ?
-                """, (rating_score, rating_details_json, applicant_id, job_id)) # Removed date update here
-        if cursor and cursor.rowcount > 0:
-             success = True
-             # print(f"Rating UPDATE transaction committed for A:{applicant_id}, J:{job_id}.") # Less verbose
-        else:
-             # print(f"WARN: No application found or no change needed to update rating for A:{applicant_id}, J:{job_id}.") # Less verbose
-             pass
+        with db_connection() as conn:
+            cursor = None
+            with conn:
+                cursor = conn.execute(_UPDATE_RATING_SQL, rating_update_params(applicant_id, job_id, rating_result_dict))
+            if cursor and cursor.rowcount > 0:
+                 success = True
+                 # print(f"Rating UPDATE transaction committed for A:{applicant_id}, J:{job_id}.") # Less verbose
+            else:
+                 # print(f"WARN: No application found or no change needed to update rating for A:{applicant_id}, J:{job_id}.") # Less verbose
+                 pass
     except (sqlite3.Error, AssertionError) as e:
         print(f"DB Error updating rating for A:{applicant_id}, J:{job_id}: {e}"); traceback.print_exc()
-    finally:
-        if conn: conn.close()
     return success
 
+def update_application_ratings_bulk(ratings):
+    """Writes many (applicant_id, job_id, rating_result_dict) tuples in a single transaction.
+    Returns the number of application rows updated, or None on DB error (nothing is written)."""
+    rows = []
+    for applicant_id, job_id, rating_result_dict in ratings:
+        if not applicant_id or not job_id or not isinstance(rating_result_dict, dict):
+            print(f"Warning: Skipping invalid rating entry for A:{applicant_id}, J:{job_id}.")
+            continue
+        rows.append(rating_update_params(applicant_id, job_id, rating_result_dict))
+    if not rows: return 0
+    try:
+        with db_connection() as conn:
+            with conn: # One transaction (and one WAL commit) for the whole batch
+                cursor = conn.executemany(_UPDATE_RATING_SQL, rows)
+            return cursor.rowcount # Summed over all rows for executemany
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error bulk-updating {len(rows)} ratings: {e}"); traceback.print_exc()
+    return None
+
+class RatingWriteBuffer:
+    """Collects rating results and writes them with update_application_ratings_bulk.
+    Flushes every `flush_every` results so a long run doesn't lose finished work, and on exit
+    when used as a context manager. `written`/`failed` count rows saved / not saved so far.
+    `store` is a db_backends repository to write through; None writes with this module's function."""
+
+    def __init__(self, flush_every=20, on_flush=None, store=None):
+        self.flush_every = max(1, flush_every)
+        self.on_flush = on_flush # Called as on_flush(batch, saved) after each write; saved[i] is True if batch[i] was stored
+        self.write_bulk = store.update_application_ratings_bulk if store is not None else update_application_ratings_bulk
+        self.read_state = store.get_application_rating_state if store is not None else get_application_rating_state
+        self.pending = []
+        self.written = 0
+        self.failed = 0
+
+    def add(self, applicant_id, job_id, rating_result_dict):
+        self.pending.append((applicant_id, job_id, rating_result_dict))
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.pending: return 0
+        batch, self.pending = self.pending, []
+        updated = self.write_bulk(batch)
+        if not updated: saved = [False] * len(batch) # DB error (nothing committed) or no row matched
+        elif updated == len(batch): saved = [True] * len(batch)
+        else: # One transaction, so the rows left out are invalid entries or applications that no longer exist
+            saved = [bool(a_id and j_id and isinstance(result, dict) and self.read_state(a_id, j_id) is not None)
+                     for a_id, j_id, result in batch]
+        updated = sum(saved)
+        self.written += updated
+        self.failed += len(batch) - updated
+        print(f"--- [DB Util] Flushed {len(batch)} ratings ({updated} saved). ---")
+        if self.on_flush: self.on_flush(batch, saved)
+        return updated
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush() # Keep whatever finished even if the loop raised
+        return False
+
+RATING_CLAIM_TTL_SECONDS = 600 # A claim older than this is assumed abandoned (its process died) and can be taken over
+
+def claim_application_rating(applicant_id, job_id, owner):
+    """Marks an application as being rated by `owner` (a unique token) so other processes don't rate it too.
+    Returns True if claimed, False if another owner holds a live claim, None if the application doesn't exist
+    or on DB error. The claim ends when the rating is saved or release_application_rating is called."""
+    if not applicant_id or not job_id or not owner: return None
+    now = time.time()
+    try:
+        with db_connection() as conn:
+            with conn:
+                cursor = conn.execute('''
+                    UPDATE applications SET rating_claimed_by = ?, rating_claimed_at = ?
+                    WHERE applicant_id = ? AND job_id = ?
+                      AND (rating_claimed_by IS NULL OR rating_claimed_at < ?)
+                ''', (owner, now, applicant_id, job_id, now - RATING_CLAIM_TTL_SECONDS))
+            if cursor.rowcount > 0: return True
+            exists = conn.execute("SELECT 1 FROM applications WHERE applicant_id = ? AND job_id = ?", (applicant_id, job_id)).fetchone()
+            return False if exists else None
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error claiming rating for A:{applicant_id}, J:{job_id}: {e}"); traceback.print_exc()
+    return None
+
+def release_application_rating(applicant_id, job_id, owner):
+    """Drops `owner`'s claim without saving a rating (e.g. the AI call failed). Returns True if released."""
+    try:
+        with db_connection() as conn:
+            with conn:
+                cursor = conn.execute('''
+                    UPDATE applications SET rating_claimed_by = NULL, rating_claimed_at = NULL
+                    WHERE applicant_id = ? AND job_id = ? AND rating_claimed_by = ?
+                ''', (applicant_id, job_id, owner))
+            return cursor.rowcount > 0
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error releasing rating claim for A:{applicant_id}, J:{job_id}: {e}"); traceback.print_exc()
+    return False
+
+def get_application_rating_state(applicant_id, job_id):
+    """Returns {'rating', 'rating_details' (decoded dict or None), 'rating_claimed_by', 'rating_claimed_at'}
+    for one application, or None if it doesn't exist / on DB error."""
+    try:
+        with db_connection() as conn:
+            row = conn.execute('''
+                SELECT rating, rating_details, rating_claimed_by, rating_claimed_at
+                FROM applications WHERE applicant_id = ? AND job_id = ?
+            ''', (applicant_id, job_id)).fetchone()
+        if not row: return None
+        state = dict(row)
+        try: state['rating_details'] = json.loads(state['rating_details']) if state['rating_details'] else None
+        except json.JSONDecodeError: state['rating_details'] = None
+        return state
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error reading rating state for A:{applicant_id}, J:{job_id}: {e}"); traceback.print_exc()
+    return None
+
 def update_application_status(applicant_id, job_id, new_status):
     """Updates the status of a specific application."""
     allowed_statuses = ['pending', 'shortlisted', 'rejected', 'selected', 'hired']
@@ -454,128 +807,706 @@ def update_application_status(applicant_id, job_id, new_status):
         print("Error: Applicant ID and Job ID required for status update.")
         return False
 
-    conn = None
     success = False
     try:
-        conn = get_db_connection(); assert conn
-        cursor = None
-        with conn:
-            cursor = conn.execute("""
-                UPDATE applications
-                SET status = ?
-                WHERE applicant_id = ? AND job_id = ?
-                """, (new_status, applicant_id, job_id))
-        if cursor and cursor.rowcount > 0:
-             success = True
-             # print(f"Status UPDATE transaction committed for A:{applicant_id}, J:{job_id} to '{new_status}'.") # Less verbose
-        else:
-             # print(f"WARN: No application found or status unchanged for A:{applicant_id}, J:{job_id}.") # Less verbose
-             pass
+        with db_connection() as conn:
+            cursor = None
+            with conn:
+                cursor = conn.execute("""
+                    UPDATE applications
+                    SET status = ?
+                    WHERE applicant_id = ? AND job_id = ?
+                    """, (new_status, applicant_id, job_id))
+            if cursor and cursor.rowcount > 0:
+                 success = True
+                 # print(f"Status UPDATE transaction committed for A:{applicant_id}, J:{job_id} to '{new_status}'.") # Less verbose
+            else:
+                 # print(f"WARN: No application found or status unchanged for A:{applicant_id}, J:{job_id}.") # Less verbose
+                 pass
     except (sqlite3.Error, AssertionError) as e:
         print(f"DB Error updating status for A:{applicant_id}, J:{job_id}: {e}"); traceback.print_exc()
-    finally:
-        if conn: conn.close()
     return success
 
 def get_applicants_for_job(job_id, include_rejected=True):
     """Retrieves all applicants+details who applied for a specific job, optionally filtering status."""
     if not job_id: return []
-    conn = None
     results_list = []
     # print(f"DEBUG: Getting applicants for Job ID: {job_id}, Include Rejected: {include_rejected}") # Less verbose
     try:
-        conn = get_db_connection(); assert conn
-        sql = '''
-            SELECT
-                app.applicant_id,
-                apl.name,
-                apl.resume_file_path,
-                app.rating,
-                app.application_date,
-                app.status -- Fetch the status
-            FROM applications app
-            JOIN applicants apl ON app.applicant_id = apl.applicant_id
-            WHERE app.job_id = ?
-        '''
-        params = [job_id]
-        if not include_rejected:
-            sql += " AND (app.status IS NULL OR app.status != ?)" # Exclude rows where status IS 'rejected'
-            params.append('rejected')
-
-        sql += " ORDER BY app.application_date DESC" # Keep default order by date
-
-        cursor = conn.execute(sql, tuple(params))
-        raw_results = cursor.fetchall()
-        # print(f"DEBUG: Raw fetchall result for job {job_id} (rejected hidden: {not include_rejected}): {raw_results}") # Less verbose
-        if raw_results:
-             results_list = [dict(row) for row in raw_results]
-        # else: # Less verbose
-            # print(f"DEBUG: No rows found by fetchall for job {job_id} (rejected hidden: {not include_rejected}).")
+        with db_connection() as conn:
+            sql = '''
+                SELECT
+                    app.applicant_id,
+                    apl.name,
+                    apl.resume_file_path,
+                    app.rating,
+                    app.application_date,
+                    app.status -- Fetch the status
+                FROM applications app
+                JOIN applicants apl ON app.applicant_id = apl.applicant_id
+                WHERE app.job_id = ?
+            '''
+            params = [job_id]
+            if not include_rejected:
+                sql += " AND (app.status IS NULL OR app.status != ?)" # Exclude rows where status IS 'rejected'
+                params.append('rejected')
+
+            sql += " ORDER BY app.application_date DESC" # Keep default order by date
+
+            cursor = conn.execute(sql, tuple(params))
+            raw_results = cursor.fetchall()
+            # print(f"DEBUG: Raw fetchall result for job {job_id} (rejected hidden: {not include_rejected}): {raw_results}") # Less verbose
+            if raw_results:
+                 results_list = [dict(row) for row in raw_results]
+            # else: # Less verbose
+                # print(f"DEBUG: No rows found by fetchall for job {job_id} (rejected hidden: {not include_rejected}).")
 
     except (sqlite3.Error, AssertionError, Exception) as e:
         print(f"DB Error retrieving/processing applicants for job {job_id}: {e}"); traceback.print_exc()
-    finally:
-        if conn: conn.close()
     # print(f"DEBUG: Returning {len(results_list)} applicants for job {job_id}.") # Less verbose
     return results_list
 
+def empty_job_stats(job_id):
+    """Zeroed get_job_stats dict. empty/fold/finish_job_stats are shared with db_backends.PostgresRepository."""
+    return {"job_id": job_id, "total": 0, "rated_count": 0, "avg_rating": None, "status_counts": {}}
+
+def fold_job_stats_row(stats, row):
+    """Adds one (job_id, status) GROUP BY row into a stats dict."""
+    if not row['status']: return stats # LEFT JOIN row for a job with no applications
+    stats['status_counts'][row['status']] = row['app_count']
+    stats['total'] += row['app_count']
+    stats['rated_count'] += row['rated_count']
+    stats['_rating_sum'] = stats.get('_rating_sum', 0) + (row['rating_sum'] or 0)
+    return stats
+
+def finish_job_stats(stats):
+    rating_sum = stats.pop('_rating_sum', 0)
+    stats['avg_rating'] = (rating_sum / stats['rated_count']) if stats['rated_count'] else None
+    return stats
+
+def get_job_stats(job_id):
+    """Returns application stats for one job from a single GROUP BY query:
+    {'job_id', 'total', 'rated_count', 'avg_rating' (None if unrated), 'status_counts': {status: count}}."""
+    stats = empty_job_stats(job_id)
+    if not job_id: return stats
+    try:
+        with db_connection() as conn:
+            rows = conn.execute('''
+                SELECT status, COUNT(*) AS app_count, COUNT(rating) AS rated_count, SUM(rating) AS rating_sum
+                FROM applications
+                WHERE job_id = ?
+                GROUP BY status
+            ''', (job_id,)).fetchall() # Served from idx_app_job_status
+            for row in rows: fold_job_stats_row(stats, row)
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error retrieving stats for job {job_id}: {e}"); traceback.print_exc()
+    return finish_job_stats(stats)
+
+def get_all_job_stats(status_filter=None):
+    """Returns {job_id: stats} (same shape as get_job_stats) for every job in one query,
+    optionally only jobs with the given job_status. Jobs without applications get zero counts."""
+    all_stats = {}
+    try:
+        with db_connection() as conn:
+            sql = '''
+                SELECT j.job_id, app.status, COUNT(app.application_id) AS app_count,
+                       COUNT(app.rating) AS rated_count, SUM(app.rating) AS rating_sum
+                FROM jobs j
+                LEFT JOIN applications app ON app.job_id = j.job_id
+            '''
+            params = []
+            if status_filter:
+                sql += " WHERE j.job_status = ?"
+                params.append(status_filter)
+            sql += " GROUP BY j.job_id, app.status"
+            for row in conn.execute(sql, tuple(params)).fetchall():
+                stats = all_stats.setdefault(row['job_id'], empty_job_stats(row['job_id']))
+                fold_job_stats_row(stats, row)
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error retrieving stats for all jobs (filter: {status_filter}): {e}"); traceback.print_exc()
+    return {job_id: finish_job_stats(stats) for job_id, stats in all_stats.items()}
+
+APPLICANT_PAGE_SORTS = ('date', 'rating') # Newest first / best rated first
+APPLICANT_PAGE_FILTERS = ('all', 'rated', 'unrated', 'pending', 'shortlisted', 'rejected', 'selected', 'hired')
+MAX_APPLICANT_PAGE_SIZE = 200
+
+def encode_page_cursor(values):
+    """Opaque keyset cursor for get_applicants_page (same format on every storage backend)."""
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_page_cursor(cursor, expected_len):
+    """Returns the decoded cursor values, or None if the cursor is missing/invalid (=> first page)."""
+    if not cursor: return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if isinstance(values, list) and len(values) == expected_len: return values
+    except (ValueError, TypeError): pass
+    print(f"Warning: [DB Util] Ignoring invalid applicant page cursor '{cursor}'.")
+    return None
+
+def get_applicants_page(job_id, limit=50, cursor=None, filter_by='all', sort='date', include_rejected=True):
+    """Keyset-paginated applicants for a job. Cost depends on `limit`, not on the number of applicants.
+    filter_by: one of APPLICANT_PAGE_FILTERS ('rated'/'unrated' or a status). sort: 'date' (newest first)
+    or 'rating' (highest first, unrated last; ties newest first). Pass the returned 'next_cursor' back
+    as `cursor` to get the following page. Returns {'applicants': [...], 'next_cursor': str or None}."""
+    page = {"applicants": [], "next_cursor": None}
+    if not job_id: return page
+    if sort not in APPLICANT_PAGE_SORTS: sort = 'date'
+    if filter_by not in APPLICANT_PAGE_FILTERS: filter_by = 'all'
+    try: limit = max(1, min(int(limit), MAX_APPLICANT_PAGE_SIZE))
+    except (ValueError, TypeError): limit = 50
+
+    # Sort key columns, all DESC. COALESCE puts unrated (NULL) after every real 0-100 rating.
+    key_columns = ['app.application_date', 'app.application_id']
+    if sort == 'rating': key_columns.insert(0, 'COALESCE(app.rating, -1)')
+    sql = f'''
+        SELECT
+            app.application_id,
+            app.applicant_id,
+            apl.name,
+            apl.resume_file_path,
+            app.rating,
+            app.application_date,
+            app.status,
+            {key_columns[0]} AS sort_key
+        FROM applications app
+        JOIN applicants apl ON app.applicant_id = apl.applicant_id
+        WHERE app.job_id = ?
+    '''
+    params = [job_id]
+    if filter_by == 'rated': sql += " AND app.rating IS NOT NULL"
+    elif filter_by == 'unrated': sql += " AND app.rating IS NULL"
+    elif filter_by != 'all':
+        sql += " AND app.status = ?"
+        params.append(filter_by)
+    if not include_rejected and filter_by != 'rejected':
+        sql += " AND app.status != ?"
+        params.append('rejected')
+
+    after = decode_page_cursor(cursor, len(key_columns))
+    if after is not None:
+        # Row-value comparison lets SQLite seek straight into the (job_id, key...) index
+        sql += f" AND ({', '.join(key_columns)}) < ({', '.join('?' * len(key_columns))})"
+        params.extend(after)
+    sql += " ORDER BY " + ", ".join(f"{col} DESC" for col in key_columns) + " LIMIT ?"
+    params.append(limit + 1) # One extra row tells us whether there is a next page
+
+    try:
+        with db_connection() as conn:
+            rows = conn.execute(sql, tuple(params)).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        page['applicants'] = [{k: row[k] for k in row.keys() if k != 'sort_key'} for row in rows]
+        if has_more:
+            last = rows[-1]
+            key = [last['application_date'], last['application_id']]
+            if sort == 'rating': key.insert(0, last['sort_key'])
+            page['next_cursor'] = encode_page_cursor(key)
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error retrieving applicants page for job {job_id}: {e}"); traceback.print_exc()
+    return page
+
+def get_application(applicant_id, job_id):
+    """Point lookup of one application joined with its applicant (unique (applicant_id, job_id) index).
+    Returns a dict with the same keys as get_applicants_for_job rows plus application_id/job_id, or None."""
+    if not applicant_id or not job_id: return None
+    app_data = None
+    try:
+        with db_connection() as conn:
+            row = conn.execute('''
+                SELECT
+                    app.application_id,
+                    app.applicant_id,
+                    app.job_id,
+                    apl.name,
+                    apl.resume_file_path,
+                    app.rating,
+                    app.application_date,
+                    app.status
+                FROM applications app
+                JOIN applicants apl ON app.applicant_id = apl.applicant_id
+                WHERE app.applicant_id = ? AND app.job_id = ?
+            ''', (applicant_id, job_id)).fetchone()
+            app_data = dict(row) if row else None
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error retrieving application A:{applicant_id}, J:{job_id}: {e}"); traceback.print_exc()
+    return app_data
+
+def like_escape(text):
+    """Escapes LIKE wildcards for ESCAPE '\\' (SQLite) / the default escape (Postgres)."""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def find_applicants_by_name(job_id, name_query, limit=20):
+    """Case-insensitive name search among a job's applicants, best matches first.
+    Name prefixes ('ali' -> 'Alice Smith') are answered from the NOCASE name index; only if none match
+    does it fall back to a substring match ('smith'), which is limited to this job's applications."""
+    if not job_id or not name_query or not name_query.strip(): return []
+    name_query = like_escape(name_query.strip())
+    sql = '''
+        SELECT app.applicant_id, apl.name, apl.resume_file_path, app.rating, app.application_date, app.status
+        FROM applicants apl
+        JOIN applications app ON app.applicant_id = apl.applicant_id AND app.job_id = ?
+        WHERE apl.name LIKE ? ESCAPE '\\'
+        ORDER BY apl.name COLLATE NOCASE
+        LIMIT ?
+    '''
+    results_list = []
+    try:
+        with db_connection() as conn:
+            for pattern in (name_query + '%', '%' + name_query + '%'): # Indexed prefix, then substring
+                rows = conn.execute(sql, (job_id, pattern, limit)).fetchall()
+                if rows:
+                    results_list = [dict(row) for row in rows]
+                    break
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error searching applicants named '{name_query}' for job {job_id}: {e}"); traceback.print_exc()
+    return results_list
+
 def get_applications_by_status(job_id, status):
     """Retrieves applications matching a specific status for a job."""
     if not job_id or not status: return []
-    conn = None
     results_list = []
     try:
-        conn = get_db_connection(); assert conn
-        cursor = conn.execute('''
-            SELECT app.applicant_id, apl.name, apl.resume_file_path, app.rating, app.status
-            FROM applications app
-            JOIN applicants apl ON app.applicant_id = apl.applicant_id
-            WHERE app.job_id = ? AND app.status = ?
-            ORDER BY app.rating DESC -- Order by rating for shortlisted/selected
-        ''', (job_id, status))
-        raw_results = cursor.fetchall()
-        if raw_results:
-             results_list = [dict(row) for row in raw_results]
+        with db_connection() as conn:
+            cursor = conn.execute('''
+                SELECT app.applicant_id, apl.name, apl.resume_file_path, app.rating, app.status
+                FROM applications app
+                JOIN applicants apl ON app.applicant_id = apl.applicant_id
+                WHERE app.job_id = ? AND app.status = ?
+                ORDER BY app.rating DESC -- Order by rating for shortlisted/selected
+            ''', (job_id, status))
+            raw_results = cursor.fetchall()
+            if raw_results:
+                 results_list = [dict(row) for row in raw_results]
     except (sqlite3.Error, AssertionError, Exception) as e:
         print(f"DB Error retrieving applicants for job {job_id} by status {status}: {e}"); traceback.print_exc()
-    finally:
-        if conn: conn.close()
     return results_list
 
 def get_ranked_applicants(job_id, n=10, include_rejected=False):
     """Retrieves top N RATED applicants, optionally excluding rejected ones."""
     if not job_id: return []
-    conn = None
     ranked_list = []
     try:
-        conn = get_db_connection(); assert conn
-        sql = '''
-            SELECT app.applicant_id, apl.name, app.rating
-            FROM applications app
-            JOIN applicants apl ON app.applicant_id = apl.applicant_id
-            WHERE app.job_id = ? AND app.rating IS NOT NULL
-        '''
-        params = [job_id]
-        if not include_rejected:
-            sql += " AND (app.status IS NULL OR app.status != ?)" # Exclude rejected
-            params.append('rejected')
-
-        sql += " ORDER BY app.rating DESC LIMIT ?"
-        params.append(n) # Add limit parameter
-
-        cursor = conn.execute(sql, tuple(params))
-        results = cursor.fetchall()
-        ranked_list = [(row['applicant_id'], row['name'], row['rating']) for row in results]
+        with db_connection() as conn:
+            sql = '''
+                SELECT app.applicant_id, apl.name, app.rating
+                FROM applications app
+                JOIN applicants apl ON app.applicant_id = apl.applicant_id
+                WHERE app.job_id = ? AND app.rating IS NOT NULL
+            '''
+            params = [job_id]
+            if not include_rejected:
+                sql += " AND (app.status IS NULL OR app.status != ?)" # Exclude rejected
+                params.append('rejected')
+
+            sql += " ORDER BY app.rating DESC LIMIT ?"
+            params.append(n) # Add limit parameter
+
+            cursor = conn.execute(sql, tuple(params))
+            results = cursor.fetchall()
+            ranked_list = [(row['applicant_id'], row['name'], row['rating']) for row in results]
     except (sqlite3.Error, AssertionError) as e:
         print(f"DB Error retrieving ranked applicants for job {job_id}: {e}"); traceback.print_exc()
-    finally:
-        if conn: conn.close()
     return ranked_list
 
+
+# === Hot JSON Fields (generated columns) ===
+# VIRTUAL generated columns expose the few JSON fields routes read on every request, so getters
+# can return them without fetching and json.loads-ing whole structured_resume/rating_details blobs.
+# Guarded with json_valid() so a malformed blob yields NULL instead of a query error.
+
+def _json_field(column, path):
+    return f"CASE WHEN json_valid({column}) THEN json_extract({column}, '{path}') END"
+
+GENERATED_COLUMNS = {
+    'applicants': [
+        ('resume_name', 'TEXT', _json_field('structured_resume', '$.name')),
+        ('resume_phone', 'TEXT', _json_field('structured_resume', '$.contact_info.phone')),
+        ('experience_count', 'INTEGER', "CASE WHEN json_valid(structured_resume) THEN json_array_length(structured_resume, '$.experience') END"),
+        ('skills_json', 'TEXT', _json_field('structured_resume', '$.skills')),       # Small JSON array
+        ('education_json', 'TEXT', _json_field('structured_resume', '$.education')), # Small JSON array
+    ],
+    'applications': [
+        ('rating_summary', 'TEXT', _json_field('rating_details', '$.summary')),
+    ],
+}
+
+def _add_generated_columns(cursor):
+    """Adds any missing generated columns (idempotent; ALTER TABLE only supports VIRTUAL ones)."""
+    for table, columns in GENERATED_COLUMNS.items():
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_xinfo({table})").fetchall()}
+        for name, col_type, expr in columns:
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type} GENERATED ALWAYS AS ({expr}) VIRTUAL")
+
+def _json_list(text):
+    try: value = json.loads(text) if text else []
+    except json.JSONDecodeError: value = []
+    return as_list(value)
+
+def as_list(value):
+    """A decoded JSON field as a list (None -> [], scalar -> [scalar]); shared with the Postgres backend."""
+    if value is None: return []
+    return value if isinstance(value, list) else [value]
+
+def get_applicant_profile(applicant_id):
+    """Hot fields of an applicant's structured resume (name, phone, experience_count, skills, education)
+    read from generated columns. Returns None if the applicant doesn't exist."""
+    profile = None
+    try:
+        with db_connection() as conn:
+            row = conn.execute('''
+                SELECT applicant_id, name, resume_name, resume_phone, experience_count, skills_json, education_json,
+                       structured_resume IS NOT NULL AS has_structured_resume
+                FROM applicants WHERE applicant_id = ?
+            ''', (applicant_id,)).fetchone()
+            if row:
+                profile = dict(row)
+                profile['skills'] = _json_list(profile.pop('skills_json'))
+                profile['education'] = _json_list(profile.pop('education_json'))
+                profile['has_structured_resume'] = bool(profile['has_structured_resume'])
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error retrieving applicant profile for {applicant_id}: {e}"); traceback.print_exc()
+    return profile
+
+def get_rating_summaries(job_id, applicant_ids):
+    """Returns {applicant_id: rating summary} for the given applicants of a job (missing/unrated omitted)."""
+    applicant_ids = [a for a in applicant_ids if a]
+    if not job_id or not applicant_ids: return {}
+    summaries = {}
+    try:
+        with db_connection() as conn:
+            placeholders = ", ".join("?" * len(applicant_ids))
+            rows = conn.execute(f'''
+                SELECT applicant_id, rating_summary FROM applications
+                WHERE job_id = ? AND applicant_id IN ({placeholders}) AND rating_summary IS NOT NULL
+            ''', (job_id, *applicant_ids)).fetchall()
+            summaries = {row['applicant_id']: row['rating_summary'] for row in rows}
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error retrieving rating summaries for job {job_id}: {e}"); traceback.print_exc()
+    return summaries
+
+
+# === Normalized Skills ===
+# applicant_skills / job_skills hold canonical skill names extracted from structured_resume and
+# structured_jd, so skill overlap is a plain indexed join instead of parsing JSON per row.
+
+SKILL_ALIASES = {
+    'js': 'javascript', 'ts': 'typescript', 'node': 'nodejs', 'node.js': 'nodejs',
+    'postgres': 'postgresql', 'k8s': 'kubernetes', 'golang': 'go', 'py': 'python',
+    'ml': 'machine learning', 'dl': 'deep learning', 'nlp': 'natural language processing',
+    'amazon web services': 'aws', 'gcp': 'google cloud', 'react.js': 'react', 'reactjs': 'react',
+    'sklearn': 'scikit-learn', 'tf': 'tensorflow', 'ci/cd': 'cicd',
+}
+
+def canonicalize_skill(skill):
+    """Lowercases, trims and collapses whitespace/punctuation, then maps common aliases ('K8s' -> 'kubernetes')."""
+    if not isinstance(skill, str): return None
+    name = re.sub(r"\s+", " ", skill).strip().strip(".,;:()[]").strip().lower()
+    if not name or len(name) > 100: return None
+    return SKILL_ALIASES.get(name, name)
+
+def _skill_set(skills):
+    """Canonical skill names from a list of strings or a comma/semicolon separated string."""
+    if isinstance(skills, str): skills = re.split(r"[,;\n]", skills)
+    if not isinstance(skills, list): return set()
+    return {s for s in (canonicalize_skill(x) for x in skills) if s}
+
+def applicant_skill_rows(applicant_id, structured_resume_dict):
+    """(applicant_id, skill) rows for applicant_skills; shared with the Postgres backend."""
+    structured_resume_dict = structured_resume_dict if isinstance(structured_resume_dict, dict) else {}
+    return [(applicant_id, s) for s in sorted(_skill_set(structured_resume_dict.get('skills')))]
+
+def job_skill_rows(job_id, structured_jd_dict):
+    """(job_id, skill, kind) rows for job_skills; shared with the Postgres backend."""
+    structured_jd_dict = structured_jd_dict if isinstance(structured_jd_dict, dict) else {}
+    required = _skill_set(structured_jd_dict.get('required_skills'))
+    preferred = _skill_set(structured_jd_dict.get('preferred_skills')) - required # Required wins if listed twice
+    return [(job_id, s, 'required') for s in sorted(required)] + [(job_id, s, 'preferred') for s in sorted(preferred)]
+
+def _replace_applicant_skills(conn, applicant_id, structured_resume_dict):
+    """Rewrites an applicant's skill rows inside the caller's transaction."""
+    conn.execute("DELETE FROM applicant_skills WHERE applicant_id = ?", (applicant_id,))
+    conn.executemany("INSERT INTO applicant_skills (applicant_id, skill) VALUES (?, ?)",
+                     applicant_skill_rows(applicant_id, structured_resume_dict))
+
+def _replace_job_skills(conn, job_id, structured_jd_dict):
+    """Rewrites a job's required/preferred skill rows inside the caller's transaction."""
+    conn.execute("DELETE FROM job_skills WHERE job_id = ?", (job_id,))
+    conn.executemany("INSERT INTO job_skills (job_id, skill, kind) VALUES (?, ?, ?)", job_skill_rows(job_id, structured_jd_dict))
+
+def _backfill_skill_tables(conn):
+    """Fills empty skill tables from existing structured JSON (first run after upgrade)."""
+    if not conn.execute("SELECT EXISTS (SELECT 1 FROM applicant_skills)").fetchone()[0]:
+        for row in conn.execute("SELECT applicant_id, structured_resume FROM applicants WHERE structured_resume IS NOT NULL").fetchall():
+            try: _replace_applicant_skills(conn, row['applicant_id'], json.loads(row['structured_resume']))
+            except (json.JSONDecodeError, AttributeError): pass # Leave unparseable resumes without skills
+    if not conn.execute("SELECT EXISTS (SELECT 1 FROM job_skills)").fetchone()[0]:
+        for row in conn.execute("SELECT job_id, structured_jd FROM jobs WHERE structured_jd IS NOT NULL").fetchall():
+            try: _replace_job_skills(conn, row['job_id'], json.loads(row['structured_jd']))
+            except json.JSONDecodeError: pass
+
+def match_applicants_by_skills(job_id, include_rejected=True, limit=None):
+    """Pre-ranks a job's applicants by skill overlap with the JD, computed in SQL (no LLM, no JSON parsing).
+    Returns dicts with applicant_id, name, rating, status, required_matches/required_total,
+    preferred_matches/preferred_total and matched_skills, best overlap first."""
+    if not job_id: return []
+    sql = '''
+        WITH totals AS (
+            SELECT COUNT(CASE WHEN kind = 'required' THEN 1 END) AS required_total,
+                   COUNT(CASE WHEN kind = 'preferred' THEN 1 END) AS preferred_total
+            FROM job_skills WHERE job_id = ?
+        )
+        SELECT app.applicant_id, apl.name, app.rating, app.status, app.application_date,
+               COUNT(CASE WHEN js.kind = 'required' THEN 1 END) AS required_matches,
+               COUNT(CASE WHEN js.kind = 'preferred' THEN 1 END) AS preferred_matches,
+               totals.required_total, totals.preferred_total,
+               group_concat(js.skill, ', ') AS matched_skills
+        FROM applications app
+        JOIN applicants apl ON apl.applicant_id = app.applicant_id
+        CROSS JOIN totals
+        LEFT JOIN applicant_skills s ON s.applicant_id = app.applicant_id
+        LEFT JOIN job_skills js ON js.job_id = app.job_id AND js.skill = s.skill
+        WHERE app.job_id = ?
+    '''
+    params = [job_id, job_id]
+    if not include_rejected:
+        sql += " AND app.status != ?"
+        params.append('rejected')
+    sql += '''
+        GROUP BY app.applicant_id
+        ORDER BY required_matches DESC, preferred_matches DESC, app.application_date DESC
+    '''
+    if limit:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    results_list = []
+    try:
+        with db_connection() as conn:
+            results_list = [dict(row) for row in conn.execute(sql, tuple(params)).fetchall()]
+    except (sqlite3.Error, AssertionError, ValueError) as e:
+        print(f"DB Error matching applicants by skills for job {job_id}: {e}"); traceback.print_exc()
+    return results_list
+
+
+# === Full-Text Search (FTS5) ===
+# applicants_fts / jobs_fts mirror the searchable parts of the structured JSON and are kept in sync
+# by triggers, so every existing write path (add_applicant, update_structured_resume, add_job, ...)
+# updates them without code changes. FTS rowid = base-table rowid; run rebuild_search_index() after
+# a VACUUM (which may renumber rowids of TEXT-keyed tables).
+
+def _json_text_list(src, column, path):
+    """SQL expression: the text items of a JSON list (or a plain string) at `path`, comma-joined."""
+    return (f"CASE WHEN json_valid({src}.{column}) THEN (SELECT group_concat(value, ', ') "
+            f"FROM json_each({src}.{column}, '{path}') WHERE type = 'text') END")
+
+def _json_object_fields(src, column, path, fields):
+    """SQL expression: the given string fields of every object in the JSON list at `path`, space-joined."""
+    joined = " || ' ' || ".join(f"coalesce(json_extract(value, '$.{f}'), '')" for f in fields)
+    return (f"CASE WHEN json_valid({src}.{column}) THEN (SELECT group_concat({joined}, ' ') "
+            f"FROM json_each({src}.{column}, '{path}') WHERE type = 'object') END")
+
+def _applicant_fts_values(src):
+    return ", ".join([
+        f"{src}.rowid", f"{src}.applicant_id", f"{src}.name",
+        _json_text_list(src, 'structured_resume', '$.skills'),
+        _json_object_fields(src, 'structured_resume', '$.experience', ['title', 'company', 'description']),
+        f"CASE WHEN json_valid({src}.structured_resume) THEN json_extract({src}.structured_resume, '$.summary') END",
+    ])
+
+def _job_fts_values(src):
+    return ", ".join([
+        f"{src}.rowid", f"{src}.job_id", f"{src}.title", f"{src}.description_text",
+        "coalesce(" + _json_text_list(src, 'structured_jd', '$.required_skills') + ", '') || ', ' || coalesce("
+            + _json_text_list(src, 'structured_jd', '$.preferred_skills') + ", '')",
+        _json_text_list(src, 'structured_jd', '$.key_responsibilities'),
+    ])
+
+_APPLICANT_FTS_COLUMNS = "rowid, applicant_id, name, skills, experience, summary"
+_JOB_FTS_COLUMNS = "rowid, job_id, title, description, skills, responsibilities"
+
+def _create_search_index(cursor):
+    """Creates the FTS5 tables and sync triggers (idempotent). Backfills if the index is empty."""
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS applicants_fts USING fts5(
+            applicant_id UNINDEXED, name, skills, experience, summary,
+            tokenize = 'porter unicode61'
+        )''')
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+            job_id UNINDEXED, title, description, skills, responsibilities,
+            tokenize = 'porter unicode61'
+        )''')
+    for table, fts, columns, values in (
+        ('applicants', 'applicants_fts', _APPLICANT_FTS_COLUMNS, _applicant_fts_values),
+        ('jobs', 'jobs_fts', _JOB_FTS_COLUMNS, _job_fts_values),
+    ):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts} ({columns}) SELECT {values('new')};
+            END''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE ON {table} BEGIN
+                DELETE FROM {fts} WHERE rowid = old.rowid;
+                INSERT INTO {fts} ({columns}) SELECT {values('new')};
+            END''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN
+                DELETE FROM {fts} WHERE rowid = old.rowid;
+            END''')
+        needs_backfill = cursor.execute(
+            f"SELECT NOT EXISTS (SELECT 1 FROM {fts}) AND EXISTS (SELECT 1 FROM {table})").fetchone()[0]
+        if needs_backfill:
+            cursor.execute(f"INSERT INTO {fts} ({columns}) SELECT {values('src')} FROM {table} src")
+            print(f"Backfilled full-text index '{fts}'.")
+
+def rebuild_search_index():
+    """Repopulates both FTS tables from the base tables. Returns True on success."""
+    success = False
+    try:
+        with db_connection() as conn:
+            with conn:
+                conn.execute("DELETE FROM applicants_fts")
+                conn.execute(f"INSERT INTO applicants_fts ({_APPLICANT_FTS_COLUMNS}) SELECT {_applicant_fts_values('src')} FROM applicants src")
+                conn.execute("DELETE FROM jobs_fts")
+                conn.execute(f"INSERT INTO jobs_fts ({_JOB_FTS_COLUMNS}) SELECT {_job_fts_values('src')} FROM jobs src")
+            success = True; print("Full-text search index rebuilt.")
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error rebuilding full-text index: {e}"); traceback.print_exc()
+    return success
+
+def search_terms(text):
+    """The words of a free-text search (letters/digits only, so safe to splice into FTS5/tsquery syntax)."""
+    return re.findall(r"\w+", text or "")
+
+def _fts_query(text, match_all=False):
+    """Turns free text into a safe FTS5 MATCH expression (each word quoted; OR by default)."""
+    words = search_terms(text)
+    return (" AND " if match_all else " OR ").join(f'"{w}"' for w in words)
+
+def search_applicants(query, job_id=None, limit=20, match_all=False):
+    """Ranked keyword search over applicant names, skills, experience and summary (bm25, best first).
+    Restricted to a job's applicants when job_id is given. Returns dicts with applicant_id, name,
+    score (lower is better) and a highlighted snippet."""
+    match = _fts_query(query, match_all)
+    if not match: return []
+    sql = '''
+        SELECT fts.applicant_id, fts.name,
+               bm25(applicants_fts, 0.0, 3.0, 5.0, 1.0, 1.0) AS score,
+               snippet(applicants_fts, -1, '[', ']', '...', 10) AS snippet
+        FROM applicants_fts fts
+    '''
+    params = []
+    if job_id:
+        sql += " JOIN applications app ON app.applicant_id = fts.applicant_id AND app.job_id = ?"
+        params.append(job_id)
+    sql += " WHERE applicants_fts MATCH ? ORDER BY score LIMIT ?"
+    params.extend([match, limit])
+    results_list = []
+    try:
+        with db_connection() as conn:
+            results_list = [dict(row) for row in conn.execute(sql, tuple(params)).fetchall()]
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error searching applicants for '{query}': {e}"); traceback.print_exc()
+    return results_list
+
+def search_jobs(query, limit=20, match_all=False):
+    """Ranked keyword search over job titles, descriptions, skills and responsibilities (bm25, best first)."""
+    match = _fts_query(query, match_all)
+    if not match: return []
+    results_list = []
+    try:
+        with db_connection() as conn:
+            rows = conn.execute('''
+                SELECT fts.job_id, fts.title,
+                       bm25(jobs_fts, 0.0, 5.0, 1.0, 3.0, 1.0) AS score,
+                       snippet(jobs_fts, -1, '[', ']', '...', 10) AS snippet
+                FROM jobs_fts fts
+                WHERE jobs_fts MATCH ?
+                ORDER BY score LIMIT ?
+            ''', (match, limit)).fetchall()
+            results_list = [dict(row) for row in rows]
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error searching jobs for '{query}': {e}"); traceback.print_exc()
+    return results_list
+
+# === Rating Tasks (background rating runs) ===
+RATING_TASK_FIELDS = ('status', 'total', 'rated', 'errors', 'skipped', 'message', 'started_at', 'finished_at')
+RATING_TASK_ACTIVE = ('queued', 'running')
+RATING_TASK_STALE_SECONDS = 900 # An active task with no progress write for this long is treated as dead
+
+def create_rating_task(task_id, job_id, kind, total, params=None):
+    """Records a queued rating task unless one of the same kind is already queued/running for the job.
+    Returns (task_id, True) if created, (existing_task_id, False) if one is active, (None, False) on DB error.
+    Active tasks silent for RATING_TASK_STALE_SECONDS (e.g. their process died) are marked failed first."""
+    if not task_id or not job_id or not kind: return None, False
+    now = time.time()
+    try:
+        with db_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE") # Check-then-insert must not race a second request for the same job
+            try:
+                conn.execute('''
+                    UPDATE rating_tasks SET status = 'failed', message = 'Abandoned: no progress reported.', finished_at = ?
+                    WHERE job_id = ? AND kind = ? AND status IN (?, ?) AND updated_at < ?
+                ''', (now, job_id, kind, *RATING_TASK_ACTIVE, now - RATING_TASK_STALE_SECONDS))
+                row = conn.execute('''
+                    SELECT task_id FROM rating_tasks
+                    WHERE job_id = ? AND kind = ? AND status IN (?, ?)
+                    ORDER BY created_at DESC LIMIT 1
+                ''', (job_id, kind, *RATING_TASK_ACTIVE)).fetchone()
+                if row:
+                    conn.commit()
+                    return row['task_id'], False
+                conn.execute('''
+                    INSERT INTO rating_tasks (task_id, job_id, kind, params, total, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (task_id, job_id, kind, json.dumps(params) if params is not None else None, total, now, now))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        return task_id, True
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error creating rating task for job {job_id}: {e}"); traceback.print_exc()
+    return None, False
+
+def update_rating_task(task_id, **fields):
+    """Updates progress/status columns (RATING_TASK_FIELDS) of a rating task. Returns True if a row changed."""
+    unknown = set(fields) - set(RATING_TASK_FIELDS)
+    if unknown:
+        print(f"Error: Unknown rating task field(s): {sorted(unknown)}")
+        return False
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    try:
+        with db_connection() as conn:
+            with conn:
+                cursor = conn.execute(f"UPDATE rating_tasks SET {assignments}{', ' if fields else ''}updated_at = ? WHERE task_id = ?",
+                                      (*fields.values(), time.time(), task_id))
+            return cursor.rowcount > 0
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error updating rating task {task_id}: {e}"); traceback.print_exc()
+    return False
+
+def get_rating_task(task_id):
+    """Returns a rating task as a dict (params decoded), or None if not found / on error."""
+    if not task_id: return None
+    try:
+        with db_connection() as conn:
+            row = conn.execute("SELECT * FROM rating_tasks WHERE task_id = ?", (task_id,)).fetchone()
+        if not row: return None
+        task = dict(row)
+        try: task['params'] = json.loads(task['params']) if task['params'] else {}
+        except json.JSONDecodeError: task['params'] = {}
+        return task
+    except (sqlite3.Error, AssertionError) as e:
+        print(f"DB Error retrieving rating task {task_id}: {e}"); traceback.print_exc()
+    return None
+
 # === Test Block ===
 if __name__ == "__main__":
     print("\n" + "="*10 + " Running Database Utility Tests (with Preferences) " + "="*10)
     DB_FILE = 'test_job_portal.db'
+    close_all_connections()
     # Clean up old test DB files if they exist
     for f in [DB_FILE, DB_FILE + "-wal", DB_FILE + "-shm"]:
         if os.path.exists(f):
@@ -642,15 +1573,12 @@ if __name__ == "__main__":
     print("\n5. Testing get_structured_resume (basic check)...")
     # Add a structured resume manually for testing
     structured_resume_sample = {"name": "Alice DB", "skills": ["SQL"]}
-    conn_test = get_db_connection()
     try:
-        with conn_test:
+        with db_connection() as conn_test, conn_test:
              conn_test.execute("UPDATE applicants SET structured_resume = ? WHERE applicant_id = ?", (json.dumps(structured_resume_sample), app1_id))
         print(f"Manually added structured resume for {app1_id}")
     except Exception as e:
         print(f"Error adding test structured resume: {e}")
-    finally:
-        if conn_test: conn_test.close()
 
     retrieved_struct_resume = get_structured_resume(app1_id)
     print(f"Retrieved structured resume for {app1_id}: {retrieved_struct_resume}")
@@ -682,4 +1610,196 @@ if __name__ == "__main__":
     assert job1_reopened and job1_reopened['job_status'] == 'open', "Test Failed: Job re-opening failed."
     print("Job re-opening verified.")
 
+    print("\n8. Testing Connection Pool Reuse...")
+    with db_connection() as c1: pass
+    with db_connection() as c2:
+        assert c1 is c2, "Test Failed: Pooled connection was not reused."
+        sync_mode = c2.execute("PRAGMA synchronous;").fetchone()[0]
+        assert sync_mode == 1, f"Test Failed: Expected synchronous=NORMAL (1), got {sync_mode}."
+    try:
+        with db_connection() as c3:
+            c3.execute("INSERT INTO jobs (job_id, title) VALUES ('POOLTEST', 'Pool')") # Implicit transaction left open
+            raise RuntimeError("simulated failure mid-transaction")
+    except RuntimeError: pass
+    assert get_job("POOLTEST") is None, "Test Failed: Uncommitted write leaked from a returned connection."
+    print("Connection pool reuse and PRAGMA setup verified.")
+
+    print("\n9. Testing Bulk Rating Writes...")
+    add_application(app3_id, "DBTEST002"); add_application(app1_id, "DBTEST002")
+    with RatingWriteBuffer(flush_every=2) as writer:
+        writer.add(app3_id, "DBTEST002", {"rating": 81, "summary": "bulk"})
+        writer.add(app1_id, "DBTEST002", {"rating": "64", "summary": "bulk"}) # Triggers a flush
+        assert writer.written == 2 and not writer.pending, "Test Failed: Periodic flush did not write."
+        writer.add("nobody@dbtest.com", "DBTEST002", {"rating": 10}) # No such application
+    assert writer.written == 2 and writer.failed == 1, f"Test Failed: Bulk counts wrong ({writer.written}/{writer.failed})."
+    flushed = []
+    with RatingWriteBuffer(on_flush=lambda batch, saved: flushed.append(saved)) as writer: # Partial batch: flags per row
+        writer.add(app3_id, "DBTEST002", {"rating": 81, "summary": "bulk"})
+        writer.add("nobody@dbtest.com", "DBTEST002", {"rating": 10})
+        writer.add(app1_id, "DBTEST002", {"rating": 64, "summary": "bulk"})
+    assert flushed == [[True, False, True]] and writer.written == 2, f"Test Failed: Per-row flush results {flushed}."
+    bulk_ranked = get_ranked_applicants("DBTEST002", 5)
+    assert bulk_ranked == [(app3_id, "Charlie DB", 81), (app1_id, "Alice DB", 64)], f"Test Failed: Bulk ratings not stored: {bulk_ranked}"
+    print("Bulk rating writes verified.")
+
+    print("\n10. Testing Job Stats Aggregates...")
+    stats1 = get_job_stats("DBTEST001")
+    print(f"Job 1 Stats: {stats1}")
+    assert stats1['total'] == 3 and stats1['rated_count'] == 3, "Test Failed: Job stats totals incorrect."
+    assert stats1['status_counts'] == {'pending': 1, 'rejected': 1, 'shortlisted': 1}, "Test Failed: Status counts incorrect."
+    assert abs(stats1['avg_rating'] - (70 + 95 + 55) / 3) < 1e-9, "Test Failed: Average rating incorrect."
+    all_stats = get_all_job_stats()
+    assert all_stats["DBTEST001"] == stats1, "Test Failed: Multi-job stats differ from single-job stats."
+    assert all_stats["DBTEST003"]['total'] == 0 and all_stats["DBTEST003"]['avg_rating'] is None, "Test Failed: Empty job stats incorrect."
+    assert all_stats["DBTEST002"]['rated_count'] == 2, "Test Failed: Job 2 rated count incorrect."
+    print("Job stats aggregates verified.")
+
+    print("\n11. Testing Keyset-Paginated Applicant Listing...")
+    for i in range(7): # Extra applicants on job 3, some rated
+        page_app_id = f"pager{i}@dbtest.com"
+        add_applicant(page_app_id, f"Pager {i}", f"pager{i}.pdf"); add_application(page_app_id, "DBTEST003")
+        if i % 2 == 0: update_application_rating(page_app_id, "DBTEST003", {"rating": 50 + i})
+    seen_ids = []; page_cursor = None
+    while True:
+        page = get_applicants_page("DBTEST003", limit=3, cursor=page_cursor)
+        seen_ids.extend(a['applicant_id'] for a in page['applicants'])
+        page_cursor = page['next_cursor']
+        if not page_cursor: break
+    all_ids = [a['applicant_id'] for a in get_applicants_for_job("DBTEST003")]
+    assert sorted(seen_ids) == sorted(all_ids) and len(seen_ids) == len(set(seen_ids)) == 7, f"Test Failed: Date pages incomplete: {seen_ids}"
+    by_rating = get_applicants_page("DBTEST003", limit=3, sort='rating')
+    assert [a['rating'] for a in by_rating['applicants']] == [56, 54, 52], f"Test Failed: Rating sort wrong: {by_rating}"
+    rest = get_applicants_page("DBTEST003", limit=10, sort='rating', cursor=by_rating['next_cursor'])
+    assert [a['rating'] for a in rest['applicants']] == [50, None, None, None] and rest['next_cursor'] is None, "Test Failed: Rating page 2 wrong."
+    unrated_page = get_applicants_page("DBTEST003", filter_by='unrated')
+    assert len(unrated_page['applicants']) == 3 and all(a['rating'] is None for a in unrated_page['applicants']), "Test Failed: Unrated filter wrong."
+    hidden = get_applicants_page("DBTEST001", include_rejected=False)
+    assert app2_id not in [a['applicant_id'] for a in hidden['applicants']], "Test Failed: Rejected not hidden."
+    assert get_applicants_page("DBTEST001", cursor="not-a-cursor")['applicants'], "Test Failed: Bad cursor should give first page."
+    print("Keyset pagination verified.")
+
+    print("\n12. Testing Point Lookup and Name Search...")
+    one_app = get_application(app1_id, "DBTEST001")
+    assert one_app and one_app['name'] == "Alice DB" and one_app['rating'] == 70 and one_app['status'] == 'shortlisted', f"Test Failed: Point lookup wrong: {one_app}"
+    assert get_application(app1_id, "NOSUCHJOB") is None, "Test Failed: Lookup for missing application should be None."
+    assert [a['applicant_id'] for a in find_applicants_by_name("DBTEST001", "ali")] == [app1_id], "Test Failed: Prefix name search wrong."
+    assert [a['applicant_id'] for a in find_applicants_by_name("DBTEST001", "DB")] == [app1_id, app2_id, app3_id], "Test Failed: Substring name search wrong."
+    assert find_applicants_by_name("DBTEST001", "Pager") == [], "Test Failed: Name search leaked other jobs' applicants."
+    assert find_applicants_by_name("DBTEST001", "%") == [], "Test Failed: LIKE wildcards not escaped."
+    print("Point lookup and name search verified.")
+
+    print("\n13. Testing Full-Text Search...")
+    update_structured_resume(app3_id, {"name": "Charlie DB", "skills": ["PostgreSQL", "Kubernetes"],
+                                       "experience": [{"title": "Platform Engineer", "company": "Acme", "description": "Ran clusters"}],
+                                       "summary": "Infrastructure person."})
+    k8s_hits = search_applicants("kubernetes")
+    assert [h['applicant_id'] for h in k8s_hits] == [app3_id], f"Test Failed: Skill search wrong: {k8s_hits}"
+    assert [h['applicant_id'] for h in search_applicants("clusters", job_id="DBTEST001")] == [app3_id], "Test Failed: Experience search wrong."
+    assert search_applicants("kubernetes", job_id="DBTEST003") == [], "Test Failed: Job filter not applied to search."
+    update_structured_resume(app3_id, {"name": "Charlie DB", "skills": ["Excel"]}) # Trigger must replace old text
+    assert search_applicants("kubernetes") == [] and search_applicants("excel"), "Test Failed: FTS not re-synced on update."
+    sql_hits = search_applicants("SQL testing") # OR by default, best match first
+    assert {h['applicant_id'] for h in sql_hits} == {app1_id, app2_id}, f"Test Failed: Multi-word search wrong: {sql_hits}"
+    assert search_applicants('"; DROP TABLE applicants; --') == [], "Test Failed: Query text not sanitised."
+    assert [j['job_id'] for j in search_jobs("batches")] == ["DBTEST002"], "Test Failed: Job search wrong."
+    assert rebuild_search_index() and search_applicants("excel"), "Test Failed: Rebuild lost rows."
+    print("Full-text search verified.")
+
+    print("\n14. Testing Normalized Skills Matching...")
+    assert canonicalize_skill("  K8s ") == "kubernetes" and canonicalize_skill("Node.JS") == "nodejs", "Test Failed: Skill canonicalization."
+    add_job("DBTEST004", "Skills Tester", "Skill matching.", {"required_skills": ["Python", "SQL", "k8s"], "preferred_skills": ["AWS", "sql"]})
+    for sk_id, sk_skills in (("sk1@dbtest.com", ["python", "Kubernetes", "AWS"]), ("sk2@dbtest.com", ["SQL "]), ("sk3@dbtest.com", [])):
+        add_applicant(sk_id, sk_id.split('@')[0].upper(), sk_id + ".pdf"); add_application(sk_id, "DBTEST004")
+        update_structured_resume(sk_id, {"name": sk_id, "skills": sk_skills})
+    skill_ranked = match_applicants_by_skills("DBTEST004")
+    print(f"Skill ranking: {[(r['applicant_id'], r['required_matches'], r['preferred_matches']) for r in skill_ranked]}")
+    assert [r['applicant_id'] for r in skill_ranked] == ["sk1@dbtest.com", "sk2@dbtest.com", "sk3@dbtest.com"], "Test Failed: Skill ranking order."
+    assert (skill_ranked[0]['required_matches'], skill_ranked[0]['preferred_matches'], skill_ranked[0]['required_total'], skill_ranked[0]['preferred_total']) == (2, 1, 3, 1), "Test Failed: Skill counts."
+    update_structured_resume("sk2@dbtest.com", {"skills": ["python", "sql", "kubernetes"]}) # Skills replaced, not appended
+    assert match_applicants_by_skills("DBTEST004", limit=1)[0]['applicant_id'] == "sk2@dbtest.com", "Test Failed: Skill rows not refreshed."
+    print("Normalized skills matching verified.")
+
+    print("\n15. Testing Generated Hot-Field Columns...")
+    update_structured_resume(app1_id, {"name": "Alice D. B.", "contact_info": {"phone": "555-0100"}, "skills": ["SQL", "Go"],
+                                       "experience": [{"title": "DBA"}, {"title": "Dev"}], "education": [{"degree": "BSc"}]})
+    profile = get_applicant_profile(app1_id)
+    print(f"Profile: {profile}")
+    assert profile['resume_name'] == "Alice D. B." and profile['resume_phone'] == "555-0100", "Test Failed: Generated name/phone."
+    assert profile['experience_count'] == 2 and profile['skills'] == ["SQL", "Go"] and profile['education'] == [{"degree": "BSc"}], "Test Failed: Generated lists."
+    with db_connection() as conn_test, conn_test: # Malformed JSON must not break reads
+        conn_test.execute("UPDATE applicants SET structured_resume = 'not json' WHERE applicant_id = ?", (app2_id,))
+    broken = get_applicant_profile(app2_id)
+    assert broken and broken['skills'] == [] and broken['experience_count'] is None, "Test Failed: Malformed JSON profile."
+    assert get_applicant_profile("nobody@dbtest.com") is None, "Test Failed: Missing applicant profile."
+    assert get_rating_summaries("DBTEST001", [app1_id, app3_id, "nobody@dbtest.com"]) == {app1_id: "ok", app3_id: "maybe"}, "Test Failed: Rating summaries."
+    print("Generated hot-field columns verified.")
+    print("\n16. Testing Schema Migration Runner...")
+    with db_connection() as conn_test:
+        assert get_schema_version(conn_test) == LATEST_SCHEMA_VERSION, "Test Failed: Schema not at latest version."
+        with conn_test: conn_test.execute("DELETE FROM schema_version WHERE version > 3") # Pretend 4+ never ran
+    _schema_ready.clear()
+    init_db() # Re-applies 4..latest; they must be idempotent on an existing schema
+    with db_connection() as conn_test:
+        versions = [r[0] for r in conn_test.execute("SELECT version FROM schema_version ORDER BY version")]
+        assert versions == [m[0] for m in MIGRATIONS], f"Test Failed: Migration history wrong: {versions}"
+        assert migrate(conn_test) == [], "Test Failed: Up-to-date schema should apply nothing."
+    assert search_applicants("excel") and match_applicants_by_skills("DBTEST004"), "Test Failed: Data lost across re-migration."
+    print("Schema migration runner verified.")
+    print("\n17. Testing Structured Resume Cache (resume_hash)...")
+    assert get_applicant_id_by_resume(app1_res) == app1_id and get_applicant_id_by_resume("nope.pdf") is None, "Test Failed: Resume reverse lookup."
+    cached_struct = {"name": "Alice Cached", "skills": ["SQL"]}
+    assert update_structured_resume(app1_id, cached_struct, resume_hash="hash-v1"), "Test Failed: Store hashed resume."
+    assert get_cached_structured_resume(app1_id, "hash-v1") == cached_struct, "Test Failed: Cache hit."
+    assert get_cached_structured_resume(app1_id, "hash-v2") is None, "Test Failed: Changed file must miss."
+    update_structured_resume(app1_id, {"error": "LLM failed"}, resume_hash="hash-v3")
+    assert get_cached_structured_resume(app1_id, "hash-v3") is None, "Test Failed: Error results must not be served from cache."
+    update_structured_resume(app1_id, cached_struct) # No hash => not tied to a file
+    assert get_cached_structured_resume(app1_id, "hash-v1") is None, "Test Failed: Unhashed update must invalidate cache."
+    print("Structured resume cache verified.")
+    print("\n18. Testing Background Rating Tasks...")
+    task_id, created = create_rating_task("task-1", "DBTEST001", "rate_all", 3, params={"top_m": 2})
+    assert (task_id, created) == ("task-1", True), "Test Failed: Create rating task."
+    assert create_rating_task("task-2", "DBTEST001", "rate_all", 3) == ("task-1", False), "Test Failed: Active task not reused."
+    assert create_rating_task("task-3", "DBTEST001", "filter_relevant", 3)[1], "Test Failed: Other kinds run independently."
+    assert update_rating_task("task-1", status="running", rated=2, errors=1) and not update_rating_task("task-1", bogus=1), "Test Failed: Update rating task."
+    task = get_rating_task("task-1")
+    assert task['status'] == "running" and task['rated'] == 2 and task['params'] == {"top_m": 2}, f"Test Failed: Task row {task}"
+    update_rating_task("task-1", status="done")
+    assert create_rating_task("task-4", "DBTEST001", "rate_all", 1) == ("task-4", True), "Test Failed: Finished task blocks new runs."
+    with db_connection() as conn_test, conn_test: # Simulate a worker that died mid-run
+        conn_test.execute("UPDATE rating_tasks SET updated_at = updated_at - ? WHERE task_id = 'task-4'", (RATING_TASK_STALE_SECONDS + 1,))
+    assert create_rating_task("task-5", "DBTEST001", "rate_all", 1) == ("task-5", True), "Test Failed: Stale task not abandoned."
+    assert get_rating_task("task-4")['status'] == "failed" and get_rating_task("nope") is None, "Test Failed: Stale task status."
+    print("Background rating tasks verified.")
+    print("\n19. Testing Application Rating Claims...")
+    assert claim_application_rating(app1_id, "DBTEST001", "owner-a") is True, "Test Failed: First claim."
+    assert claim_application_rating(app1_id, "DBTEST001", "owner-b") is False, "Test Failed: Live claim must block others."
+    assert claim_application_rating("nobody@dbtest.com", "DBTEST001", "owner-b") is None, "Test Failed: Missing application claim."
+    assert not release_application_rating(app1_id, "DBTEST001", "owner-b"), "Test Failed: Only the owner may release."
+    assert get_application_rating_state(app1_id, "DBTEST001")['rating_claimed_by'] == "owner-a", "Test Failed: Claim state."
+    update_application_ratings_bulk([(app1_id, "DBTEST001", {"rating": 77, "summary": "claimed"})])
+    state = get_application_rating_state(app1_id, "DBTEST001")
+    assert state['rating'] == 77 and state['rating_details']['summary'] == "claimed" and state['rating_claimed_by'] is None, \
+        f"Test Failed: Saving a rating must end the claim: {state}"
+    assert claim_application_rating(app1_id, "DBTEST001", "owner-b") and release_application_rating(app1_id, "DBTEST001", "owner-b"), \
+        "Test Failed: Claim/release cycle."
+    claim_application_rating(app1_id, "DBTEST001", "owner-c")
+    with db_connection() as conn_test, conn_test: # Simulate a claimant that died
+        conn_test.execute("UPDATE applications SET rating_claimed_at = rating_claimed_at - ? WHERE applicant_id = ?", (RATING_CLAIM_TTL_SECONDS + 1, app1_id))
+    assert claim_application_rating(app1_id, "DBTEST001", "owner-d") is True, "Test Failed: Expired claim not taken over."
+    release_application_rating(app1_id, "DBTEST001", "owner-d")
+    print("Application rating claims verified.")
+    print("\n20. Testing Summary Cache...")
+    assert get_cached_summary(app1_id, "DBTEST001", "r1", "j1") is None, "Test Failed: Empty cache should miss."
+    assert store_cached_summary(app1_id, "DBTEST001", "r1", "j1", "Strong SQL background."), "Test Failed: Store summary."
+    assert get_cached_summary(app1_id, "DBTEST001", "r1", "j1") == "Strong SQL background.", "Test Failed: Cache hit."
+    assert get_cached_summary(app1_id, "DBTEST001", "r2", "j1") is None, "Test Failed: Changed resume must miss."
+    assert get_cached_summary(app1_id, "DBTEST001", "r1", "j2") is None, "Test Failed: Changed JD must miss."
+    store_cached_summary(app1_id, "DBTEST001", "r2", "j1", "Updated summary.")
+    with db_connection() as conn_test:
+        rows = conn_test.execute("SELECT COUNT(*) FROM summary_cache WHERE applicant_id = ?", (app1_id,)).fetchone()[0]
+    assert rows == 1 and get_cached_summary(app1_id, "DBTEST001", "r2", "j1") == "Updated summary.", "Test Failed: Summary not replaced."
+    print("Summary cache verified.")
+    close_all_connections()
+
     print("\n" + "="*10 + " Database Tests (with Preferences) Finished " + "="*10)
\ No newline at end of file
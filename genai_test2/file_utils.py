@@ -1,5 +1,6 @@
 # file_utils.py
 from unstructured.partition.auto import partition
+import hashlib
 import os
 
 # Create a dedicated folder for uploads if it doesn't exist
@@ -44,6 +45,20 @@ def save_uploaded_file(uploaded_file_object):
     return None # Indicate failure / need for real implementation
 
 
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """Hex SHA-256 of a file's bytes (read in chunks), or None if it can't be read.
+    Used to tell whether cached data derived from a resume file is still current."""
+    try:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except (OSError, TypeError) as e:
+        print(f"Error hashing file {file_path}: {e}")
+        return None
+
+
 def extract_text_from_file(file_path):
     """Extracts text from PDF, DOCX, DOC, TXT files using unstructured."""
     
@@ -0,0 +1,314 @@
+# intent_classifier.py
+"""Local intent classifier for the HR chat (runs before llm_utils.understand_hr_chat_intent).
+Compiled patterns handle the common phrasings, a small TF-IDF keyword model covers the rest, and
+entities (job id, email, name) are pulled out with regexes. Returns None when not confident so the
+caller falls back to Gemini; Gemini's answers are logged and become training data for the model."""
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+# --- Classifier Settings ---
+INTENT_FAST_PATH = os.getenv("INTENT_FAST_PATH", "1") != "0"           # Set to 0 to always ask the LLM
+INTENT_LOG_FILE = os.getenv("INTENT_LOG_FILE",   # LLM-labelled messages (entities masked); next to this module, not the CWD
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), "chat_intent_log.jsonl"))
+INTENT_LOG_MAX_EXAMPLES = 5000  # Most recent logged examples used for training
+INTENT_LOG_MAX_BYTES = int(os.getenv("INTENT_LOG_MAX_BYTES", str(2 * 1024 * 1024))) # Past this the log is cut to its newest half
+INTENT_RETRAIN_MIN_EXAMPLES = int(os.getenv("INTENT_RETRAIN_MIN_EXAMPLES", "25"))  # Retrain after this many new logged examples...
+INTENT_RETRAIN_SECONDS = float(os.getenv("INTENT_RETRAIN_SECONDS", "900"))         # ...or this long after the last training if any arrived
+INTENT_RULE_CONFIDENCE = 0.9
+INTENT_MODEL_MIN_SCORE = 0.35   # Cosine similarity to the best intent centroid
+INTENT_MODEL_MIN_MARGIN = 0.08  # ...and lead over the runner-up
+
+# Intents the local classifier may return. 'clarification'/'unknown' depend on context, so they stay with the LLM.
+LOCAL_INTENTS = ('get_overview', 'get_applicant_details', 'get_ranking', 'get_report', 'set_context', 'get_help', 'greeting')
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+JOB_ID_RE = re.compile(r"\b([A-Za-z]{2,10}-?\d{2,6})\b") # DEV006, MKTG-02, JOB123
+NAME_RE = re.compile(
+    r"\b(?:details|info(?:rmation)?|profile|summary|more|tell me|know)\s+(?:about|on|for|of)\s+"
+    r"(?P<name>[A-Za-z][A-Za-z.'-]*(?:\s+[A-Za-z][A-Za-z.'-]*){0,3})"
+    r"|\bwho\s+is\s+(?P<who>[A-Za-z][A-Za-z.'-]*(?:\s+[A-Za-z][A-Za-z.'-]*){0,3})", re.I)
+NAME_STOP_WORDS = {'for', 'in', 'on', 'at', 'from', 'job', 'jobs', 'the', 'this', 'that', 'these', 'those', 'here',
+                   'applicant', 'applicants', 'candidate', 'candidates', 'current', 'best', 'top', 'them', 'him',
+                   'her', 'it', 'listing', 'listings', 'status', 'position', 'role', 'please', 'all', 'opening',
+                   'openings', 'positions', 'roles'}
+
+# An intent wins on rules only when its pattern is the only one that matches; otherwise the model decides among them
+INTENT_PATTERNS = [
+    ('greeting', re.compile(r"^\s*(hi|hello|hey|hiya|greetings|good\s+(morning|afternoon|evening))(\s+there)?[\s!.,]*$", re.I)),
+    ('get_help', re.compile(r"^\s*(help|commands|\?)[\s!.?]*$|\bwhat can you do\b|\bhow (do|can) i use\b|\bhelp me\b|\bshow (me )?(the )?commands\b", re.I)),
+    ('set_context', re.compile(r"\b(focus|switch|change|set|move|go)\b(\s+\w+){0,3}\s+(on|to)\b|\b(use|select|work on)\s+job\b", re.I)),
+    ('get_report', re.compile(r"\breports?\b", re.I)),
+    ('get_ranking', re.compile(r"\b(top|best|highest[- ]rated|ranked|ranking|rank|strongest|leading|shortlist)\b", re.I)),
+    ('get_applicant_details', re.compile(r"\b(details|profile|tell me about|info(rmation)? (on|about)|who is)\b", re.I)),
+    ('get_overview', re.compile(r"\b(status|overview|stats|statistics|progress|listings?)\b"
+                                r"|\bhow(?:'s| is| are)\s+(?:the |my |our |all )?(?:jobs?|listings?|openings?|positions?|roles?|hiring)\b"
+                                r"|\bhow(?:'s| is| are)\s+[A-Za-z]{2,10}-?\d{2,6}\s+(?:doing|going)\b" # "how's DEV006 going"
+                                r"|\bsummary of\s+(?:the |my |our |all )?(?:jobs?|listings?|openings?|positions?|roles?)\b", re.I)),
+]
+
+# Seed training data; logged LLM-labelled messages are added on top. JOBID/EMAIL/NAME are entity placeholders.
+SEED_EXAMPLES = [
+    ("overview for JOBID", 'get_overview'), ("status on this job", 'get_overview'), ("status of listings", 'get_overview'),
+    ("how are the jobs going", 'get_overview'), ("how many applicants does JOBID have", 'get_overview'),
+    ("give me stats for the current job", 'get_overview'), ("summary of all openings", 'get_overview'),
+    ("how many people applied", 'get_overview'), ("what's happening with JOBID", 'get_overview'),
+    ("top candidates for JOBID", 'get_ranking'), ("who is best here", 'get_ranking'), ("best applicants for this job", 'get_ranking'),
+    ("show the highest rated people", 'get_ranking'), ("rank the applicants for JOBID", 'get_ranking'),
+    ("who should i interview", 'get_ranking'), ("strongest candidates", 'get_ranking'), ("top 3 for JOBID", 'get_ranking'),
+    ("details about EMAIL", 'get_applicant_details'), ("tell me about NAME", 'get_applicant_details'),
+    ("what do you know about NAME", 'get_applicant_details'), ("show profile of NAME", 'get_applicant_details'),
+    ("info on EMAIL for JOBID", 'get_applicant_details'), ("how did NAME score", 'get_applicant_details'),
+    ("what is EMAIL rated", 'get_applicant_details'), ("who is NAME", 'get_applicant_details'),
+    ("report for JOBID", 'get_report'), ("generate a report", 'get_report'), ("can i get a hiring report", 'get_report'),
+    ("export the results for JOBID", 'get_report'),
+    ("focus on job JOBID", 'set_context'), ("switch to JOBID", 'set_context'), ("let's look at JOBID", 'set_context'),
+    ("use job JOBID", 'set_context'), ("change context to JOBID", 'set_context'), ("work on JOBID now", 'set_context'),
+    ("help", 'get_help'), ("what can you do", 'get_help'), ("how do i use this", 'get_help'), ("show commands", 'get_help'),
+    ("what can i ask you", 'get_help'), ("options", 'get_help'),
+    ("hi", 'greeting'), ("hello there", 'greeting'), ("hey", 'greeting'), ("good morning", 'greeting'),
+    ("thanks", 'greeting'), ("thank you", 'greeting'),
+]
+
+
+def extract_entities(message):
+    """Regex entities in the LLM NLU shape: explicit job id (upper-cased), email, and a name after
+    'details about' / 'tell me about' / 'who is' (None where absent)."""
+    email_match = EMAIL_RE.search(message)
+    email = email_match.group(0) if email_match else None
+    without_email = EMAIL_RE.sub(" ", message) # Don't mistake 'bob99@x.com' parts for a job id
+    job_match = JOB_ID_RE.search(without_email)
+    job_id = job_match.group(1).upper() if job_match else None
+    name = None
+    name_match = NAME_RE.search(without_email)
+    if name_match:
+        words = []
+        for word in (name_match.group('name') or name_match.group('who')).split():
+            if word.lower() in NAME_STOP_WORDS or JOB_ID_RE.fullmatch(word): break
+            words.append(word.strip(".'-"))
+        name = " ".join(w for w in words if w) or None
+    return {"job_id": job_id, "applicant_email": email, "applicant_name": name}
+
+
+def _mask_entities(message, entities):
+    """Replaces entity values with placeholders so the model learns phrasing, not specific ids/people."""
+    text = EMAIL_RE.sub(" EMAIL ", message)
+    text = JOB_ID_RE.sub(" JOBID ", text)
+    if entities.get('applicant_name'):
+        text = re.sub(re.escape(entities['applicant_name']), " NAME ", text, flags=re.I)
+    return text
+
+
+def _features(text):
+    tokens = re.findall(r"[a-z0-9']+|EMAIL|JOBID|NAME", text.replace("EMAIL", " EMAIL ").replace("JOBID", " JOBID ").replace("NAME", " NAME "))
+    tokens = [t if t in ('EMAIL', 'JOBID', 'NAME') else t.lower() for t in tokens]
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])] # Unigrams + bigrams
+
+
+class KeywordIntentModel:
+    """TF-IDF centroid classifier: one L2-normalised centroid per intent, cosine similarity to predict."""
+
+    def __init__(self, examples):
+        docs = [(Counter(_features(text)), intent) for text, intent in examples if intent in LOCAL_INTENTS]
+        doc_freq = Counter(term for counts, _ in docs for term in counts)
+        self.idf = {term: math.log((1 + len(docs)) / (1 + df)) + 1 for term, df in doc_freq.items()}
+        sums = defaultdict(Counter)
+        for counts, intent in docs:
+            for term, weight in self._vector(counts).items(): sums[intent][term] += weight
+        self.centroids = {intent: self._normalise(vec) for intent, vec in sums.items()}
+        self.size = len(docs)
+
+    def _vector(self, counts):
+        return self._normalise({t: (1 + math.log(c)) * self.idf[t] for t, c in counts.items() if t in self.idf})
+
+    @staticmethod
+    def _normalise(vec):
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        return {t: w / norm for t, w in vec.items()}
+
+    def scores(self, text):
+        """Returns [(intent, cosine score)] best first."""
+        vec = self._vector(Counter(_features(text)))
+        ranked = [(intent, sum(w * centroid.get(t, 0.0) for t, w in vec.items())) for intent, centroid in self.centroids.items()]
+        return sorted(ranked, key=lambda item: item[1], reverse=True)
+
+
+_model = None
+_model_lock = threading.Lock() # Guards the model and the retrain bookkeeping; never held while training
+_log_lock = threading.Lock()   # Serialises appends to and compaction of INTENT_LOG_FILE
+_new_examples = 0
+_trained_at = 0.0
+_training = False
+INTENT_STATS = Counter() # 'rules' / 'model' / 'llm' turns handled, for logs
+
+
+def _load_logged_examples():
+    if not os.path.exists(INTENT_LOG_FILE): return []
+    examples = []
+    try:
+        with open(INTENT_LOG_FILE, encoding="utf-8") as f:
+            for line in f:
+                try: entry = json.loads(line)
+                except json.JSONDecodeError: continue
+                if isinstance(entry, dict) and entry.get('intent') in LOCAL_INTENTS and entry.get('text'):
+                    examples.append((entry['text'], entry['intent']))
+    except OSError as e:
+        print(f"Warning: Could not read intent log {INTENT_LOG_FILE}: {e}")
+    return examples[-INTENT_LOG_MAX_EXAMPLES:]
+
+
+def _compact_intent_log():
+    """Rewrites the intent log with its newest lines that fit in half of INTENT_LOG_MAX_BYTES (at most
+    INTENT_LOG_MAX_EXAMPLES, the most training ever reads). Caller holds _log_lock."""
+    with open(INTENT_LOG_FILE, encoding="utf-8") as f: lines = f.readlines()[-INTENT_LOG_MAX_EXAMPLES:]
+    kept, size = [], 0
+    for line in reversed(lines):
+        size += len(line.encode("utf-8"))
+        if size > INTENT_LOG_MAX_BYTES // 2: break
+        kept.append(line)
+    tmp_file = INTENT_LOG_FILE + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f: f.writelines(reversed(kept))
+    os.replace(tmp_file, INTENT_LOG_FILE) # Atomic: readers see the old or the new log, never half of one
+    print(f"--- [Intent] Intent log compacted to its newest {len(kept)} examples. ---")
+
+
+def get_intent_model():
+    """Returns the keyword model. It is trained from seeds + the intent log on first use and retrained once
+    INTENT_RETRAIN_MIN_EXAMPLES new examples were logged (or INTENT_RETRAIN_SECONDS passed with any new one).
+    Training runs outside _model_lock; other callers keep using the current model meanwhile."""
+    global _model, _new_examples, _trained_at, _training
+    with _model_lock:
+        due = _model is None or _new_examples >= INTENT_RETRAIN_MIN_EXAMPLES or \
+            (_new_examples > 0 and time.monotonic() - _trained_at >= INTENT_RETRAIN_SECONDS)
+        if not due or (_training and _model is not None): return _model
+        _training, pending = True, _new_examples
+    try:
+        logged = _load_logged_examples()
+        model = KeywordIntentModel(SEED_EXAMPLES + logged)
+    finally:
+        with _model_lock: _training = False
+    with _model_lock:
+        _model, _trained_at = model, time.monotonic()
+        _new_examples = max(0, _new_examples - pending) # Examples logged during training count towards the next run
+    print(f"--- [Intent] Keyword model trained on {model.size} examples ({len(logged)} logged). ---")
+    return model
+
+
+def record_intent_example(message, nlu_result):
+    """Logs an LLM-classified message (entities masked) as training data for the keyword model."""
+    global _new_examples
+    intent = nlu_result.get('intent') if isinstance(nlu_result, dict) else None
+    if intent not in LOCAL_INTENTS or not message: return False
+    text = _mask_entities(message, nlu_result.get('entities') or {})
+    try:
+        with _log_lock:
+            with open(INTENT_LOG_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"text": text, "intent": intent}) + "\n")
+            if os.path.getsize(INTENT_LOG_FILE) > INTENT_LOG_MAX_BYTES: _compact_intent_log()
+        with _model_lock: _new_examples += 1
+        return True
+    except OSError as e:
+        print(f"Warning: Could not write intent log {INTENT_LOG_FILE}: {e}")
+        return False
+
+
+def classify_hr_chat_intent(user_message):
+    """Local NLU. Returns the same shape as understand_hr_chat_intent plus 'source' ('rules'/'model') and
+    'confidence', or None when unsure (ambiguous, missing required entities) so the caller asks the LLM."""
+    if not INTENT_FAST_PATH or not user_message or not user_message.strip(): return None
+    entities = extract_entities(user_message)
+    matched = [intent for intent, pattern in INTENT_PATTERNS if pattern.search(user_message)]
+    if entities['applicant_email'] and 'get_applicant_details' not in matched and 'set_context' not in matched:
+        matched.append('get_applicant_details') # An email means an applicant question
+
+    scores = get_intent_model().scores(_mask_entities(user_message, entities))
+    intent, source, confidence = None, None, 0.0
+    if len(matched) == 1:
+        intent, source, confidence = matched[0], 'rules', INTENT_RULE_CONFIDENCE
+    elif scores:
+        best, best_score = scores[0]
+        runner_up = scores[1][1] if len(scores) > 1 else 0.0
+        # Several rules matched: trust the model only if it picks one of them; no rule matched: the model alone
+        if (not matched or best in matched) and best_score >= INTENT_MODEL_MIN_SCORE and best_score - runner_up >= INTENT_MODEL_MIN_MARGIN:
+            intent, source, confidence = best, 'model', round(best_score, 3)
+
+    if intent is None: return None
+    if intent == 'set_context' and not entities['job_id']: return None
+    if intent == 'get_applicant_details' and not (entities['applicant_email'] or entities['applicant_name']): return None
+    if intent in ('get_overview', 'get_ranking') and (entities['applicant_email'] or entities['applicant_name']): return None # About a person
+    INTENT_STATS[source] += 1
+    return {"intent": intent, "entities": entities, "source": source, "confidence": confidence}
+
+
+# --- Example Usage / Testing ---
+if __name__ == "__main__":
+    import tempfile
+    print("\n" + "="*10 + " Running Intent Classifier Tests " + "="*10)
+    INTENT_LOG_FILE = os.path.join(tempfile.mkdtemp(prefix="intent_"), "chat_intent_log.jsonl")
+
+    print("\n1. Testing Entity Extraction...")
+    assert extract_entities("top candidates for dev006") == {"job_id": "DEV006", "applicant_email": None, "applicant_name": None}, "Test Failed: Job id."
+    ents = extract_entities("details about alice99@example.com for MKTG-02")
+    assert ents == {"job_id": "MKTG-02", "applicant_email": "alice99@example.com", "applicant_name": None}, f"Test Failed: Email/job id {ents}"
+    assert extract_entities("tell me about Adrija Ghosh for DEV006")['applicant_name'] == "Adrija Ghosh", "Test Failed: Name."
+    assert extract_entities("tell me about this applicant")['applicant_name'] is None, "Test Failed: Pronoun taken as name."
+    print("Entity extraction verified.")
+
+    print("\n2. Testing Local Classification...")
+    expected = {
+        "hello": 'greeting', "help": 'get_help', "what can you do?": 'get_help',
+        "status of listings": 'get_overview', "overview for DEV006": 'get_overview',
+        "top candidates for JOB123": 'get_ranking', "who is best here?": 'get_ranking',
+        "details about bob@example.com": 'get_applicant_details', "tell me about Adrija Ghosh": 'get_applicant_details',
+        "focus on job DEV006": 'set_context', "report for DEV006": 'get_report',
+        "how many people applied to DEV006": 'get_overview', "who should I interview for DEV006": 'get_ranking',
+    }
+    for message, intent in expected.items():
+        result = classify_hr_chat_intent(message)
+        print(f"  {message!r:45} -> {result and (result['intent'], result['source'], result['confidence'])}")
+        assert result and result['intent'] == intent, f"Test Failed: {message!r} classified as {result}"
+    for message in ["focus on this", "tell me about them", "what is the weather in Paris tomorrow", "best report status"]:
+        assert classify_hr_chat_intent(message) is None, f"Test Failed: {message!r} should fall back to the LLM."
+    misroutes = { # Phrasings that used to be answered locally with the wrong intent
+        "help me find the top candidates for DEV006": 'get_help', "how is Adrija Ghosh doing on DEV006": 'get_overview',
+        "how are you": 'get_overview', "give me a summary of Adrija Ghosh": 'get_overview',
+        "top candidates like bob@example.com": 'get_ranking',
+    }
+    for message, wrong_intent in misroutes.items():
+        result = classify_hr_chat_intent(message)
+        print(f"  {message!r:45} -> {result and (result['intent'], result['source'], result['confidence'])}")
+        assert not result or result['intent'] != wrong_intent, f"Test Failed: {message!r} misrouted to {result}"
+    assert classify_hr_chat_intent("how are you") is None, "Test Failed: Small talk should fall back to the LLM."
+    assert classify_hr_chat_intent("how's DEV006 going")['intent'] == 'get_overview', "Test Failed: Job progress question."
+    assert classify_hr_chat_intent("summary of all openings")['intent'] == 'get_overview', "Test Failed: Listings summary."
+    print(f"Local classification verified. Stats: {dict(INTENT_STATS)}")
+
+    print("\n3. Testing Learning From Logged LLM Labels...")
+    novel = "which of the applicants for DEV006 have gone furthest in the pipeline"
+    before = classify_hr_chat_intent(novel)
+    INTENT_RETRAIN_MIN_EXAMPLES = 3
+    trained = get_intent_model()
+    for phrase in ["which applicants for JOB1 have gone furthest", "who has gone furthest in the pipeline for JOB22"]:
+        assert record_intent_example(phrase, {"intent": "get_ranking", "entities": {"job_id": None}}), "Test Failed: Log example."
+    assert get_intent_model() is trained, "Test Failed: Retrained before INTENT_RETRAIN_MIN_EXAMPLES were logged."
+    assert record_intent_example("applicants furthest along in the pipeline", {"intent": "get_ranking", "entities": {}}), "Test Failed: Log example."
+    assert not record_intent_example("what's the weather", {"intent": "unknown", "entities": {}}), "Test Failed: Unknown must not be learned."
+    after = classify_hr_chat_intent(novel)
+    print(f"  before: {before and before['intent']}, after: {after and (after['intent'], after['confidence'])}")
+    assert after and after['intent'] == 'get_ranking' and after['source'] == 'model', "Test Failed: Logged examples not learned."
+    with open(INTENT_LOG_FILE) as f: assert "JOBID" in f.read(), "Test Failed: Job ids must be masked in the log."
+    print("Learning from logged labels verified.")
+
+    print("\n4. Testing Intent Log Cap...")
+    INTENT_LOG_MAX_BYTES = 2000
+    for i in range(100): record_intent_example(f"rank applicants batch {i}", {"intent": "get_ranking", "entities": {}})
+    with open(INTENT_LOG_FILE) as f: lines = f.readlines()
+    print(f"  {len(lines)} lines, {os.path.getsize(INTENT_LOG_FILE)} bytes kept")
+    assert os.path.getsize(INTENT_LOG_FILE) <= INTENT_LOG_MAX_BYTES and "batch 99" in lines[-1], "Test Failed: Log not capped to newest lines."
+    assert not os.path.exists(INTENT_LOG_FILE + ".tmp"), "Test Failed: Compaction left a temp file."
+    print("Intent log cap verified.")
+    print("\n" + "="*10 + " Intent Classifier Tests Complete " + "="*10)
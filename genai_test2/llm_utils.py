@@ -6,7 +6,9 @@ from langchain.prompts import ChatPromptTemplate
 from langchain.schema.output_parser import StrOutputParser
 from dotenv import load_dotenv
 import json
+import math
 import re
+import threading
 import traceback # For detailed error logging
 
 # Load environment variables from .env file
@@ -72,6 +74,60 @@ def clean_json_response(response_text):
         print(f"Warning: Could not extract valid JSON object from response:\n{response_text}")
         return None # Return None if extraction failed
 
+# --- Prompt Payload Serialization ---
+# Structured resumes/JDs are sent to the LLM as compact JSON: null/empty fields dropped, no indentation,
+# long lists and multi-line descriptions capped. Every payload's token estimate before (indent=2, as the
+# prompts used to send) and after is accumulated in PROMPT_PAYLOAD_STATS.
+PROMPT_MAX_LIST_ITEMS = 15        # Longer lists keep the first N items plus a "(+K more)" marker
+PROMPT_MAX_DESCRIPTION_LINES = 8  # Multi-line strings (experience bullets) keep the first N non-blank lines
+PROMPT_MAX_TEXT_CHARS = 1500      # Hard cap for any single string value
+CHARS_PER_TOKEN = 4               # Rough estimate for English text/JSON (no tokenizer call needed)
+
+PROMPT_PAYLOAD_STATS = {"payloads": 0, "tokens_before": 0, "tokens_after": 0}
+_payload_stats_lock = threading.Lock()
+
+def estimate_tokens(text):
+    """Approximate token count of a prompt string (~CHARS_PER_TOKEN characters per token)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+def compact_payload(value):
+    """Returns a copy of value with None/empty strings/lists/dicts removed and long lists/texts capped.
+    Returns None if nothing is left. Numbers and booleans (including 0/False) are kept."""
+    if isinstance(value, dict):
+        compacted = {}
+        for key, item in value.items():
+            item = compact_payload(item)
+            if item is not None: compacted[key] = item
+        return compacted or None
+    if isinstance(value, (list, tuple)):
+        items = [item for item in (compact_payload(v) for v in value) if item is not None]
+        if len(items) > PROMPT_MAX_LIST_ITEMS:
+            items = items[:PROMPT_MAX_LIST_ITEMS] + [f"(+{len(items) - PROMPT_MAX_LIST_ITEMS} more)"]
+        return items or None
+    if isinstance(value, str):
+        lines = [line.strip() for line in value.strip().splitlines() if line.strip()]
+        if not lines: return None
+        if len(lines) > PROMPT_MAX_DESCRIPTION_LINES:
+            lines = lines[:PROMPT_MAX_DESCRIPTION_LINES] + [f"(+{len(lines) - PROMPT_MAX_DESCRIPTION_LINES} more lines)"]
+        text = "\n".join(lines)
+        return text if len(text) <= PROMPT_MAX_TEXT_CHARS else text[:PROMPT_MAX_TEXT_CHARS].rstrip() + "..."
+    return value
+
+def to_prompt_json(data, label=None):
+    """Serializes a structured resume/JD for a prompt (see compact_payload). Raises TypeError for
+    non-JSON-serializable input, like json.dumps. Pass label to log the before/after token estimate."""
+    compact_str = json.dumps(compact_payload(data), separators=(',', ':'), ensure_ascii=False)
+    before = estimate_tokens(json.dumps(data, indent=2))
+    after = estimate_tokens(compact_str)
+    with _payload_stats_lock:
+        PROMPT_PAYLOAD_STATS["payloads"] += 1
+        PROMPT_PAYLOAD_STATS["tokens_before"] += before
+        PROMPT_PAYLOAD_STATS["tokens_after"] += after
+    if label:
+        saved = (100.0 * (before - after) / before) if before else 0.0
+        print(f"--- [Prompt payload] {label}: ~{before} -> ~{after} tokens ({saved:.0f}% saved) ---")
+    return compact_str
+
 def to_5_star(score):
     """Converts a 0-100 score to a 0.00-5.00 score with 0.25 increments."""
     if score is None or not isinstance(score, (int, float)):
@@ -89,12 +145,7 @@ def to_5_star(score):
 
 # --- Core LLM Interaction Functions ---
 
-def structure_resume_text(resume_text):
-    """Extracts key info from resume text and returns structured JSON."""
-    if not llm: return {"error": "Gemini LLM not available."}
-
-    # --- Refined Prompt ---
-    prompt_template = """
+STRUCTURE_RESUME_PROMPT = """
     Analyze the following resume text provided between the '---' markers. Your goal is to extract key information and format it STRICTLY as a single JSON object.
 
     Instructions:
@@ -142,10 +193,14 @@ def structure_resume_text(resume_text):
     ---
 
     JSON Output:
-    """
+    """  # Input: resume_text
 
-    prompt = ChatPromptTemplate.from_template(prompt_template)
-    chain = prompt | llm | StrOutputParser()
+def structure_resume_text(resume_text):
+    """Extracts key info from resume text and returns structured JSON."""
+    if not llm: return {"error": "Gemini LLM not available."}
+
+
+    chain = get_chain("structure_resume")
     print("\n--- Sending text to Gemini LLM for structuring resume (using refined prompt) ---")
     raw_response = ""
     try:
@@ -196,9 +251,7 @@ def structure_resume_text(resume_text):
 
 # --- Keep other functions (structure_job_description, rate_resume_against_jd, etc.) as is ---
 
-def structure_job_description(jd_text):
-    if not llm: return {"error": "Gemini LLM not available."}
-    prompt_template = """
+STRUCTURE_JD_PROMPT = """
     Analyze the following job description text. Respond ONLY with a valid JSON object representing the extracted requirements.
     DO NOT include any introductory text, explanations, markdown markers (like ```json), or concluding remarks outside the JSON structure itself.
     The JSON object must include keys: 'job_title', 'required_skills' (list of strings), 'preferred_skills' (list of strings), 'required_experience_years' (integer or null), 'required_education' (string or null), 'key_responsibilities' (list of strings).
@@ -210,9 +263,11 @@ def structure_job_description(jd_text):
     ---
 
     JSON Output:
-    """
-    prompt = ChatPromptTemplate.from_template(prompt_template)
-    chain = prompt | llm | StrOutputParser()
+    """  # Input: jd_text
+
+def structure_job_description(jd_text):
+    if not llm: return {"error": "Gemini LLM not available."}
+    chain = get_chain("structure_jd")
     print("\n--- Sending text to Gemini LLM for structuring JD ---")
     raw_response = ""
     try:
@@ -249,9 +304,22 @@ def structure_job_description(jd_text):
         traceback.print_exc()
         return {"error": "Failed to structure job description with Gemini", "details": str(e), "raw_response": raw_response}
 
-def rate_resume_against_jd(structured_resume, structured_jd):
-    if not analyzer_llm: return {"error": "Gemini LLM (analyzer) not available."}
-    prompt_template = """
+RATING_KEYS = ["rating", "summary", "fits", "lacks"]
+
+def _normalize_rating(parsed_json):
+    """Validates/coerces one rating object in place (shared by single and batch rating). Raises ValueError."""
+    if not isinstance(parsed_json, dict): raise ValueError("Parsed response is not a dictionary.")
+    if not all(key in parsed_json for key in RATING_KEYS): raise ValueError(f"Missing required keys. Found: {list(parsed_json.keys())}")
+    # Validate types more carefully
+    try: parsed_json["rating"] = int(parsed_json.get("rating", 0))
+    except (ValueError, TypeError): parsed_json["rating"] = 0; print("Warning: Invalid rating type, set to 0")
+    if not isinstance(parsed_json.get("summary"), str): parsed_json["summary"] = str(parsed_json.get("summary", "")); print("Warning: Invalid summary type, converted to str")
+    if not isinstance(parsed_json.get("fits"), list): parsed_json["fits"] = []; print("Warning: Invalid fits type, set to []")
+    if not isinstance(parsed_json.get("lacks"), list): parsed_json["lacks"] = []; print("Warning: Invalid lacks type, set to []")
+    parsed_json["rating"] = max(0, min(100, parsed_json["rating"]))
+    return parsed_json
+
+RATING_PROMPT = """
     Act as an expert HR analyst. Analyze the structured resume data and structured job description data provided below.
     Respond ONLY with a valid JSON object containing your evaluation.
     DO NOT include any introductory text, explanations, markdown markers (like ```json), or concluding remarks outside the JSON structure itself.
@@ -272,16 +340,19 @@ def rate_resume_against_jd(structured_resume, structured_jd):
     ```
 
     JSON Output:
-    """
+    """  # Inputs: resume_data, jd_data (to_prompt_json)
+
+def rate_resume_against_jd(structured_resume, structured_jd, rating_llm=None):
+    rating_llm = rating_llm or analyzer_llm # rating_llm: optional override (e.g. a stub in tests)
+    if not rating_llm: return {"error": "Gemini LLM (analyzer) not available."}
     default_error_response = {"error": "Failed to get rating", "rating": 0, "summary": "Error", "fits": [], "lacks": []}
-    prompt = ChatPromptTemplate.from_template(prompt_template)
-    chain = prompt | analyzer_llm | StrOutputParser()
+    chain = get_chain("rating", rating_llm)
     print("\n--- Sending structured data to Gemini LLM for rating ---")
     raw_response = ""
     try:
         try:
-             resume_json_str = json.dumps(structured_resume, indent=2)
-             jd_json_str = json.dumps(structured_jd, indent=2)
+             resume_json_str = to_prompt_json(structured_resume, "rating resume")
+             jd_json_str = to_prompt_json(structured_jd, "rating JD")
         except TypeError as json_dump_e:
              print(f"Error: Input data is not JSON serializable: {json_dump_e}")
              return {**default_error_response, "error": "Invalid input data format."}
@@ -293,18 +364,7 @@ def rate_resume_against_jd(structured_resume, structured_jd):
         json_str = clean_json_response(response)
         if json_str:
              try:
-                 parsed_json = json.loads(json_str)
-                 required_keys = ["rating", "summary", "fits", "lacks"]
-                 if not isinstance(parsed_json, dict): raise ValueError("Parsed response is not a dictionary.")
-                 if not all(key in parsed_json for key in required_keys): raise ValueError(f"Missing required keys. Found: {list(parsed_json.keys())}")
-                 # Validate types more carefully
-                 try: parsed_json["rating"] = int(parsed_json.get("rating", 0))
-                 except (ValueError, TypeError): parsed_json["rating"] = 0; print("Warning: Invalid rating type, set to 0")
-                 if not isinstance(parsed_json.get("summary"), str): parsed_json["summary"] = str(parsed_json.get("summary", "")); print("Warning: Invalid summary type, converted to str")
-                 if not isinstance(parsed_json.get("fits"), list): parsed_json["fits"] = []; print("Warning: Invalid fits type, set to []")
-                 if not isinstance(parsed_json.get("lacks"), list): parsed_json["lacks"] = []; print("Warning: Invalid lacks type, set to []")
-                 parsed_json["rating"] = max(0, min(100, parsed_json["rating"]))
-                 return parsed_json
+                 return _normalize_rating(json.loads(json_str))
              except (json.JSONDecodeError, ValueError, TypeError) as json_e:
                  print(f"Error: Failed to parse or validate rating JSON. Error: {json_e}")
                  print(f"Cleaned JSON string was: {json_str}")
@@ -317,9 +377,121 @@ def rate_resume_against_jd(structured_resume, structured_jd):
         traceback.print_exc()
         return {**default_error_response, "error": "Failed to rate resume with Gemini", "details": str(e), "raw_response": raw_response}
 
-def summarize_text_contextually(text_to_summarize, context_text):
-    if not analyzer_llm: return "Error: Gemini LLM (analyzer) not available."
-    prompt_template = """
+# --- Batched Rating ---
+# One prompt rates several candidates against the JD, so the JD tokens are sent once per batch
+# instead of once per applicant. Batches are packed up to RATING_BATCH_SIZE candidates and
+# RATING_BATCH_MAX_CHARS of resume JSON; a batch whose call fails or whose response can't be parsed
+# is split in half and retried, and individual missing/malformed entries are re-rated one at a time.
+RATING_BATCH_SIZE = 8
+RATING_BATCH_MAX_CHARS = 24000 # ~6k tokens of packed resumes per prompt
+
+BATCH_RATING_PROMPT = """
+    Act as an expert HR analyst. Rate EACH candidate below against the same structured job description.
+    Respond ONLY with a valid JSON array containing exactly one object per candidate.
+    DO NOT include any introductory text, explanations, markdown markers (like ```json), or concluding remarks outside the JSON array itself.
+    Each object MUST have these exact keys:
+    - "applicant_id": The candidate's applicant_id, copied exactly as given.
+    - "rating": An integer score from 0 to 100 representing suitability. Be realistic based on REQUIREMENTS vs candidate profile. Rate each candidate independently.
+    - "summary": A concise (1-2 sentence) justification for the rating, highlighting key strengths/weaknesses against requirements.
+    - "fits": A list of strings detailing specific aspects where the resume MATCHES the JD requirements. Be specific. Maximum 5 items.
+    - "lacks": A list of strings detailing specific aspects where the resume DOES NOT meet critical JD requirements. Be specific. Maximum 5 items.
+
+    Structured Job Description Data:
+    ```json
+    {jd_data}
+    ```
+
+    Candidates ({num_candidates}), one JSON object per line with "applicant_id" and "resume":
+    ---
+    {candidates}
+    ---
+
+    JSON Output:
+    """
+
+def clean_json_array_response(response_text):
+    """Like clean_json_response, but extracts the outermost JSON array ('[' ... ']')."""
+    if not isinstance(response_text, str):
+        return None
+    cleaned = re.sub(r"```[a-zA-Z]*\n?", "", response_text, flags=re.IGNORECASE | re.DOTALL)
+    cleaned = re.sub(r"```", "", cleaned)
+    start_index = cleaned.find('[')
+    end_index = cleaned.rfind(']')
+    if start_index != -1 and end_index > start_index:
+        return cleaned[start_index : end_index + 1].strip()
+    print(f"Warning: Could not extract JSON array from response:\n{response_text[:500]}")
+    return None
+
+def _pack_rating_batches(candidate_lines, batch_size, max_chars):
+    """Greedily groups (applicant_id, resume, line) tuples by count and packed size."""
+    batches, current, current_chars = [], [], 0
+    for item in candidate_lines:
+        if current and (len(current) >= batch_size or current_chars + len(item[2]) > max_chars):
+            batches.append(current); current, current_chars = [], 0
+        current.append(item); current_chars += len(item[2])
+    if current: batches.append(current)
+    return batches
+
+def rate_resumes_batch(candidates, structured_jd, batch_size=RATING_BATCH_SIZE, max_chars=RATING_BATCH_MAX_CHARS, rating_llm=None):
+    """Rates many structured resumes against one JD with batched prompts.
+    candidates: iterable of (applicant_id, structured_resume) pairs (ids must be unique).
+    Returns {applicant_id: rating dict}; each value has the same shape as rate_resume_against_jd's result
+    (including the 'error' key when that candidate could not be rated)."""
+    rating_llm = rating_llm or analyzer_llm
+    candidates = [(str(applicant_id), resume) for applicant_id, resume in candidates if applicant_id]
+    if not candidates: return {}
+    if not rating_llm: return {applicant_id: {"error": "Gemini LLM (analyzer) not available."} for applicant_id, _ in candidates}
+
+    results = {}
+    try: jd_json_str = to_prompt_json(structured_jd, "batch rating JD")
+    except TypeError as json_dump_e:
+        print(f"Error: JD data is not JSON serializable: {json_dump_e}")
+        return {applicant_id: {"error": "Invalid input data format.", "rating": 0, "summary": "Error", "fits": [], "lacks": []} for applicant_id, _ in candidates}
+
+    candidate_lines = []
+    for applicant_id, resume in candidates:
+        try: line = '{"applicant_id":' + json.dumps(applicant_id, ensure_ascii=False) + ',"resume":' + to_prompt_json(resume) + '}'
+        except TypeError: results[applicant_id] = rate_resume_against_jd(resume, structured_jd, rating_llm); continue # Let the single path report it
+        candidate_lines.append((applicant_id, resume, line))
+
+    chain = get_chain("batch_rating", rating_llm)
+    stats = {"calls": 0, "splits": 0, "single_retries": 0}
+
+    def rate_individually(items):
+        for applicant_id, resume, _ in items:
+            stats["single_retries"] += 1
+            results[applicant_id] = rate_resume_against_jd(resume, structured_jd, rating_llm)
+
+    def rate_batch(batch):
+        if len(batch) == 1: return rate_individually(batch) # Nothing left to split
+        stats["calls"] += 1
+        print(f"\n--- Sending {len(batch)} candidates to Gemini LLM for batched rating ---")
+        try:
+            response = chain.invoke({"jd_data": jd_json_str, "num_candidates": len(batch),
+                                     "candidates": "\n".join(line for _, _, line in batch)})
+            parsed = json.loads(clean_json_array_response(response) or "null")
+            if not isinstance(parsed, list): raise ValueError("Batched rating response is not a JSON array.")
+        except Exception as e: # Token limit, transport error or unparseable output => smaller batches
+            print(f"Warning: Batched rating of {len(batch)} candidates failed ({e}); splitting batch.")
+            stats["splits"] += 1
+            middle = len(batch) // 2
+            rate_batch(batch[:middle]); rate_batch(batch[middle:])
+            return
+        expected = {applicant_id for applicant_id, _, _ in batch}
+        for entry in parsed:
+            applicant_id = str(entry.get("applicant_id")) if isinstance(entry, dict) else None
+            if applicant_id not in expected or applicant_id in results: continue # Unknown/duplicate id
+            try: results[applicant_id] = _normalize_rating({k: v for k, v in entry.items() if k != "applicant_id"})
+            except ValueError as entry_e: print(f"Warning: Malformed batched rating for {applicant_id}: {entry_e}")
+        rate_individually([item for item in batch if item[0] not in results]) # Missing or malformed entries
+
+    for batch in _pack_rating_batches(candidate_lines, max(1, batch_size), max_chars):
+        rate_batch(batch)
+    print(f"Batched rating done: {len(results)} candidates, {stats['calls']} batch calls, "
+          f"{stats['splits']} splits, {stats['single_retries']} single re-rates.")
+    return results
+
+SUMMARY_PROMPT = """
     Based solely on the provided job context and resume text, write a concise summary (3-4 sentences max) of the resume focusing ONLY on its direct relevance to the key requirements mentioned in the job context.
     Highlight matches and significant gaps regarding skills and experience required by the job context.
     Start the summary directly, without any introductory phrases like "This resume shows..." or "The candidate...". Output only the summary text.
@@ -335,9 +507,11 @@ def summarize_text_contextually(text_to_summarize, context_text):
     ---
 
     Concise, Context-Aware Summary (3-4 sentences maximum):
-    """
-    prompt = ChatPromptTemplate.from_template(prompt_template)
-    chain = prompt | analyzer_llm | StrOutputParser()
+    """  # Inputs: context, main_text
+
+def summarize_text_contextually(text_to_summarize, context_text):
+    if not analyzer_llm: return "Error: Gemini LLM (analyzer) not available."
+    chain = get_chain("summary")
     print("\n--- Sending text to Gemini LLM for contextual summary ---")
     raw_response = ""
     try:
@@ -353,13 +527,7 @@ def summarize_text_contextually(text_to_summarize, context_text):
 
 # --- NLU and Highlight Generation ---
 
-def understand_hr_chat_intent(user_message: str, current_job_context: str = None):
-    """Uses Gemini LLM to understand intent and extract entities from HR chat."""
-    if not llm: return {"error": "Gemini LLM not available."}
-
-    context_hint = f"The user might be asking about Job ID '{current_job_context}' if they use terms like 'this job', 'current job', 'here', or don't specify another Job ID." if current_job_context else "No specific job context is currently set."
-
-    prompt_template = f"""
+NLU_PROMPT = """
     Analyze the HR user's chat message below. Identify the primary intent and extract relevant entities (job_id, applicant_email, applicant_name).
     {context_hint}
 
@@ -388,18 +556,24 @@ def understand_hr_chat_intent(user_message: str, current_job_context: str = None
 
     User Message:
     ---
-    {{user_message}}
+    {user_message}
     ---
 
     JSON Output:
-    """
-    prompt = ChatPromptTemplate.from_template(prompt_template)
-    chain = prompt | llm | StrOutputParser()
+    """  # Inputs: context_hint, user_message
+
+def understand_hr_chat_intent(user_message: str, current_job_context: str = None):
+    """Uses Gemini LLM to understand intent and extract entities from HR chat."""
+    if not llm: return {"error": "Gemini LLM not available."}
+
+    context_hint = f"The user might be asking about Job ID '{current_job_context}' if they use terms like 'this job', 'current job', 'here', or don't specify another Job ID." if current_job_context else "No specific job context is currently set."
+
+    chain = get_chain("nlu")
     print("\n--- Sending HR chat message to Gemini LLM for NLU ---")
     raw_response = ""
     default_nlu_error = {"error": "Failed to understand message", "intent": "unknown", "entities": {"job_id": None, "applicant_email": None, "applicant_name": None}}
     try:
-        response = chain.invoke({"user_message": user_message})
+        response = chain.invoke({"context_hint": context_hint, "user_message": user_message})
         raw_response = response
         # print(f"--- Gemini raw response (NLU): ---\n{response}") # Less verbose
         json_str = clean_json_response(response)
@@ -433,22 +607,7 @@ def understand_hr_chat_intent(user_message: str, current_job_context: str = None
         traceback.print_exc()
         return {**default_nlu_error, "error": "Failed to understand message with Gemini", "details": str(e), "raw_response": raw_response}
 
-def generate_ranking_highlights(top_candidates_data, job_context):
-    """Uses Gemini LLM to generate a 1-sentence highlight for each top candidate."""
-    if not analyzer_llm: return {"error": "Gemini LLM (analyzer) not available."}
-    if not top_candidates_data: return {}
-
-    candidates_input_str = ""
-    for i, candidate in enumerate(top_candidates_data):
-        summary = candidate.get('summary', 'No summary available.')
-        candidates_input_str += f"\nCandidate {i+1}:\n"
-        candidates_input_str += f"  Name: {candidate.get('name', candidate.get('applicant_id'))}\n"
-        candidates_input_str += f"  ID: {candidate.get('applicant_id')}\n" # Use ID as key
-        candidates_input_str += f"  AI Summary/Notes: {summary}\n"
-
-    job_context_str = json.dumps(job_context, indent=2)
-
-    prompt_template = """
+HIGHLIGHTS_PROMPT = """
     Act as an expert HR analyst reviewing top candidates. You are given information about the job and summaries/notes for the top {num_candidates} candidates.
     For EACH candidate provided below, write exactly ONE concise highlight sentence explaining their strongest qualification or main reason for being a top candidate *specifically for this job*.
     Focus on key skills, experience, or education mentioned in the job context.
@@ -471,10 +630,25 @@ def generate_ranking_highlights(top_candidates_data, job_context):
       "email2@example.com": "Excellent fit due to direct experience in API design mentioned in the job requirements.",
       "email3@example.com": "Possesses the required Computer Science degree and demonstrates relevant project experience."
     }}
-    """
+    """  # Inputs: num_candidates, job_context, candidates_info
+
+def generate_ranking_highlights(top_candidates_data, job_context):
+    """Uses Gemini LLM to generate a 1-sentence highlight for each top candidate."""
+    if not analyzer_llm: return {"error": "Gemini LLM (analyzer) not available."}
+    if not top_candidates_data: return {}
+
+    candidates_input_str = ""
+    for i, candidate in enumerate(top_candidates_data):
+        summary = compact_payload(candidate.get('summary')) or 'No summary available.' # Capped like other payloads
+        candidates_input_str += f"\nCandidate {i+1}:\n"
+        candidates_input_str += f"  Name: {candidate.get('name', candidate.get('applicant_id'))}\n"
+        candidates_input_str += f"  ID: {candidate.get('applicant_id')}\n" # Use ID as key
+        candidates_input_str += f"  AI Summary/Notes: {summary}\n"
+
+    job_context_str = to_prompt_json(job_context, "highlights job context")
+
 
-    prompt = ChatPromptTemplate.from_template(prompt_template)
-    chain = prompt | analyzer_llm | StrOutputParser() # Use analyzer LLM
+    chain = get_chain("highlights") # Use analyzer LLM
 
     print("\n--- Sending top candidate data to Gemini LLM for highlights ---")
     raw_response = ""
@@ -508,8 +682,125 @@ def generate_ranking_highlights(top_candidates_data, job_context):
         return {"error": "Failed to generate highlights with Gemini", "details": str(e), "raw_response": raw_response}
 
 
+# --- Chain Registry ---
+# Each chain (prompt | model | StrOutputParser()) is built once per (name, model) on first use and
+# reused by every later call. Chains are LangChain Runnables, so they are safe to share across threads
+# and support .batch()/.abatch(); batch_chain/abatch_chain run many inputs concurrently.
+CHAIN_PROMPTS = {
+    # name: (prompt template, which configured model: 'llm' = structured/NLU, 'analyzer' = ratings/summaries)
+    "structure_resume": (STRUCTURE_RESUME_PROMPT, "llm"),
+    "structure_jd": (STRUCTURE_JD_PROMPT, "llm"),
+    "nlu": (NLU_PROMPT, "llm"),
+    "rating": (RATING_PROMPT, "analyzer"),
+    "batch_rating": (BATCH_RATING_PROMPT, "analyzer"),
+    "summary": (SUMMARY_PROMPT, "analyzer"),
+    "highlights": (HIGHLIGHTS_PROMPT, "analyzer"),
+}
+LLM_BATCH_CONCURRENCY = 4 # Default max parallel LLM calls for batch_chain/abatch_chain
+
+_chain_cache = {} # (name, id(model)) -> (model, chain); the model is kept so its id can't be reused
+_chain_cache_lock = threading.Lock()
+
+def get_chain(name, chain_llm=None):
+    """Memoized prompt | model | StrOutputParser() chain for a CHAIN_PROMPTS entry.
+    chain_llm overrides the configured model (e.g. a stub in tests). Returns None if no model is available."""
+    template, model_kind = CHAIN_PROMPTS[name]
+    model = chain_llm or (llm if model_kind == "llm" else analyzer_llm)
+    if model is None: return None
+    key = (name, id(model))
+    cached = _chain_cache.get(key)
+    if cached and cached[0] is model: return cached[1]
+    with _chain_cache_lock:
+        cached = _chain_cache.get(key)
+        if not (cached and cached[0] is model):
+            cached = (model, ChatPromptTemplate.from_template(template) | model | StrOutputParser())
+            _chain_cache[key] = cached
+    return cached[1]
+
+def warm_chains():
+    """Builds every registered chain up front (e.g. at app start-up) so no request pays for it."""
+    return [name for name in CHAIN_PROMPTS if get_chain(name) is not None]
+
+def batch_chain(name, inputs, max_concurrency=LLM_BATCH_CONCURRENCY, chain_llm=None):
+    """Runs a registered chain on many input dicts concurrently; returns raw responses in input order.
+    A failed input yields its exception object instead of failing the whole batch."""
+    chain = get_chain(name, chain_llm)
+    if chain is None: return [RuntimeError("Gemini LLM not available.") for _ in inputs]
+    return chain.batch(list(inputs), config={"max_concurrency": max_concurrency}, return_exceptions=True)
+
+async def abatch_chain(name, inputs, max_concurrency=LLM_BATCH_CONCURRENCY, chain_llm=None):
+    """Async variant of batch_chain (uses the chain's .abatch())."""
+    chain = get_chain(name, chain_llm)
+    if chain is None: return [RuntimeError("Gemini LLM not available.") for _ in inputs]
+    return await chain.abatch(list(inputs), config={"max_concurrency": max_concurrency}, return_exceptions=True)
+
+
 # --- Test Block ---
 if __name__ == "__main__":
+    # --- Offline tests (stub LLM, no API key needed) ---
+    from langchain.schema.runnable import RunnableLambda
+
+    class StubRatingLLM:
+        """Answers batched and single rating prompts deterministically (rating = 10 * number of skills).
+        Fails any prompt with more than max_per_call candidates and corrupts the entries in bad_ids."""
+        def __init__(self, max_per_call=4, bad_ids=()):
+            self.max_per_call, self.bad_ids, self.prompts = max_per_call, set(bad_ids), []
+
+        def __call__(self, prompt_value):
+            text = prompt_value.to_string(); self.prompts.append(text)
+            if "Candidates (" not in text: # Single rate_resume_against_jd prompt
+                resume = json.loads(text.split("Structured Resume Data:")[1].split("```json")[1].split("```")[0])
+                return json.dumps({"rating": 10 * len(resume.get("skills", [])), "summary": "single", "fits": [], "lacks": []})
+            lines = [json.loads(l) for l in text.split("---")[1].strip().splitlines()]
+            if len(lines) > self.max_per_call: raise RuntimeError("input token limit exceeded")
+            return "```json\n" + json.dumps([
+                {"applicant_id": c["applicant_id"], "summary": "batched", "fits": [], "lacks": []} if c["applicant_id"] in self.bad_ids else
+                {"applicant_id": c["applicant_id"], "rating": 10 * len(c["resume"].get("skills", [])), "summary": "batched", "fits": ["x"], "lacks": []}
+                for c in lines]) + "\n```"
+
+    print("\n=== Offline: Batched Rating (stub LLM) ===")
+    stub = StubRatingLLM(max_per_call=4, bad_ids={"c3"})
+    stub_jd = {"job_title": "Stub Engineer", "required_skills": ["Python", "SQL"]}
+    stub_candidates = [(f"c{i}", {"name": f"Cand {i}", "skills": ["s"] * (i % 5)}) for i in range(10)]
+    batch_ratings = rate_resumes_batch(stub_candidates, stub_jd, batch_size=8, rating_llm=RunnableLambda(stub))
+    assert sorted(batch_ratings) == sorted(c[0] for c in stub_candidates), "Test Failed: Not every candidate rated."
+    assert all(batch_ratings[cid]["rating"] == 10 * len(res["skills"]) for cid, res in stub_candidates), "Test Failed: Ratings mapped to wrong ids."
+    assert batch_ratings["c3"]["summary"] == "single" and batch_ratings["c4"]["summary"] == "batched", "Test Failed: Malformed entry not re-asked individually."
+    # 8 -> fails, split 4 + 4; then 2; plus one single re-ask for c3 = 5 prompts (vs 10 unbatched)
+    assert len(stub.prompts) == 5, f"Test Failed: Expected 5 prompts, got {len(stub.prompts)}."
+    assert rate_resumes_batch([], stub_jd, rating_llm=RunnableLambda(stub)) == {}, "Test Failed: Empty input."
+    print("Batched rating with adaptive split and per-item retry verified.")
+    print("\n=== Offline: Compact Prompt Payloads ===")
+    sample_payload = {"name": "Jane", "contact_info": {"email": None, "phone": ""}, "summary": None, "rating": 0, "remote": False,
+                      "skills": [f"skill{i}" for i in range(20)], "education": [],
+                      "experience": [{"title": "Dev", "company": None, "description": "\n".join(f"- bullet {i}" for i in range(12))}]}
+    compacted = compact_payload(sample_payload)
+    assert "contact_info" not in compacted and "summary" not in compacted and "education" not in compacted, "Test Failed: Empty fields kept."
+    assert compacted["rating"] == 0 and compacted["remote"] is False, "Test Failed: Falsy scalars dropped."
+    assert len(compacted["skills"]) == PROMPT_MAX_LIST_ITEMS + 1 and compacted["skills"][-1] == "(+5 more)", "Test Failed: List cap."
+    assert compacted["experience"][0]["description"].endswith("(+4 more lines)") and "company" not in compacted["experience"][0], "Test Failed: Description cap."
+    assert json.loads(to_prompt_json(sample_payload)) == compacted, "Test Failed: Serialized payload differs."
+    assert estimate_tokens(to_prompt_json(sample_payload)) < estimate_tokens(json.dumps(sample_payload, indent=2)), "Test Failed: No token savings."
+    print("Compact prompt payload serialization verified.")
+    print("\n=== Offline: Chain Registry (stub LLM) ===")
+    import asyncio
+    echo_llm = RunnableLambda(lambda prompt_value: f"echo:{len(prompt_value.to_string())}")
+    assert get_chain("summary", echo_llm) is get_chain("summary", echo_llm), "Test Failed: Chain not memoized."
+    assert get_chain("summary", echo_llm) is not get_chain("highlights", echo_llm), "Test Failed: Chains shared across prompts."
+    summary_inputs = [{"context": "job", "main_text": "x" * i} for i in range(5)]
+    batch_out = batch_chain("summary", summary_inputs, chain_llm=echo_llm)
+    lengths = [int(r.split(":")[1]) for r in batch_out]
+    assert len(batch_out) == 5 and lengths == sorted(lengths) and len(set(lengths)) == 5, "Test Failed: batch_chain order/results."
+    assert asyncio.run(abatch_chain("summary", summary_inputs, chain_llm=echo_llm)) == batch_out, "Test Failed: abatch_chain results."
+    def flaky_llm(prompt_value):
+        if "FAIL" in prompt_value.to_string(): raise RuntimeError("boom")
+        return "ok"
+    mixed = batch_chain("summary", [{"context": "c", "main_text": "FAIL"}, {"context": "c", "main_text": "fine"}], chain_llm=RunnableLambda(flaky_llm))
+    assert isinstance(mixed[0], RuntimeError) and mixed[1] == "ok", "Test Failed: Per-input errors not isolated."
+    print("Chain registry memoization and batch/abatch verified.")
+
+
+
     if not llm:
         print("\nCannot run tests: Gemini LLM initialization failed (check API key / .env file).")
     else:
@@ -1,47 +1,47 @@
 # main_crew.py (Corrected run_ranking_direct signature and call)
 import json
 import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 
 # Import utility functions directly
-from file_utils import extract_text_from_file, UPLOAD_FOLDER # Import UPLOAD_FOLDER
+from file_utils import extract_text_from_file, file_sha256, UPLOAD_FOLDER # Import UPLOAD_FOLDER
 from llm_utils import ( # These now point to the Gemini implementations
     structure_resume_text,
     structure_job_description,
     rate_resume_against_jd,
-    summarize_text_contextually
-)
-from database_utils import (
-    add_job,
-    add_applicant,
-    get_structured_jd,
-    get_structured_resume,
-    get_resume_path,
-    get_ranked_applicants, # This function DOES accept include_rejected
-    get_applicants_for_job,
-    add_application,
-    update_application_rating,
-    init_db,
-    update_application_status, # Added previously
-    get_applications_by_status,# Added previously
-    update_job_status # Added previously
+    rate_resumes_batch, # Several resumes per rating prompt, JD sent once
+    summarize_text_contextually,
+    to_prompt_json, # Compact JSON for prompt payloads
+    LLM_BATCH_CONCURRENCY
 )
+from db_backends import get_repository # Storage backend (SQLite or Postgres) for every data call
 
 # --- Configuration & Initialization ---
+SUMMARY_BUDGET_SECONDS = float(os.getenv("SUMMARY_BUDGET_SECONDS", "8")) # Max wait for parallel summaries (chat ranking)
+_summary_executor = None
+_summary_executor_lock = threading.Lock()
+
 print("Initializing database from main_crew.py...")
-init_db()
+get_repository().init_schema()
 print(f"LLM Utils is configured to use Google Gemini (check llm_utils.py logs).")
 
 
 # --- Workflow Functions (Direct Implementation) ---
 
-def run_suitability_check_direct(resume_file_path: str, job_id: str):
-    # ... (Keep implementation as is from previous version) ...
-    print(f"\n--- Running Direct Suitability Check ---")
-    print(f"Resume Path: {resume_file_path}")
-    print(f"Job ID: {job_id}")
+def get_or_structure_resume(resume_file_path: str, applicant_id: str = None):
+    """Structured resume for a file. For a known applicant, reuses applicants.structured_resume when it was
+    built from a file with the same SHA-256 (no text extraction, no LLM call); otherwise extracts and
+    structures the text once and stores it with the hash so later ratings (any job) hit the cache."""
+    if applicant_id is None: # Resolve from the stored filename (uploads are saved under UPLOAD_FOLDER)
+        applicant_id = get_repository().get_applicant_id_by_resume(os.path.basename(resume_file_path))
+    resume_hash = file_sha256(resume_file_path) if applicant_id else None
 
-    if not os.path.exists(resume_file_path):
-        return {"error": f"Resume file not found at path: {resume_file_path}"}
+    cached = get_repository().get_cached_structured_resume(applicant_id, resume_hash)
+    if cached:
+        print(f"Using cached structured resume for {applicant_id} (file unchanged).")
+        return cached
 
     print("Step 1: Extracting resume text...")
     resume_text = extract_text_from_file(resume_file_path)
@@ -56,9 +56,26 @@ def run_suitability_check_direct(resume_file_path: str, job_id: str):
         structured_resume['details'] = structured_resume.get('details', structured_resume['error'])
         return structured_resume
     print("Resume structured successfully.")
+    if applicant_id and resume_hash: # Persist for the next rating; a failed save only costs a future LLM call
+        get_repository().update_structured_resume(applicant_id, structured_resume, resume_hash=resume_hash)
+    return structured_resume
+
+def run_suitability_check_direct(resume_file_path: str, job_id: str, applicant_id: str = None):
+    """Rates a resume file against a job. Pass applicant_id (or use a stored applicant's resume file)
+    to reuse their cached structured resume instead of re-structuring it on every rating."""
+    print(f"\n--- Running Direct Suitability Check ---")
+    print(f"Resume Path: {resume_file_path}")
+    print(f"Job ID: {job_id}")
+
+    if not os.path.exists(resume_file_path):
+        return {"error": f"Resume file not found at path: {resume_file_path}"}
+
+    structured_resume = get_or_structure_resume(resume_file_path, applicant_id)
+    if isinstance(structured_resume, dict) and 'error' in structured_resume:
+        return structured_resume
 
     print("Step 3: Fetching structured job description...")
-    structured_jd = get_structured_jd(job_id)
+    structured_jd = get_repository().get_structured_jd(job_id)
     if not structured_jd: return {"error": f"Job ID '{job_id}' not found or has no structured data."}
     if isinstance(structured_jd, dict) and 'error' in structured_jd:
         print(f"Error in stored JD data: {structured_jd['error']}")
@@ -74,6 +91,38 @@ def run_suitability_check_direct(resume_file_path: str, job_id: str):
     return rating_result
 
 
+def run_suitability_check_batch(job_id: str, resumes):
+    """Batched run_suitability_check_direct for bulk rating: resumes is a list of (applicant_id, resume_file_path).
+    The JD is fetched once and the resumes are rated together with rate_resumes_batch.
+    Returns {applicant_id: rating_result}; failed applicants get an error dict with 'details'."""
+    print(f"\n--- Running Batched Suitability Check for Job ID: {job_id} ({len(resumes)} resume(s)) ---")
+    results = {}
+    structured_jd = get_repository().get_structured_jd(job_id)
+    if not structured_jd: jd_error = {"error": f"Job ID '{job_id}' not found or has no structured data."}
+    elif isinstance(structured_jd, dict) and 'error' in structured_jd:
+        print(f"Error in stored JD data: {structured_jd['error']}")
+        jd_error = {"error": f"Stored JD for {job_id} contains error.", "details": structured_jd.get('details', structured_jd['error'])}
+    else: jd_error = None
+    if jd_error: return {applicant_id: dict(jd_error) for applicant_id, _ in resumes}
+
+    candidates = []
+    for applicant_id, resume_file_path in resumes:
+        if not os.path.exists(resume_file_path):
+            results[applicant_id] = {"error": f"Resume file not found at path: {resume_file_path}"}; continue
+        structured_resume = get_or_structure_resume(resume_file_path, applicant_id)
+        if isinstance(structured_resume, dict) and 'error' in structured_resume: results[applicant_id] = structured_resume
+        else: candidates.append((applicant_id, structured_resume))
+
+    if candidates:
+        print(f"Rating {len(candidates)} resume(s) against job description...")
+        results.update(rate_resumes_batch(candidates, structured_jd))
+    for applicant_id, _ in resumes:
+        rating_result = results.setdefault(applicant_id, {"error": "No rating returned for this applicant."})
+        if isinstance(rating_result, dict) and 'error' in rating_result:
+            rating_result['details'] = rating_result.get('details', rating_result['error'])
+    return results
+
+
 # --- CORRECTED run_ranking_direct ---
 def run_ranking_direct(job_id: str, n: int, include_rejected: bool = False): # Added include_rejected param
     """Retrieves top N RATED applicants directly from database function."""
@@ -83,7 +132,7 @@ def run_ranking_direct(job_id: str, n: int, include_rejected: bool = False): # A
     except ValueError: n_int = 5
 
     # Pass include_rejected down to the database function call
-    results = get_ranked_applicants(job_id, n_int, include_rejected=include_rejected)
+    results = get_repository().get_ranked_applicants(job_id, n_int, include_rejected=include_rejected)
     print(f"Ranking complete. Found {len(results)} rated applicants (filter applied: rejected hidden={not include_rejected}).")
     return {"ranked_applicants": results}
 
@@ -94,17 +143,26 @@ def run_summarization_direct(applicant_id: str, job_id: str):
     if not applicant_id or not job_id: return {"error": "Applicant ID and Job ID required."}
 
     print("Step 1: Fetching structured job description (context)...")
-    structured_jd = get_structured_jd(job_id)
+    structured_jd = get_repository().get_structured_jd(job_id)
     if not structured_jd: return {"error": f"Job ID '{job_id}' not found or has no structured data."}
     if isinstance(structured_jd, dict) and 'error' in structured_jd:
         return {"error": f"Stored JD for {job_id} contains error.", "details": structured_jd.get('details', structured_jd['error'])}
-    jd_context_input = json.dumps(structured_jd, indent=2); print("JD context prepared.")
+    jd_context_input = to_prompt_json(structured_jd, "summary JD context"); print("JD context prepared.")
 
     print("Step 2: Fetching resume path and text...")
-    resume_filename = get_resume_path(applicant_id)
+    resume_filename = get_repository().get_resume_path(applicant_id)
     if not resume_filename: return {"error": f"Resume path not found in DB for applicant {applicant_id}."}
     resume_full_path = os.path.join(UPLOAD_FOLDER, resume_filename)
     if not os.path.exists(resume_full_path): return {"error": f"Resume file not found in uploads folder: {resume_filename}"}
+
+    # Cached summary is valid while the resume file and the JD context sent to the LLM are unchanged
+    resume_hash = file_sha256(resume_full_path)
+    jd_hash = hashlib.sha256(jd_context_input.encode('utf-8')).hexdigest()
+    cached_summary = get_repository().get_cached_summary(applicant_id, job_id, resume_hash, jd_hash)
+    if cached_summary is not None:
+        print("Summary served from cache (resume and JD unchanged).")
+        return {"summary": cached_summary, "cached": True}
+
     resume_text = extract_text_from_file(resume_full_path)
     if isinstance(resume_text, str) and ("Error:" in resume_text or "Warning:" in resume_text):
         return {"error": f"Failed to extract resume text: {resume_text}"}
@@ -120,12 +178,49 @@ def run_summarization_direct(applicant_id: str, job_id: str):
         return {"error": "Failed to generate summary with LLM.", "details": detail}
     elif isinstance(summary, str):
         print("Summarization successful.")
+        get_repository().store_cached_summary(applicant_id, job_id, resume_hash, jd_hash, summary.strip()) # Errors are never cached
         return {"summary": summary.strip()}
     else:
         print(f"Unexpected summary result type: {type(summary)}")
         return {"error": "Summarization returned unexpected result format."}
 
 
+def _get_summary_executor():
+    global _summary_executor
+    with _summary_executor_lock:
+        if _summary_executor is None:
+            _summary_executor = ThreadPoolExecutor(max_workers=LLM_BATCH_CONCURRENCY, thread_name_prefix="summary")
+        return _summary_executor
+
+
+def run_summarization_parallel(applicant_ids, job_id, budget_seconds=None):
+    """Contextual summaries for several applicants of one job, generated concurrently.
+    Waits at most budget_seconds (default SUMMARY_BUDGET_SECONDS); applicants whose summary failed or
+    isn't ready by then get their stored rating summary instead (None if unrated). Late summaries keep
+    running and land in summary_cache, so the next request is served from cache.
+    Returns {applicant_id: summary text or None}."""
+    applicant_ids = [a for a in applicant_ids if a]
+    if not applicant_ids or not job_id: return {}
+    budget = SUMMARY_BUDGET_SECONDS if budget_seconds is None else budget_seconds
+    print(f"\n--- Running Parallel Summarization for {len(applicant_ids)} applicant(s), Job: {job_id} (budget {budget}s) ---")
+    executor = _get_summary_executor()
+    futures = {applicant_id: executor.submit(run_summarization_direct, applicant_id, job_id) for applicant_id in applicant_ids}
+    wait(futures.values(), timeout=budget)
+
+    summaries = {}
+    for applicant_id, future in futures.items():
+        result = None
+        if future.done():
+            try: result = future.result()
+            except Exception as e: print(f"Error summarizing {applicant_id}: {e}")
+        summaries[applicant_id] = result.get('summary') if isinstance(result, dict) else None
+    missing = [a for a, summary in summaries.items() if not summary]
+    if missing:
+        print(f"{len(missing)} summary(ies) failed or exceeded the {budget}s budget; using stored rating summaries.")
+        summaries.update(get_repository().get_rating_summaries(job_id, missing))
+    return summaries
+
+
 # --- Example Usage (Test Block) ---
 if __name__ == "__main__":
     # --- (Keep the existing test block as is) ---
@@ -141,7 +236,7 @@ if __name__ == "__main__":
     print("Structuring sample JD...")
     structured_jd_for_db = structure_job_description(jd_text_sample)
     if isinstance(structured_jd_for_db, dict) and 'error' not in structured_jd_for_db:
-        if add_job(test_job_id, "Software Engineer", jd_text_sample, structured_jd_for_db):
+        if get_repository().add_job(test_job_id, "Software Engineer", jd_text_sample, structured_jd_for_db):
             print(f"Job {test_job_id} added/updated."); test_job_added = True
         else: print(f"ERROR adding Job {test_job_id}.")
     else: print(f"ERROR structuring JD: {structured_jd_for_db.get('error', 'Unknown')}.")
@@ -151,8 +246,8 @@ if __name__ == "__main__":
     try:
         with open(full_resume_path_1, 'w') as f: f.write("Alice Developer\ndirect_alice@test.com\nPython, API Design, SQL, 4 years exp. BSc CompSci.\n")
         print(f"Created: {full_resume_path_1}")
-        if add_applicant(test_applicant_id_1, "Alice Developer", test_resume_filename_1):
-             print(f"Added: {test_applicant_id_1}"); applicant_1_added = True; add_application(test_applicant_id_1, test_job_id)
+        if get_repository().add_applicant(test_applicant_id_1, "Alice Developer", test_resume_filename_1):
+             print(f"Added: {test_applicant_id_1}"); applicant_1_added = True; get_repository().add_application(test_applicant_id_1, test_job_id)
         else: print(f"ERROR adding {test_applicant_id_1}.")
     except Exception as e: print(f"Error setup applicant 1: {e}")
 
@@ -161,8 +256,8 @@ if __name__ == "__main__":
     try:
         with open(full_resume_path_2, 'w') as f: f.write("Bob Coder\ndirect_bob@test.com\nPython, SQL. 1 year exp. Associate Degree.\n")
         print(f"Created: {full_resume_path_2}")
-        if add_applicant(test_applicant_id_2, "Bob Coder", test_resume_filename_2):
-            print(f"Added: {test_applicant_id_2}"); applicant_2_added = True; add_application(test_applicant_id_2, test_job_id)
+        if get_repository().add_applicant(test_applicant_id_2, "Bob Coder", test_resume_filename_2):
+            print(f"Added: {test_applicant_id_2}"); applicant_2_added = True; get_repository().add_application(test_applicant_id_2, test_job_id)
         else: print(f"ERROR adding {test_applicant_id_2}.")
     except Exception as e: print(f"Error setup applicant 2: {e}")
 
@@ -171,7 +266,7 @@ if __name__ == "__main__":
         rating_alice = run_suitability_check_direct(full_resume_path_1, test_job_id)
         print(f"Alice Rating: {json.dumps(rating_alice, indent=2)}")
         if isinstance(rating_alice, dict) and 'error' not in rating_alice:
-            if update_application_rating(test_applicant_id_1, test_job_id, rating_alice): print("Saved Alice rating.")
+            if get_repository().update_application_rating(test_applicant_id_1, test_job_id, rating_alice): print("Saved Alice rating.")
             else: print("ERROR saving Alice rating.")
         else: print("Skipped saving Alice rating.")
     else: print("Skipping Alice check.")
@@ -181,11 +276,20 @@ if __name__ == "__main__":
         rating_bob = run_suitability_check_direct(full_resume_path_2, test_job_id)
         print(f"Bob Rating: {json.dumps(rating_bob, indent=2)}")
         if isinstance(rating_bob, dict) and 'error' not in rating_bob:
-            if update_application_rating(test_applicant_id_2, test_job_id, rating_bob): print("Saved Bob rating.")
+            if get_repository().update_application_rating(test_applicant_id_2, test_job_id, rating_bob): print("Saved Bob rating.")
             else: print("ERROR saving Bob rating.")
         else: print("Skipped saving Bob rating.")
     else: print("Skipping Bob check.")
 
+    print("\n" + "-"*10 + " Test Case 1c: Cached Structured Resume (Alice) " + "-"*10)
+    if test_job_added and applicant_1_added:
+        cached_alice = get_repository().get_cached_structured_resume(test_applicant_id_1, file_sha256(full_resume_path_1))
+        print(f"Alice structured resume cached after rating: {cached_alice is not None}")
+        if cached_alice: # Re-rating must reuse it (logs 'Using cached structured resume')
+            rerating_alice = run_suitability_check_direct(full_resume_path_1, test_job_id)
+            print(f"Alice re-rating (cached resume): {rerating_alice.get('rating', rerating_alice.get('error'))}")
+    else: print("Skipping cache check.")
+
     print("\n" + "-"*10 + " Test Case 2: Direct Ranking " + "-"*10)
     if test_job_added:
         # Test default (exclude rejected - though none are rejected yet)
@@ -200,6 +304,15 @@ if __name__ == "__main__":
     if test_job_added and applicant_1_added:
         summary_output = run_summarization_direct(test_applicant_id_1, test_job_id)
         print(f"Summary Output for {test_applicant_id_1}: {json.dumps(summary_output, indent=2)}")
+        if 'summary' in summary_output: # Second call must come from summary_cache, not Gemini
+            summary_again = run_summarization_direct(test_applicant_id_1, test_job_id)
+            print(f"Repeat summary served from cache: {summary_again.get('cached', False)}")
     else: print("Skipping Alice summarization check.")
 
+    print("\n" + "-"*10 + " Test Case 4: Parallel Summarization (Alice + Bob) " + "-"*10)
+    if test_job_added and applicant_1_added:
+        parallel_summaries = run_summarization_parallel([test_applicant_id_1, test_applicant_id_2], test_job_id)
+        print(f"Parallel Summaries: {json.dumps(parallel_summaries, indent=2)}")
+    else: print("Skipping parallel summarization check.")
+
     print("\n" + "="*30 + " FINISHED DIRECT WORKFLOW TESTS (using Gemini) " + "="*30)
@@ -0,0 +1,175 @@
+"""Token benchmark for LLM prompt payloads (llm_utils.to_prompt_json vs the old json.dumps(indent=2)).
+
+Builds structured resumes/JDs in the same shape structure_resume_text / structure_job_description
+return, then reports estimated input tokens per payload before and after compact serialization,
+plus the JD tokens per candidate for single vs batched rating (rate_resumes_batch).
+
+    python prompt_payload_benchmark.py                        # sample corpus (generate_data.py output)
+    python prompt_payload_benchmark.py --db job_portal.db     # payloads already structured by Gemini
+    python prompt_payload_benchmark.py --output bench.json
+
+Corpus parsing is a local heuristic (no Gemini calls); PDF CVs need pypdf, otherwise only .txt files
+are read. Nothing is written to the database.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import statistics
+
+from llm_utils import to_prompt_json, compact_payload, estimate_tokens, RATING_BATCH_SIZE
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CV_DIR = os.path.join(BASE_DIR, "fake_cvs_pdf_std_fonts")
+DEFAULT_JD_DIR = os.path.join(BASE_DIR, "fake_jedis_txt")
+RESUME_SECTIONS = ("SUMMARY", "OBJECTIVE", "WORK EXPERIENCE", "PROJECTS", "EDUCATION", "TECHNICAL SKILLS", "SKILLS",
+                   "CERTIFICATIONS", "ACCOMPLISHMENTS / AWARDS", "LANGUAGES")
+
+
+def read_text(path):
+    if path.lower().endswith(".pdf"):
+        try: from pypdf import PdfReader
+        except ImportError: return None
+        return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+def _sections(lines, headers):
+    sections, current = {}, None
+    for line in lines:
+        if line.strip().upper() in headers: current = line.strip().upper(); sections[current] = []; continue
+        if current: sections[current].append(line)
+    return sections
+
+
+def parse_resume(text):
+    """Heuristic structure_resume_text stand-in: same keys, None/[] where the LLM would emit null/[]."""
+    lines = [l.rstrip() for l in text.splitlines() if l.strip()]
+    if not lines: return None
+    sections = _sections(lines, RESUME_SECTIONS)
+    email = re.search(r"[\w.+-]+@[\w-]+\.[\w.]+", text)
+    phone = re.search(r"\+?\d[\d\s-]{7,}\d", text)
+    summary = " ".join(sections.get("SUMMARY") or sections.get("OBJECTIVE") or []) or None
+
+    experience, current = [], None
+    for line in sections.get("WORK EXPERIENCE", []):
+        if line.lstrip().startswith("-"):
+            if current: current["description"] = ((current["description"] or "") + "\n" + line.strip()).strip()
+        elif "|" in line and current and current["duration"] is None:
+            current["duration"] = line.split("|")[0].strip()
+        elif "|" in line:
+            title, company = [p.strip() for p in line.split("|", 1)]
+            current = {"title": title, "company": company, "duration": None, "description": None}
+            experience.append(current)
+
+    education, current = [], None
+    for line in sections.get("EDUCATION", []):
+        if line.startswith("Graduation:") and current: current["year"] = line.split(":", 1)[1].split("|")[0].strip()
+        elif current and current["institution"] is None: current["institution"] = line.split("|")[0].strip()
+        else: current = {"degree": line.strip(), "institution": None, "year": None}; education.append(current)
+
+    skills = []
+    for line in sections.get("TECHNICAL SKILLS", []) + sections.get("SKILLS", []):
+        skills.extend(s.strip() for s in line.split(":", 1)[-1].split(",") if s.strip())
+    if not skills and "Skills:" in text:
+        skills = [s.strip(" .") for s in text.split("Skills:", 1)[1].splitlines()[0].split(",") if s.strip(" .")]
+
+    return {"name": lines[0].strip(), "contact_info": {"email": email.group(0) if email else None,
+                                                       "phone": phone.group(0).strip() if phone else None},
+            "summary": summary, "skills": skills, "experience": experience, "education": education}
+
+
+def parse_jd(text):
+    """Heuristic structure_job_description stand-in for the generate_data.py markdown JDs."""
+    title = re.search(r"\*\*Job Title:\*\*\s*(.+)", text)
+    def bullets(header):
+        block = re.search(r"\*\*" + re.escape(header) + r":\*\*(.*?)(?:\n\*\*|\Z)", text, re.S)
+        return [b.strip(" *\t") for b in block.group(1).splitlines() if b.strip().startswith("*")] if block else []
+    required, preferred = bullets("Required Qualifications"), bullets("Preferred Qualifications")
+    years = re.search(r"(\d+)\+?\s*years", " ".join(required))
+    education = next((b for b in required if re.search(r"\b(B\.|M\.|Ph\.D|Bachelor|Master|degree)", b)), None)
+    return {"job_title": title.group(1).strip() if title else None, "required_skills": required,
+            "preferred_skills": preferred, "required_experience_years": int(years.group(1)) if years else None,
+            "required_education": education, "key_responsibilities": bullets("Key Responsibilities")}
+
+
+def load_corpus(cv_dir, jd_dir, limit):
+    resumes, jds, skipped_pdfs = [], [], 0
+    cv_files = sorted(glob.glob(os.path.join(cv_dir, "*.pdf")) + glob.glob(os.path.join(cv_dir, "*.txt")))[:limit]
+    for path in cv_files:
+        text = read_text(path)
+        if text is None: skipped_pdfs += 1; continue
+        parsed = parse_resume(text)
+        if parsed: resumes.append(parsed)
+    for path in sorted(glob.glob(os.path.join(jd_dir, "*.txt")))[:limit]:
+        jds.append(parse_jd(read_text(path)))
+    if skipped_pdfs: print(f"Note: skipped {skipped_pdfs} PDF CVs (pip install pypdf to include them).")
+    return resumes, jds
+
+
+def load_db(db_path, limit):
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) # Read-only: never touches the portal DB
+    try:
+        resumes = [json.loads(r[0]) for r in conn.execute(
+            "SELECT structured_resume FROM applicants WHERE structured_resume IS NOT NULL LIMIT ?", (limit,))]
+        jds = [json.loads(r[0]) for r in conn.execute(
+            "SELECT structured_jd FROM jobs WHERE structured_jd IS NOT NULL LIMIT ?", (limit,))]
+    finally:
+        conn.close()
+    return [r for r in resumes if isinstance(r, dict) and "error" not in r], [j for j in jds if isinstance(j, dict)]
+
+
+def measure(payloads):
+    before = [estimate_tokens(json.dumps(p, indent=2)) for p in payloads]
+    after = [estimate_tokens(to_prompt_json(p)) for p in payloads]
+    if not payloads: return {"count": 0}
+    return {"count": len(payloads),
+            "mean_tokens_before": round(statistics.mean(before), 1), "mean_tokens_after": round(statistics.mean(after), 1),
+            "total_tokens_before": sum(before), "total_tokens_after": sum(after),
+            "saved_pct": round(100.0 * (sum(before) - sum(after)) / sum(before), 1) if sum(before) else 0.0,
+            "fields_dropped_pct": round(100.0 * sum(_leaf_count(p) - _leaf_count(compact_payload(p)) for p in payloads)
+                                        / max(1, sum(_leaf_count(p) for p in payloads)), 1)}
+
+
+def _leaf_count(value):
+    if isinstance(value, dict): return sum(_leaf_count(v) for v in value.values()) or 1
+    if isinstance(value, list): return sum(_leaf_count(v) for v in value) or 1
+    return 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prompt payload token benchmark (indent=2 JSON vs compact).")
+    parser.add_argument("--cv-dir", default=DEFAULT_CV_DIR, help="PDF/.txt CVs (generate_data.py output).")
+    parser.add_argument("--jd-dir", default=DEFAULT_JD_DIR, help=".txt JDs (generate_data.py output).")
+    parser.add_argument("--db", help="Use structured payloads stored in this SQLite DB instead of the corpus.")
+    parser.add_argument("--limit", type=int, default=500, help="Max resumes/JDs to load.")
+    parser.add_argument("--batch-size", type=int, default=RATING_BATCH_SIZE)
+    parser.add_argument("--output", help="Write JSON here instead of stdout.")
+    args = parser.parse_args(argv)
+
+    resumes, jds = load_db(args.db, args.limit) if args.db else load_corpus(args.cv_dir, args.jd_dir, args.limit)
+    report = {"source": args.db or {"cv_dir": args.cv_dir, "jd_dir": args.jd_dir},
+              "resumes": measure(resumes), "job_descriptions": measure(jds)}
+    if resumes and jds:
+        jd_before = report["job_descriptions"]["mean_tokens_before"]
+        jd_after = report["job_descriptions"]["mean_tokens_after"]
+        # Per candidate rated: resume + JD (single prompt each) vs resume + JD shared by batch_size candidates
+        report["rating_payload_tokens_per_candidate"] = {
+            "single_indent2": round(report["resumes"]["mean_tokens_before"] + jd_before, 1),
+            "single_compact": round(report["resumes"]["mean_tokens_after"] + jd_after, 1),
+            f"batched_{args.batch_size}_compact": round(report["resumes"]["mean_tokens_after"] + jd_after / max(1, args.batch_size), 1),
+        }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f: f.write(output)
+        print(f"Wrote {args.output}")
+    else:
+        print(output)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,530 @@
+# rating_executor.py
+"""Shared executor for AI rating runs ('Rate All Unrated', Filter & Rank and the scheduler's
+batch analysis). Applicants are rated on one bounded thread pool shared by every caller, LLM
+starts are throttled by a token bucket, and one applicant failing never stops the rest.
+HR routes submit runs as background tasks (submit_rating_task) whose progress is kept in the DB.
+Each application is rated by one caller at a time (rate_application_once); others share its result."""
+import os
+import uuid
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+from werkzeug.utils import secure_filename
+
+from database_utils import RatingWriteBuffer
+from db_backends import get_repository # Storage backend for claims, rating writes and task progress
+from file_utils import UPLOAD_FOLDER
+
+# --- Executor Settings ---
+RATING_MAX_WORKERS = int(os.getenv("RATING_MAX_WORKERS", "4"))                       # Rating calls in flight at once, across all requests
+RATING_RATE_LIMIT_PER_MIN = float(os.getenv("RATING_RATE_LIMIT_PER_MIN", "60"))      # Rating calls started per minute; a batch counts once (0 = unlimited)
+RATING_BATCH_APPLICANTS = int(os.getenv("RATING_BATCH_APPLICANTS", "8"))             # Applicants per batched rating call (llm_utils.rate_resumes_batch)
+RATING_TASK_WORKERS = int(os.getenv("RATING_TASK_WORKERS", "4"))                    # Background runs at once (each feeds the pool above)
+RATING_CLAIM_WAIT_SECONDS = float(os.getenv("RATING_CLAIM_WAIT_SECONDS", "3"))      # Max wait for another process's rating of the same application
+RATING_CLAIM_POLL_SECONDS = 0.5
+RATING_REQUIRED_KEYS = ('rating', 'summary', 'fits', 'lacks')
+
+_executor = None
+_limiter = None
+_task_executor = None
+_executor_lock = threading.Lock()
+
+
+class RateLimiter:
+    """Thread-safe token bucket. acquire() blocks until a token is free.
+    `burst` tokens are available up front, then `rate_per_min` are refilled per minute."""
+
+    def __init__(self, rate_per_min, burst=1):
+        self.rate_per_sec = max(0.0, rate_per_min) / 60.0
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate_per_sec <= 0: return 0.0 # Unlimited
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate_per_sec)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate_per_sec
+            time.sleep(delay) # Sleep outside the lock so other workers can check too
+            waited += delay
+
+
+def get_rating_executor():
+    """Returns the process-wide rating pool and limiter, creating them on first use."""
+    global _executor, _limiter
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, RATING_MAX_WORKERS), thread_name_prefix="rating")
+            _limiter = RateLimiter(RATING_RATE_LIMIT_PER_MIN, burst=RATING_MAX_WORKERS)
+            print(f"--- [Rating] Executor started ({RATING_MAX_WORKERS} workers, "
+                  f"{RATING_RATE_LIMIT_PER_MIN or 'unlimited'} rating calls/min). ---")
+        return _executor, _limiter
+
+
+def shutdown_rating_executor(wait=True):
+    """Stops the background task pool and the shared rating pool (e.g. at app exit).
+    The next rating run starts new ones."""
+    global _executor, _limiter, _task_executor
+    with _executor_lock:
+        task_executor, _task_executor = _task_executor, None
+    if task_executor: task_executor.shutdown(wait=wait) # Tasks first: they are still submitting to the rating pool
+    with _executor_lock:
+        executor, _executor, _limiter = _executor, None, None
+    if executor: executor.shutdown(wait=wait)
+
+
+# --- Single-Flight Rating ---
+# At most one rating per (applicant_id, job_id) is computed at a time. Inside this process concurrent
+# callers wait on the leader's Future; across processes the leader holds the applications.rating_claimed_by
+# claim (PortalRepository.claim_application_rating) and others poll until it is saved.
+
+_inflight = {} # (applicant_id, job_id) -> [Future of the rating, DB claim owner until the result is saved]
+_inflight_lock = threading.Lock()
+
+
+def is_complete_rating(rating_result):
+    return isinstance(rating_result, dict) and 'error' not in rating_result and all(k in rating_result for k in RATING_REQUIRED_KEYS)
+
+
+def _await_claimed_rating(applicant_id, job_id, log_prefix, wait_seconds):
+    """Waits up to wait_seconds for another process's claim on the application to end and returns the
+    rating it saved; after that returns an 'in_progress' error instead of holding the caller's thread."""
+    print(f"{log_prefix}{applicant_id} (job {job_id}) is being rated by another worker; waiting up to {wait_seconds:.0f}s...")
+    deadline = time.monotonic() + max(0.0, wait_seconds)
+    while True:
+        state = get_repository().get_application_rating_state(applicant_id, job_id)
+        if state is None: return {"error": "Application not found while waiting for its rating."}
+        if state['rating_claimed_by'] is None:
+            if is_complete_rating(state['rating_details']): return state['rating_details']
+            return {"error": "Concurrent rating by another worker did not produce a result."}
+        if time.monotonic() >= deadline: break
+        time.sleep(min(RATING_CLAIM_POLL_SECONDS, max(0.0, deadline - time.monotonic())))
+    return {"error": "Rating already in progress elsewhere.", "in_progress": True,
+            "details": "Being rated by another worker; the result will be saved there."}
+
+
+def rate_application_once(applicant_id, job_id, compute_fn, log_prefix="", wait_seconds=RATING_CLAIM_WAIT_SECONDS):
+    """Single-flight rating of one application. The first caller runs compute_fn(); concurrent callers
+    in this process wait and get the same result instead of calling the LLM again. If another process
+    holds the claim, callers wait at most wait_seconds and then get an {'in_progress': True} error.
+    Returns (rating_result, must_save). must_save is True only for the caller that computed a complete
+    rating: it must save it (update_application_rating / RatingWriteBuffer, which also ends the DB claim)
+    and then call finish_application_rating. Exceptions from compute_fn reach every waiter."""
+    key = (applicant_id, job_id)
+    with _inflight_lock:
+        entry = _inflight.get(key)
+        is_leader = entry is None
+        if is_leader: entry = _inflight[key] = [Future(), None]
+    if not is_leader:
+        print(f"{log_prefix}{applicant_id} (job {job_id}) is already being rated here; sharing that result.")
+        return entry[0].result(), False
+
+    owner = uuid.uuid4().hex
+    claimed = None
+    try:
+        claimed = get_repository().claim_application_rating(applicant_id, job_id, owner) # None: no application row, rate unclaimed
+        if claimed is False:
+            rating_result, must_save = _await_claimed_rating(applicant_id, job_id, log_prefix, wait_seconds), False
+        else:
+            rating_result = compute_fn()
+            must_save = is_complete_rating(rating_result)
+            if must_save: entry[1] = owner if claimed else None
+            elif claimed: get_repository().release_application_rating(applicant_id, job_id, owner) # Let a later attempt retry
+    except BaseException as e:
+        if claimed: get_repository().release_application_rating(applicant_id, job_id, owner)
+        with _inflight_lock: _inflight.pop(key, None)
+        entry[0].set_exception(e)
+        raise
+    entry[0].set_result(rating_result)
+    if not must_save:
+        with _inflight_lock: _inflight.pop(key, None)
+    # else: kept registered (later callers get this result) until finish_application_rating
+    return rating_result, must_save
+
+
+def rate_applications_once(job_id, applicant_ids, compute_batch_fn, log_prefix="", wait_seconds=RATING_CLAIM_WAIT_SECONDS):
+    """Batched rate_application_once: one compute_batch_fn(applicant_ids) -> {applicant_id: rating_result} call
+    rates every application this caller leads; the others share an in-process leader's result or are left to
+    the process holding their claim. Returns {applicant_id: (rating_result, must_save)} with the same meaning
+    (and finish_application_rating duty) as rate_application_once. A failed shared result comes back as an
+    error dict; if compute_batch_fn raises, the applications it was computing get the exception and it is re-raised."""
+    leading, following = {}, {}
+    with _inflight_lock:
+        for applicant_id in dict.fromkeys(applicant_ids):
+            entry = _inflight.get((applicant_id, job_id))
+            if entry is None: leading[applicant_id] = _inflight[(applicant_id, job_id)] = [Future(), None]
+            else: following[applicant_id] = entry
+
+    outcomes, owners, to_compute = {}, {}, []
+    try:
+        for applicant_id in leading:
+            owner = uuid.uuid4().hex
+            claimed = get_repository().claim_application_rating(applicant_id, job_id, owner) # None: no application row, rate unclaimed
+            if claimed is False: outcomes[applicant_id] = (_await_claimed_rating(applicant_id, job_id, log_prefix, wait_seconds), False)
+            else:
+                if claimed: owners[applicant_id] = owner
+                to_compute.append(applicant_id)
+        computed = compute_batch_fn(list(to_compute)) if to_compute else {}
+        for applicant_id in to_compute:
+            rating_result = computed.get(applicant_id) if isinstance(computed, dict) else None
+            if rating_result is None: rating_result = {"error": "No rating returned for this applicant."}
+            must_save = is_complete_rating(rating_result)
+            owner = owners.pop(applicant_id, None)
+            if must_save: leading[applicant_id][1] = owner
+            elif owner: get_repository().release_application_rating(applicant_id, job_id, owner) # Let a later attempt retry
+            outcomes[applicant_id] = (rating_result, must_save)
+    except BaseException as e:
+        for applicant_id, owner in owners.items(): get_repository().release_application_rating(applicant_id, job_id, owner)
+        with _inflight_lock:
+            for applicant_id, entry in leading.items():
+                if applicant_id in outcomes: continue # Settled before the failure (e.g. claimed elsewhere); resolved below
+                _inflight.pop((applicant_id, job_id), None)
+                entry[0].set_exception(e)
+        _settle_leaders(job_id, leading, outcomes)
+        raise
+    _settle_leaders(job_id, leading, outcomes)
+
+    for applicant_id, entry in following.items():
+        print(f"{log_prefix}{applicant_id} (job {job_id}) is already being rated here; sharing that result.")
+        try: outcomes[applicant_id] = (entry[0].result(), False)
+        except Exception as e: outcomes[applicant_id] = ({"error": "Concurrent rating failed.", "details": str(e)}, False)
+    return outcomes
+
+
+def _settle_leaders(job_id, leading, outcomes):
+    """Publishes leader results to in-process followers; flights without a result to save end here."""
+    for applicant_id, (rating_result, must_save) in outcomes.items():
+        entry = leading.get(applicant_id)
+        if entry is None or entry[0].done(): continue
+        entry[0].set_result(rating_result)
+        if not must_save:
+            with _inflight_lock: _inflight.pop((applicant_id, job_id), None)
+        # else: kept registered (later callers get this result) until finish_application_rating
+
+
+def finish_application_rating(applicant_id, job_id, saved=True):
+    """Ends a must_save flight from rate_application_once once its rating is saved (or failed to save,
+    in which case the DB claim is dropped so the application can be rated again)."""
+    with _inflight_lock:
+        entry = _inflight.pop((applicant_id, job_id), None)
+    if entry and entry[1] and not saved:
+        get_repository().release_application_rating(applicant_id, job_id, entry[1])
+
+
+def _rating_status(applicant_id, job_id, rating_result, must_save, log_prefix):
+    """Maps a single-flight outcome to (status, result_or_detail) for rate_applicants."""
+    if is_complete_rating(rating_result):
+        return ('rated' if must_save else 'shared'), rating_result
+    if isinstance(rating_result, dict) and rating_result.get('in_progress'):
+        print(f"{log_prefix}Skipping {applicant_id} (job {job_id}): {rating_result.get('details')}")
+        return 'skipped', rating_result['error']
+    error_detail = "Incomplete AI response" if isinstance(rating_result, dict) and 'error' not in rating_result \
+        else (rating_result.get('details', rating_result.get('error', 'Unknown AI error')) if isinstance(rating_result, dict) else 'Unknown AI error')
+    print(f"{log_prefix}ERROR AI rating {applicant_id} (job {job_id}): {error_detail}")
+    return 'error', error_detail
+
+
+def _rate_chunk(job_id, applicant_ids, batch_rate_fn, limiter, log_prefix):
+    """Worker body for a chunk of applicants rated with one batch_rate_fn call. Never raises; returns
+    [(applicant_id, status, result_or_detail)] with status 'rated' (caller must save it), 'shared'
+    (another caller rated it and saves it), 'error' or 'skipped'."""
+    results, resume_paths = [], {}
+    for applicant_id in applicant_ids:
+        try:
+            resume_filename = get_repository().get_resume_path(applicant_id)
+            if not resume_filename:
+                print(f"{log_prefix}Skipping {applicant_id} (job {job_id}): No resume path.")
+                results.append((applicant_id, 'skipped', "No resume path")); continue
+            resume_full_path = os.path.join(UPLOAD_FOLDER, secure_filename(resume_filename))
+            if not os.path.exists(resume_full_path):
+                print(f"{log_prefix}Skipping {applicant_id} (job {job_id}): Resume file missing ({resume_filename}).")
+                results.append((applicant_id, 'skipped', "Resume file missing")); continue
+            resume_paths[applicant_id] = resume_full_path
+        except Exception as e:
+            print(f"{log_prefix}ERROR exception rating {applicant_id} for {job_id}: {e}"); traceback.print_exc()
+            results.append((applicant_id, 'error', str(e)))
+    if not resume_paths: return results
+
+    def compute(ids):
+        limiter.acquire() # Throttle only calls that will actually reach the LLM; one token per batch
+        print(f"{log_prefix}Rating {len(ids)} applicant(s) for job {job_id}: {', '.join(ids)}...")
+        return batch_rate_fn(job_id, [(applicant_id, resume_paths[applicant_id]) for applicant_id in ids])
+
+    try:
+        # Don't hold a pool worker for another process's rating: skip it (counted) and let that process save it
+        outcomes = rate_applications_once(job_id, list(resume_paths), compute, log_prefix, wait_seconds=0)
+    except Exception as e:
+        print(f"{log_prefix}ERROR exception rating {len(resume_paths)} applicant(s) for {job_id}: {e}"); traceback.print_exc()
+        return results + [(applicant_id, 'error', str(e)) for applicant_id in resume_paths]
+    for applicant_id in resume_paths:
+        results.append((applicant_id, *_rating_status(applicant_id, job_id, *outcomes[applicant_id], log_prefix)))
+    return results
+
+
+def rate_applicants(job_id, applicants, log_prefix="", rate_fn=None, on_result=None, batch_rate_fn=None):
+    """Rates `applicants` (dicts with 'applicant_id', in priority order) for `job_id` concurrently
+    on the shared pool and saves successful ratings through RatingWriteBuffer.
+    By default applicants are rated RATING_BATCH_APPLICANTS per call with main_crew.run_suitability_check_batch
+    (the JD is sent once per batch); batch_rate_fn(job_id, [(applicant_id, resume_path)]) -> {applicant_id: result}
+    replaces it. A per-applicant rate_fn(resume_file_path, job_id, applicant_id) rates one applicant per call instead.
+    on_result(applicant_id, status, detail) is called from the calling thread as each applicant finishes.
+    Applicants already being rated by another caller are not rated twice; their shared result counts as rated.
+    Returns {"rated_count", "error_count", "skipped_count"}; ratings are in the DB when it returns."""
+    if rate_fn is not None:
+        chunk_size = 1
+        batch_rate_fn = lambda job_id, items: {applicant_id: rate_fn(resume_file_path=path, job_id=job_id, applicant_id=applicant_id)
+                                               for applicant_id, path in items}
+    else:
+        chunk_size = max(1, RATING_BATCH_APPLICANTS)
+        if batch_rate_fn is None:
+            from main_crew import run_suitability_check_batch as batch_rate_fn # Lazy: pulls in the LLM stack
+    executor, limiter = get_rating_executor()
+    error_count = 0; skipped_count = 0
+    start = time.monotonic()
+    applicant_ids = []
+    for applicant in applicants:
+        applicant_id = applicant.get('applicant_id')
+        if not applicant_id:
+            skipped_count += 1; print(f"{log_prefix}Skipping applicant with missing ID in job {job_id}.")
+            if on_result: on_result(None, 'skipped', "Missing applicant ID")
+            continue
+        applicant_ids.append(applicant_id)
+    futures = {executor.submit(_rate_chunk, job_id, chunk, batch_rate_fn, limiter, log_prefix): chunk
+               for chunk in (applicant_ids[i:i + chunk_size] for i in range(0, len(applicant_ids), chunk_size))}
+
+    def on_flush(batch, saved): # Saved ratings end their single flights; rows that failed to save also drop the claim
+        for (saved_applicant_id, saved_job_id, _), row_saved in zip(batch, saved):
+            finish_application_rating(saved_applicant_id, saved_job_id, saved=row_saved)
+
+    shared_count = 0
+    with RatingWriteBuffer(on_flush=on_flush, store=get_repository()) as rating_writer: # Only this thread touches it; workers just return results
+        for future in as_completed(futures):
+            try: chunk_results = future.result()
+            except Exception as e: chunk_results = [(applicant_id, 'error', str(e)) for applicant_id in futures[future]] # _rate_chunk shouldn't raise, but never lose the run
+            for applicant_id, status, detail in chunk_results:
+                if status == 'rated': rating_writer.add(applicant_id, job_id, detail)
+                elif status == 'shared': shared_count += 1 # Rated by a concurrent caller, which saves it
+                elif status == 'skipped': skipped_count += 1
+                else: error_count += 1
+                if on_result:
+                    try: on_result(applicant_id, status, detail)
+                    except Exception as e: print(f"{log_prefix}Warning: on_result callback failed for {applicant_id}: {e}")
+
+    error_count += rating_writer.failed
+    if rating_writer.failed: print(f"{log_prefix}ERROR updating DB for {rating_writer.failed} rating(s) (job {job_id})")
+    print(f"{log_prefix}Processed {len(applicant_ids)} applicant(s) for {job_id} in {len(futures)} batch(es), "
+          f"{time.monotonic() - start:.1f}s ({RATING_MAX_WORKERS} workers).")
+    return {"rated_count": rating_writer.written + shared_count, "error_count": error_count, "skipped_count": skipped_count}
+
+
+# --- Background Rating Tasks ---
+# A task runs rate_applicants on its own coordinator thread (not on the rating pool, which it waits on)
+# and writes its counts to the rating_tasks table, so any app process can report progress.
+
+def _get_task_executor():
+    global _task_executor
+    with _executor_lock:
+        if _task_executor is None:
+            _task_executor = ThreadPoolExecutor(max_workers=max(1, RATING_TASK_WORKERS), thread_name_prefix="rating-task")
+        return _task_executor
+
+
+def _run_rating_task(task_id, job_id, applicants, log_prefix, rate_fn, batch_rate_fn=None):
+    repo = get_repository()
+    counts = {'rated': 0, 'errors': 0, 'skipped': 0}
+
+    def on_result(applicant_id, status, detail):
+        counts[{'rated': 'rated', 'shared': 'rated', 'skipped': 'skipped'}.get(status, 'errors')] += 1
+        repo.update_rating_task(task_id, **counts)
+
+    repo.update_rating_task(task_id, status='running', started_at=time.time())
+    try:
+        final = rate_applicants(job_id, applicants, log_prefix=log_prefix, rate_fn=rate_fn, on_result=on_result,
+                                batch_rate_fn=batch_rate_fn)
+        message = (f"Rating finished for {job_id}. Rated: {final['rated_count']}, "
+                   f"Errors: {final['error_count']}, Skipped: {final['skipped_count']}.")
+        repo.update_rating_task(task_id, status='done', rated=final['rated_count'], errors=final['error_count'],
+                                skipped=final['skipped_count'], message=message, finished_at=time.time())
+        print(f"{log_prefix}{message}")
+    except Exception as e:
+        print(f"{log_prefix}ERROR rating task {task_id} for {job_id} failed: {e}"); traceback.print_exc()
+        repo.update_rating_task(task_id, status='failed', message=f"Rating task failed: {e}", finished_at=time.time())
+
+
+def submit_rating_task(job_id, applicants, kind, params=None, log_prefix="", rate_fn=None, batch_rate_fn=None):
+    """Queues a background rating run for `applicants` and returns (task_id, created) immediately.
+    If a task of the same kind is already queued/running for the job, its id is returned with created=False
+    and nothing new is queued. Returns (None, False) if the task could not be recorded."""
+    task_id, created = get_repository().create_rating_task(uuid.uuid4().hex, job_id, kind, len(applicants), params)
+    if created:
+        _get_task_executor().submit(_run_rating_task, task_id, job_id, list(applicants), log_prefix, rate_fn, batch_rate_fn)
+        print(f"{log_prefix}Queued rating task {task_id} for {job_id} ({len(applicants)} applicant(s)).")
+    return task_id, created
+
+
+def rating_task_progress(task):
+    """Adds elapsed_seconds, processed, throughput_per_min and eta_seconds to a get_rating_task() dict.
+    ETA is None until the first applicant finishes (or once the task is no longer running)."""
+    progress = dict(task)
+    processed = task['rated'] + task['errors'] + task['skipped']
+    started, finished = task.get('started_at'), task.get('finished_at')
+    elapsed = ((finished or time.time()) - started) if started else 0.0
+    throughput = processed / elapsed if elapsed > 0 else 0.0 # Applicants per second
+    remaining = max(0, task['total'] - processed)
+    progress.update({
+        "processed": processed,
+        "remaining": remaining,
+        "elapsed_seconds": round(elapsed, 1),
+        "throughput_per_min": round(throughput * 60, 2),
+        "eta_seconds": round(remaining / throughput, 1) if task['status'] == 'running' and throughput > 0 else None,
+    })
+    return progress
+
+
+# --- Example Usage / Testing ---
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+    import database_utils
+    from database_utils import (init_db, close_all_connections, add_job, add_applicant, add_application,
+                                get_application, get_rating_task, update_application_rating,
+                                claim_application_rating, get_application_rating_state)
+
+    print("\n" + "="*10 + " Running Rating Executor Tests " + "="*10)
+    test_dir = tempfile.mkdtemp(prefix="rating_exec_")
+    database_utils.DB_FILE = os.path.join(test_dir, "test_job_portal.db")
+    UPLOAD_FOLDER = test_dir # Workers resolve resumes against this module's UPLOAD_FOLDER
+    init_db()
+    try:
+        add_job("EXECTEST001", "Executor Tester", "Testing concurrency.", {"required_skills": ["Python"]})
+        for i in range(8):
+            applicant_id = f"exec{i}@example.com"
+            add_applicant(applicant_id, f"Exec Applicant {i}", f"exec_{i}.txt")
+            add_application(applicant_id, "EXECTEST001")
+            if i != 7: # exec7 has no resume file on disk
+                with open(os.path.join(test_dir, f"exec_{i}.txt"), "w") as f: f.write("Python developer")
+        applicants = [{"applicant_id": f"exec{i}@example.com"} for i in range(8)] + [{"applicant_id": None}]
+        DELAY = 0.3
+
+        def stub_rate(resume_file_path, job_id, applicant_id):
+            time.sleep(DELAY) # Stands in for the LLM round trips
+            if applicant_id == "exec5@example.com": raise RuntimeError("simulated LLM outage")
+            if applicant_id == "exec6@example.com": return {"error": "AI error", "details": "simulated bad JSON"}
+            return {"rating": 4, "summary": "Good fit.", "fits": ["Python"], "lacks": []}
+
+        print("\n1. Testing Concurrent Rating with Error Isolation...")
+        RATING_RATE_LIMIT_PER_MIN = 0 # Measure concurrency alone
+        seen = []
+        start = time.monotonic()
+        counts = rate_applicants("EXECTEST001", applicants, log_prefix="[Test] ", rate_fn=stub_rate,
+                                 on_result=lambda a, s, d: seen.append((a, s)))
+        elapsed = time.monotonic() - start
+        print(f"Counts: {counts}, elapsed {elapsed:.2f}s")
+        assert counts == {"rated_count": 5, "error_count": 2, "skipped_count": 2}, f"Test Failed: Wrong counts {counts}"
+        assert len(seen) == 9, "Test Failed: on_result not called for every applicant."
+        assert get_application("exec0@example.com", "EXECTEST001")['rating'] == 4, "Test Failed: Rating not saved."
+        assert get_application("exec5@example.com", "EXECTEST001")['rating'] is None, "Test Failed: Failed rating was saved."
+        serial_time = 7 * DELAY
+        expected = -(-7 // RATING_MAX_WORKERS) * DELAY # ceil(7 / workers) rounds of DELAY
+        assert elapsed < min(serial_time * 0.75, expected + 2 * DELAY), \
+            f"Test Failed: {elapsed:.2f}s does not scale with {RATING_MAX_WORKERS} workers (serial {serial_time:.2f}s)."
+        print(f"Concurrent rating verified ({elapsed:.2f}s vs {serial_time:.2f}s serial).")
+
+        print("\n2. Testing Rate Limiter...")
+        limiter = RateLimiter(rate_per_min=600, burst=2) # 10/s after a burst of 2
+        start = time.monotonic()
+        for _ in range(6): limiter.acquire()
+        elapsed = time.monotonic() - start
+        assert 0.35 <= elapsed < 1.0, f"Test Failed: 6 acquires at 10/s (burst 2) took {elapsed:.2f}s"
+        assert RateLimiter(0).acquire() == 0.0, "Test Failed: Unlimited limiter should not wait."
+        print(f"Rate limiter verified ({elapsed:.2f}s for 6 tokens).")
+        print("\n3. Testing Background Rating Task...")
+        add_job("EXECTEST002", "Task Tester", "Testing tasks.", {"required_skills": ["Python"]})
+        for i in range(4): add_application(f"exec{i}@example.com", "EXECTEST002")
+        task_applicants = [{"applicant_id": f"exec{i}@example.com"} for i in range(4)] + [{"applicant_id": "exec7@example.com"}]
+        start = time.monotonic()
+        task_id, created = submit_rating_task("EXECTEST002", task_applicants, "rate_all", rate_fn=stub_rate, log_prefix="[Task] ")
+        assert created and time.monotonic() - start < DELAY, "Test Failed: submit_rating_task should return immediately."
+        assert submit_rating_task("EXECTEST002", task_applicants, "rate_all", rate_fn=stub_rate) == (task_id, False), \
+            "Test Failed: Second submit while running should reuse the task."
+        task = get_rating_task(task_id)
+        while task['status'] in ('queued', 'running'):
+            time.sleep(0.05); task = get_rating_task(task_id)
+        progress = rating_task_progress(task)
+        print(f"Task progress: {progress}")
+        assert progress['status'] == 'done' and (progress['rated'], progress['errors'], progress['skipped']) == (4, 0, 1), \
+            f"Test Failed: Task counts {progress}"
+        assert progress['processed'] == progress['total'] == 5 and progress['remaining'] == 0 and progress['eta_seconds'] is None, \
+            "Test Failed: Task progress maths."
+        assert progress['throughput_per_min'] > 0 and get_application("exec3@example.com", "EXECTEST002")['rating'] == 4, \
+            "Test Failed: Task did not save ratings."
+        print("Background rating task verified.")
+        print("\n4. Testing Single-Flight Rating...")
+        add_job("EXECTEST003", "Dedup Tester", "Testing dedup.", {"required_skills": ["Python"]})
+        for i in range(4): add_application(f"exec{i}@example.com", "EXECTEST003")
+        calls = []
+        def counting_rate(resume_file_path, job_id, applicant_id):
+            calls.append(applicant_id)
+            return stub_rate(resume_file_path, job_id, applicant_id)
+        overlapping = [{"applicant_id": f"exec{i}@example.com"} for i in range(4)]
+        with ThreadPoolExecutor(max_workers=2) as callers: # e.g. 'Rate All' and the scheduler at the same moment
+            runs = [callers.submit(rate_applicants, "EXECTEST003", overlapping, f"[Run {n}] ", counting_rate) for n in range(2)]
+            results = [r.result() for r in runs]
+        print(f"Runs: {results}, LLM calls: {len(calls)}")
+        assert sorted(calls) == [a["applicant_id"] for a in overlapping], f"Test Failed: Duplicate LLM calls {calls}"
+        assert all(r == {"rated_count": 4, "error_count": 0, "skipped_count": 0} for r in results), f"Test Failed: Shared counts {results}"
+        assert not _inflight and get_application_rating_state("exec0@example.com", "EXECTEST003")['rating_claimed_by'] is None, \
+            "Test Failed: Flights/claims left behind."
+
+        RATING_CLAIM_POLL_SECONDS = 0.05
+        claim_application_rating("exec1@example.com", "EXECTEST003", "other-process") # Another worker is rating it
+        saver = threading.Timer(0.3, update_application_rating, ("exec1@example.com", "EXECTEST003",
+                                                                   {"rating": 9, "summary": "Theirs.", "fits": [], "lacks": []}))
+        saver.start()
+        shared, must_save = rate_application_once("exec1@example.com", "EXECTEST003", lambda: calls.append("unexpected"))
+        saver.join()
+        assert shared['rating'] == 9 and must_save is False and "unexpected" not in calls, "Test Failed: Cross-process claim not awaited."
+        claim_application_rating("exec2@example.com", "EXECTEST003", "stuck-process")
+        start = time.monotonic()
+        busy = rate_applicants("EXECTEST003", [{"applicant_id": "exec2@example.com"}], rate_fn=counting_rate)
+        assert busy == {"rated_count": 0, "error_count": 0, "skipped_count": 1}, f"Test Failed: Busy claim should skip {busy}"
+        assert time.monotonic() - start < 0.5, "Test Failed: Bulk run waited on another process's claim."
+        start = time.monotonic()
+        pending, must_save = rate_application_once("exec2@example.com", "EXECTEST003", lambda: calls.append("unexpected"), wait_seconds=0.2)
+        assert pending.get('in_progress') and not must_save and time.monotonic() - start < 0.5, "Test Failed: Bounded claim wait."
+        print("Single-flight rating verified.")
+
+        print("\n5. Testing Batched Rating...")
+        add_job("EXECTEST004", "Batch Tester", "Testing batches.", {"required_skills": ["Python"]})
+        for i in range(8): add_application(f"exec{i}@example.com", "EXECTEST004")
+        batches = []
+        def stub_batch_rate(job_id, resumes): # Stands in for main_crew.run_suitability_check_batch
+            batches.append([applicant_id for applicant_id, _ in resumes])
+            return {applicant_id: {"rating": 3, "summary": "Batched.", "fits": [], "lacks": []}
+                    for applicant_id, _ in resumes if applicant_id != "exec4@example.com"} # exec4 left out of the answer
+        RATING_BATCH_APPLICANTS = 3
+        counts = rate_applicants("EXECTEST004", [{"applicant_id": f"exec{i}@example.com"} for i in range(8)],
+                                 log_prefix="[Batch] ", batch_rate_fn=stub_batch_rate)
+        print(f"Counts: {counts}, batches: {batches}")
+        assert counts == {"rated_count": 6, "error_count": 1, "skipped_count": 1}, f"Test Failed: Batched counts {counts}"
+        assert sorted(len(b) for b in batches) == [1, 3, 3], f"Test Failed: Expected one call per chunk of 3 {batches}"
+        assert get_application("exec0@example.com", "EXECTEST004")['rating'] == 3, "Test Failed: Batched rating not saved."
+        assert get_application("exec4@example.com", "EXECTEST004")['rating'] is None, "Test Failed: Missing result was saved."
+        assert not _inflight and get_application_rating_state("exec4@example.com", "EXECTEST004")['rating_claimed_by'] is None, \
+            "Test Failed: Batched flights/claims left behind."
+        print("Batched rating verified.")
+    finally:
+        shutdown_rating_executor()
+        close_all_connections()
+        shutil.rmtree(test_dir, ignore_errors=True)
+    print("\n" + "="*10 + " Rating Executor Tests Complete " + "="*10)